@@ -0,0 +1,92 @@
+"""
+Cold start benchmark of the lookout_equipment_utils module: time taken by
+"import lookout_equipment_utils" in a fresh interpreter, third party
+libraries loaded by the import, and time taken by the first API client.
+
+Headless workers (schedulers, ingestion jobs, Lambda functions) only use a
+small part of the module: the heavy libraries (scipy, matplotlib, pandas,
+pyarrow...) must only be loaded by the functions which need them.
+
+USAGE
+=====
+    python benchmarks/benchmark_import_time.py
+    python benchmarks/benchmark_import_time.py --repeat 10 --max-import-time 0.5
+
+The script exits with an error when the median import time is above the
+maximum import time, or when one of the heavy libraries is loaded by the
+import alone.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+UTILS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils')
+HEAVY_MODULES = ['boto3', 'matplotlib', 'numpy', 'pandas', 'pyarrow', 'scipy', 'tqdm']
+
+# Run in a fresh interpreter for each measurement: the
+# import cache of the current process would hide the cost.
+PROBE = """
+import json, resource, sys, time
+sys.path.append({utils_dir!r})
+start = time.perf_counter()
+import lookout_equipment_utils as lookout
+import_time = time.perf_counter() - start
+loaded = sorted(m for m in {heavy_modules!r} if m in sys.modules)
+start = time.perf_counter()
+lookout.get_client(region_name='eu-west-1')
+client_time = time.perf_counter() - start
+print(json.dumps({{
+    'import': import_time,
+    'client': client_time,
+    'loaded': loaded,
+    'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+}}))
+"""
+
+def probe():
+    """
+    Import the module in a new interpreter and create a first client.
+
+    RETURNS
+    =======
+        result: dict
+            Import time and client creation time in seconds, heavy modules
+            loaded by the import and maximum resident size in kilobytes
+    """
+    code = PROBE.format(utils_dir=UTILS_DIR, heavy_modules=HEAVY_MODULES)
+    env = dict(os.environ, AWS_ACCESS_KEY_ID='benchmark', AWS_SECRET_ACCESS_KEY='benchmark')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True)
+
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the import time of lookout_equipment_utils.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of fresh interpreters')
+    parser.add_argument('--max-import-time', type=float, default=0.5, help='Maximum median import time in seconds')
+    args = parser.parse_args()
+
+    results = [probe() for _ in range(args.repeat)]
+    import_time = statistics.median(r['import'] for r in results)
+    client_time = statistics.median(r['client'] for r in results)
+    rss = statistics.median(r['rss'] for r in results)
+    loaded = results[0]['loaded']
+
+    print(f'{"Import (s)":<28}{import_time:>10.4f}')
+    print(f'{"First get_client (s)":<28}{client_time:>10.4f}')
+    print(f'{"Max RSS (MB)":<28}{rss / 1024:>10.1f}')
+    print(f'{"Heavy modules on import":<28}{", ".join(loaded) or "none":>10}')
+
+    errors = []
+    if import_time > args.max_import_time:
+        errors.append(f'import takes {import_time:.3f}s (maximum: {args.max_import_time}s)')
+    if len(loaded) > 0:
+        errors.append(f'modules loaded on import: {loaded}')
+    if len(errors) > 0:
+        print('Regressions: ' + '; '.join(errors))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
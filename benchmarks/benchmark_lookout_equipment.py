@@ -0,0 +1,290 @@
+"""
+Benchmarks of the analysis, plotting and predictions hot paths of the
+lookout_equipment_utils module, on synthetic data shaped like the
+expander.parquet dataset (one column per tag, one row per minute).
+
+The API calls are served by the in-process simulator (see
+lookout_equipment_simulator.py): no AWS account is needed.
+
+USAGE
+=====
+    python benchmarks/benchmark_lookout_equipment.py
+    python benchmarks/benchmark_lookout_equipment.py --tags 500 --days 180 --ranges 200
+    python benchmarks/benchmark_lookout_equipment.py --only compute_histograms plot_timeseries
+    python benchmarks/benchmark_lookout_equipment.py --save-baselines
+
+Each sample calls the benchmarked function as many times as needed to
+last at least --min-time seconds, so that sub-millisecond functions are
+not measured at the resolution of the timer. The best time per call over
+the samples is compared to the baseline recorded in baselines.json for
+the same data shape: the script exits with an error when it is slower
+than its baseline by more than the tolerance and by more than
+--min-slowdown seconds: on sub-millisecond functions, a relative
+tolerance alone flags the jitter of the machine. Baselines depend on the
+machine: record them again (--save-baselines) on the machine used to
+track the regressions.
+
+This is a standalone script rather than a pytest-benchmark or asv suite:
+the repository has no packaging nor test dependencies to install these
+tools with, and the notebooks users only need numpy, pandas and
+matplotlib to run it.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+import lookout_equipment_utils as lookout
+import lookout_equipment_simulator as simulator
+
+BASELINES_FNAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+MODEL_NAME = 'benchmark-model'
+
+def generate_tags(num_tags=120, num_days=30, freq='1min', seed=0):
+    """
+    Generate a dataframe shaped like expander.parquet: random walks around
+    a different level for each tag, indexed by time.
+
+    PARAMS
+    ======
+        num_tags: integer (default: 120)
+            Number of tags (columns)
+
+        num_days: integer (default: 30)
+            Length of the history in days
+
+        freq: string (default: '1min')
+            Sampling frequency
+
+        seed: integer (default: 0)
+            Seed of the random generator
+
+    RETURNS
+    =======
+        tags_df: pandas.DataFrame
+            A dataframe indexed by time with one column per tag
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start='2015-01-01', periods=int(pd.Timedelta(days=num_days) / pd.Timedelta(freq)), freq=freq, name='Timestamp')
+    levels = rng.uniform(-100, 100, size=num_tags)
+    values = levels + np.cumsum(rng.normal(scale=0.1, size=(len(index), num_tags)), axis=0)
+    tags_df = pd.DataFrame(values, index=index, columns=[f'signal-{i:03d}' for i in range(num_tags)])
+
+    return tags_df
+
+def generate_ranges(index, num_ranges=50, mean_duration='3h', seed=0):
+    """
+    Generate non overlapping anomaly ranges over a time index.
+
+    PARAMS
+    ======
+        index: pandas.DatetimeIndex
+            The time index to draw the ranges in
+
+        num_ranges: integer (default: 50)
+            Number of ranges
+
+        mean_duration: string (default: '3h')
+            Average duration of each range
+
+        seed: integer (default: 0)
+            Seed of the random generator
+
+    RETURNS
+    =======
+        ranges_df: pandas.DataFrame
+            The ranges in chronological order, with a start and an end column
+    """
+    rng = np.random.default_rng(seed)
+    starts = np.sort(rng.choice(index.values[:-1], size=num_ranges, replace=False))
+    durations = rng.exponential(pd.Timedelta(mean_duration).total_seconds(), size=num_ranges).astype('timedelta64[s]')
+    ends = starts + durations
+
+    # Ranges are clipped so that they do not overlap:
+    ends[:-1] = np.minimum(ends[:-1], starts[1:])
+    ranges_df = pd.DataFrame({'start': starts, 'end': ends})
+
+    return ranges_df
+
+class Context:
+    """
+    Data shared by all the benchmarks: the synthetic tags, a simulated
+    service with a trained model, and a simulated scheduler with results.
+    """
+    def __init__(self, num_tags, num_days, num_ranges, num_executions):
+        self.tags_df = generate_tags(num_tags=num_tags, num_days=num_days)
+        index = self.tags_df.index
+        self.evaluation_start = index[len(index) // 2]
+        self.evaluation_end = index[-1]
+        self.training_start = index[0]
+        self.training_end = index[len(index) // 2 - 1]
+        evaluation_index = index[len(index) // 2:]
+        self.labelled_ranges = generate_ranges(evaluation_index, num_ranges, seed=1)
+        self.predicted_ranges = generate_ranges(evaluation_index, num_ranges, seed=2)
+
+        tags_description = {f'component-{i}': list(tags) for i, tags in enumerate(np.array_split(self.tags_df.columns, 4))}
+        self.simulator = simulator.ReplaySimulator(self.tags_df, tags_description, speed=None)
+        self.simulator.lookout_client.add_model(
+            MODEL_NAME,
+            self.labelled_ranges,
+            self.predicted_ranges,
+            training_start=self.training_start,
+            training_end=self.training_end,
+            evaluation_start=self.evaluation_start,
+            evaluation_end=self.evaluation_end
+        )
+
+        # The scheduler results are generated once for all the runs:
+        self.scheduler = self.simulator.add_scheduler('benchmark-scheduler', upload_frequency='PT1H')
+        self.simulator.run(duration=pd.Timedelta(hours=num_executions), interval=3600)
+        self.scheduler.list_inference_executions()
+
+    def new_analysis(self):
+        with self.simulator.patch_clients():
+            analysis = lookout.LookoutEquipmentAnalysis(MODEL_NAME, self.tags_df)
+            analysis.set_time_periods(self.evaluation_start, self.evaluation_end, self.training_start, self.training_end)
+            analysis.get_predictions()
+
+        return analysis
+
+def benchmark_analysis_init(context):
+    def init():
+        with context.simulator.patch_clients():
+            return lookout.LookoutEquipmentAnalysis(MODEL_NAME, context.tags_df)
+    return init
+
+def benchmark_get_time_ranges(context):
+    analysis = context.new_analysis()
+    return lambda: analysis._get_time_ranges()
+
+def benchmark_compute_histograms(context):
+    analysis = context.new_analysis()
+    return lambda: analysis.compute_histograms()
+
+def benchmark_get_ranked_list(context):
+    analysis = context.new_analysis()
+    analysis.compute_histograms()
+    return lambda: analysis.get_ranked_list(max_signals=len(analysis.tags_list))
+
+def benchmark_plot_timeseries(context):
+    tag = context.tags_df.columns[0]
+    tag_df = context.tags_df[[tag]]
+    tag_df.columns = ['Value']
+    def plot():
+        fig, _ = lookout.plot_timeseries(
+            timeseries_df=tag_df,
+            tag_name=tag,
+            tag_split=context.evaluation_start,
+            labels_df=context.labelled_ranges,
+            predictions=context.predicted_ranges,
+            downsample=True
+        )
+        fig.canvas.draw()
+        plt.close(fig)
+    return plot
+
+def benchmark_scheduler_get_predictions(context):
+    return lambda: context.scheduler.get_predictions(s3_client=context.simulator.s3_client)
+
+BENCHMARKS = {
+    'analysis_init': benchmark_analysis_init,
+    'get_time_ranges': benchmark_get_time_ranges,
+    'compute_histograms': benchmark_compute_histograms,
+    'get_ranked_list': benchmark_get_ranked_list,
+    'plot_timeseries': benchmark_plot_timeseries,
+    'scheduler_get_predictions': benchmark_scheduler_get_predictions
+}
+
+def measure(function, repeat=5, min_time=0.05):
+    """
+    Time a function: one warm-up call, then repeat timed samples. Each
+    sample calls the function in a loop, with a number of calls calibrated
+    so that the sample lasts at least min_time seconds.
+
+    RETURNS
+    =======
+        timings: dict
+            The minimum and median duration of a call in seconds, and the
+            number of calls per sample
+    """
+    def run_sample(loops):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        return time.perf_counter() - start
+
+    function()
+    loops = 1
+    duration = run_sample(loops)
+    while duration < min_time:
+        loops = max(loops * 2, int(loops * min_time * 1.2 / max(duration, 1e-9)))
+        duration = run_sample(loops)
+
+    durations = [duration / loops] + [run_sample(loops) / loops for _ in range(repeat - 1)]
+
+    return {'min': float(np.min(durations)), 'median': float(np.median(durations)), 'loops': loops}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the lookout_equipment_utils hot paths.')
+    parser.add_argument('--tags', type=int, default=120, help='Number of tags')
+    parser.add_argument('--days', type=int, default=30, help='Length of the history in days')
+    parser.add_argument('--ranges', type=int, default=50, help='Number of labelled and predicted ranges')
+    parser.add_argument('--executions', type=int, default=200, help='Number of scheduler executions')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed samples per benchmark')
+    parser.add_argument('--min-time', type=float, default=0.05, help='Minimum duration of each sample in seconds')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS.keys()), help='Benchmarks to run')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown over the baselines')
+    parser.add_argument('--min-slowdown', type=float, default=0.0005, help='Smallest slowdown in seconds reported as a regression')
+    parser.add_argument('--save-baselines', action='store_true', help='Record the results as the new baselines')
+    args = parser.parse_args()
+
+    shape = f'tags={args.tags},days={args.days},ranges={args.ranges},executions={args.executions}'
+    baselines = dict()
+    if os.path.exists(BASELINES_FNAME):
+        with open(BASELINES_FNAME, 'r') as f:
+            baselines = json.load(f)
+    shape_baselines = baselines.get(shape, dict())
+
+    print(f'Preparing the data ({shape})...')
+    context = Context(args.tags, args.days, args.ranges, args.executions)
+
+    results = dict()
+    regressions = []
+    print(f'{"Benchmark":<28}{"Min (s)":>10}{"Median (s)":>12}{"Baseline (s)":>14}{"Ratio":>8}')
+    for name in (args.only or BENCHMARKS.keys()):
+        timings = measure(BENCHMARKS[name](context), repeat=args.repeat, min_time=args.min_time)
+        results[name] = timings
+
+        # The best time is the least sensitive to the load of the machine:
+        baseline = shape_baselines.get(name, {}).get('min')
+        ratio = '' if baseline is None else f'{timings["min"] / baseline:.2f}'
+        baseline_str = '' if baseline is None else f'{baseline:.5f}'
+        print(f'{name:<28}{timings["min"]:>10.5f}{timings["median"]:>12.5f}{baseline_str:>14}{ratio:>8}')
+        if baseline is None:
+            continue
+        slowdown = timings['min'] - baseline
+        if (slowdown > baseline * args.tolerance) and (slowdown > args.min_slowdown):
+            regressions.append(name)
+
+    if args.save_baselines:
+        shape_baselines.update(results)
+        baselines[shape] = shape_baselines
+        with open(BASELINES_FNAME, 'w') as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+        print(f'Baselines saved to {BASELINES_FNAME}')
+
+    elif len(regressions) > 0:
+        print(f'Regressions over the baselines: {regressions}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
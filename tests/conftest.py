@@ -0,0 +1,8 @@
+import os
+import sys
+
+import matplotlib
+matplotlib.use('Agg')
+
+# The utilities are imported the same way as in the notebooks:
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import boto3
+import pytest
+
+from botocore.awsrequest import AWSResponse
+from botocore.config import Config
+
+import lookout_equipment_instrumentation as instrumentation
+import lookout_equipment_utils as lookout
+
+@pytest.fixture
+def enabled():
+    def enable(sinks=None):
+        return instrumentation.enable_instrumentation(sinks)
+
+    yield enable
+    instrumentation.disable_instrumentation()
+
+def test_utils_reexport_the_instrumentation():
+    assert lookout.enable_instrumentation is instrumentation.enable_instrumentation
+    assert lookout.get_instrumentation is instrumentation.get_instrumentation
+    assert lookout.PrometheusTextfileSink is instrumentation.PrometheusTextfileSink
+
+def test_spans_and_counters_totals(enabled):
+    recorder = enabled()
+    with lookout._span('stage') as span:
+        span.add(rows=10)
+    recorder.record_span('stage', {}, 0.0, 2.0, {'rows': 5})
+    recorder.increment('aws.throttles', service='s3')
+    recorder.increment('aws.throttles', value=2, service='s3')
+
+    summary_df = recorder.get_summary()
+    assert summary_df.loc['stage', 'Count'] == 2
+    assert summary_df.loc['stage', 'Max'] == 2.0
+    assert recorder.get_counters() == {'stage.rows': 15, 'aws.throttles': 3}
+
+    # Nothing is recorded once disabled:
+    instrumentation.disable_instrumentation()
+    assert instrumentation.get_instrumentation() is None
+    with lookout._span('stage') as span:
+        span.add(rows=10)
+    assert recorder.get_counters() == {'stage.rows': 15, 'aws.throttles': 3}
+
+def test_prometheus_textfile_sink(tmp_path):
+    path = str(tmp_path / 'lookout.prom')
+    sink = instrumentation.PrometheusTextfileSink(path)
+    sink.record_span('aws.call', {'service': 's3', 'operation': 'PutObject'}, 0.0, 0.25, {'retries': 1})
+    sink.record_span('aws.call', {'service': 's3', 'operation': 'PutObject'}, 0.0, 0.5, {'retries': 0})
+    sink.record_counter('aws.throttles', {'error': 'say "slow"\\\n'}, 2)
+
+    # The file is only written on flush before the flush interval:
+    assert not os.path.exists(path)
+    sink.flush()
+
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert lines == [
+        '# TYPE lookout_aws_call_seconds summary',
+        'lookout_aws_call_seconds_count{operation="PutObject",service="s3"} 2',
+        'lookout_aws_call_seconds_sum{operation="PutObject",service="s3"} 0.750000',
+        '# TYPE lookout_aws_call_retries_total counter',
+        'lookout_aws_call_retries_total{operation="PutObject",service="s3"} 1',
+        '# TYPE lookout_aws_throttles_total counter',
+        'lookout_aws_throttles_total{error="say \\"slow\\"\\\\\\n"} 2',
+    ]
+    assert os.listdir(tmp_path) == ['lookout.prom']
+
+def test_logging_sink(enabled, caplog):
+    enabled([instrumentation.LoggingSink(level=logging.DEBUG)])
+    with caplog.at_level(logging.DEBUG, logger='lookout_equipment_instrumentation'):
+        with lookout._span('analysis.compute_histograms', component='pump') as span:
+            span.add(rows=3)
+        lookout.get_instrumentation().increment('aws.throttles', service='s3')
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert len(messages) == 2
+    assert messages[0].startswith('analysis.compute_histograms took ')
+    assert messages[0].endswith('s component=pump rows=3')
+    assert messages[1] == 'aws.throttles +1 service=s3'
+    assert all(record.levelno == logging.DEBUG for record in caplog.records)
+
+def test_aws_calls_are_recorded(enabled, monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    recorder = enabled()
+    client = boto3.client(
+        'lookoutequipment',
+        region_name='eu-west-1',
+        config=Config(retries={'mode': 'standard', 'max_attempts': 3})
+    )
+    instrumentation.instrument_client(client)
+
+    # Answer the first attempt with a throttling error and the retry with
+    # an empty list of models:
+    class Body:
+        def __init__(self, body):
+            self.body = json.dumps(body).encode()
+
+        def stream(self, **kwargs):
+            yield self.body
+
+    responses = [
+        (400, {'__type': 'ThrottlingException', 'message': 'Rate exceeded'}),
+        (200, {'ModelSummaries': []})
+    ]
+    def send(request, **kwargs):
+        status_code, body = responses.pop(0)
+        headers = {'Content-Type': 'application/x-amz-json-1.0'}
+        return AWSResponse(request.url, status_code, headers, Body(body))
+
+    client.meta.events.register('before-send', send)
+    assert client.list_models()['ModelSummaries'] == []
+
+    assert recorder.get_summary().loc['aws.call', 'Count'] == 1
+    assert recorder.get_counters() == {'aws.throttles': 1, 'aws.call.retries': 1}
+
+def test_parse_instrumentation_sinks(tmp_path):
+    path = str(tmp_path / 'lookout.prom')
+    sinks = instrumentation._parse_instrumentation_sinks(f'logging:debug, prometheus:{path}')
+    assert [type(sink) for sink in sinks] == [instrumentation.LoggingSink, instrumentation.PrometheusTextfileSink]
+    assert sinks[0].level == logging.DEBUG
+    assert sinks[1].path == path
+    assert instrumentation._parse_instrumentation_sinks('logging')[0].level == logging.INFO
+
+    with pytest.raises(Exception, match='needs a file path'):
+        instrumentation._parse_instrumentation_sinks('prometheus')
+    with pytest.raises(Exception, match='Unknown instrumentation sink "statsd"'):
+        instrumentation._parse_instrumentation_sinks('logging,statsd')
+
+def test_enabled_from_the_environment(tmp_path):
+    path = str(tmp_path / 'lookout.prom')
+    script = '\n'.join([
+        'import lookout_equipment_utils as lookout',
+        'recorder = lookout.get_instrumentation()',
+        'print(",".join(type(sink).__name__ for sink in recorder.sinks))',
+        'with lookout._span("stage"):',
+        '    pass',
+    ])
+    utils_path = os.path.join(os.path.dirname(__file__), '..', 'utils')
+    environment = {
+        **os.environ,
+        'PYTHONPATH': utils_path,
+        instrumentation.INSTRUMENTATION_ENVIRONMENT_VARIABLE: f'logging,prometheus:{path}'
+    }
+    process = subprocess.run(
+        [sys.executable, '-c', script], env=environment, capture_output=True, text=True, check=True
+    )
+    assert process.stdout.strip() == 'LoggingSink,PrometheusTextfileSink'
+
+    # The Prometheus file is written when the interpreter exits:
+    with open(path) as f:
+        assert 'lookout_stage_seconds_count 1' in f.read().splitlines()
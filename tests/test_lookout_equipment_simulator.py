@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from botocore.exceptions import OperationNotPageableError
+
+import lookout_equipment_utils as lookout
+import lookout_equipment_simulator as simulator
+
+@pytest.fixture
+def replay():
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2020-01-01', periods=24 * 60, freq='1min', name='Timestamp')
+    tags_df = pd.DataFrame(rng.normal(size=(len(index), 6)), index=index, columns=[f'signal-{i}' for i in range(6)])
+    tags_description = {'component-a': ['signal-0', 'signal-1', 'signal-2'], 'component-b': ['signal-3', 'signal-4', 'signal-5']}
+
+    replay = simulator.ReplaySimulator(tags_df, tags_description, speed=None, anomaly_rate=0.2)
+    scheduler = replay.add_scheduler('test-scheduler', upload_frequency='PT5M')
+
+    return replay, scheduler
+
+def test_sync_predictions_to_ranges_index(replay, tmp_path):
+    replay, scheduler = replay
+    store = lookout.PredictionsStore(str(tmp_path))
+
+    replay.run(duration='2h', interval=300)
+    first_results_df = scheduler.sync_predictions(store, s3_client=replay.s3_client)
+    assert len(first_results_df) > 0
+
+    # Only the new executions are downloaded on the next synchronization:
+    replay.run(duration='1h', interval=300)
+    new_results_df = scheduler.sync_predictions(store, s3_client=replay.s3_client)
+    assert len(new_results_df) > 0
+    assert new_results_df.index.min() > first_results_df.index.max()
+
+    # The synchronization does not change the executions listed by the scheduler:
+    assert scheduler.execution_summaries is None
+    results_df = scheduler.get_predictions(s3_client=replay.s3_client).sort_index()
+    stored_df = store.read('test-scheduler')
+    pd.testing.assert_series_equal(
+        stored_df['Predictions'], 
+        results_df['Predictions'], 
+        check_names=False, 
+        check_dtype=False, 
+        check_index_type=False
+    )
+
+    index = lookout.RangesIndex.from_store(store, 'test-scheduler')
+    expected_index = lookout.RangesIndex.from_predictions(results_df)
+    assert len(index) > 0
+    np.testing.assert_array_equal(index.starts, expected_index.starts)
+    np.testing.assert_array_equal(index.ends, expected_index.ends)
+
+    # Every anomaly of the results falls in exactly one range:
+    anomalies = results_df.index[results_df['Predictions'] == 1]
+    counts = index.count(pd.DataFrame({'start': anomalies, 'end': anomalies}))
+    assert (counts == 1).all()
+
+def test_predictions_store_drops_duplicated_timestamps(tmp_path):
+    store = lookout.PredictionsStore(str(tmp_path))
+    index = pd.date_range('2020-01-01 23:00', periods=120, freq='1min', name='Timestamp')
+    results_df = pd.DataFrame({'Predictions': np.arange(len(index)) % 2}, index=index)
+
+    # An interrupted synchronization appends the same predictions again:
+    store.append('test-scheduler', results_df)
+    store.append('test-scheduler', results_df.iloc[30:90])
+    pd.testing.assert_frame_equal(store.read('test-scheduler'), results_df, check_freq=False)
+
+    store.compact('test-scheduler')
+    store.append('test-scheduler', results_df.iloc[-10:].assign(Predictions=1))
+    expected_df = results_df.copy()
+    expected_df.iloc[-10:] = 1
+    pd.testing.assert_frame_equal(store.read('test-scheduler'), expected_df, check_freq=False)
+
+def test_local_s3_paginator():
+    s3_client = simulator.LocalS3Client()
+    s3_client.create_bucket(Bucket='bucket')
+    for i in range(25):
+        s3_client.put_object(Bucket='bucket', Key=f'prefix/{i:03d}.csv', Body=b'x')
+    s3_client.put_object(Bucket='bucket', Key='other/000.csv', Body=b'x')
+
+    pages = list(s3_client.get_paginator('list_objects_v2').paginate(Bucket='bucket', Prefix='prefix/', MaxKeys=10))
+    assert [page['KeyCount'] for page in pages] == [10, 10, 5]
+    assert [o['Key'] for o in lookout.list_s3_objects(s3_client, 'bucket', 'prefix/')] == [f'prefix/{i:03d}.csv' for i in range(25)]
+
+    with pytest.raises(OperationNotPageableError):
+        s3_client.get_paginator('list_buckets')
+
+def test_scheduler_fleet_limits_and_isolates_failures(monkeypatch):
+    index = pd.date_range('2020-01-01', periods=60, freq='1min', name='Timestamp')
+    tags_df = pd.DataFrame({'signal-0': np.arange(60.0)}, index=index)
+    replay = simulator.ReplaySimulator(tags_df, {'component': ['signal-0']}, speed=None)
+    schedulers = [replay.add_scheduler(f'scheduler-{i}') for i in range(6)]
+    with replay.patch_clients():
+        schedulers.insert(3, lookout.LookoutEquipmentScheduler('missing-scheduler', 'model', region_name='simulator'))
+        
+    # Track the stop calls in flight at the same time, 
+    # the first call of each scheduler being throttled:
+    in_flight = []
+    max_in_flight = []
+    throttled = set()
+    lock = threading.Lock()
+    stop_inference_scheduler = replay.lookout_client.stop_inference_scheduler
+    def slow_stop_inference_scheduler(**request):
+        with lock:
+            if request['InferenceSchedulerName'] not in throttled:
+                throttled.add(request['InferenceSchedulerName'])
+                raise simulator._client_error('ThrottlingException', 'Rate exceeded', 'StopInferenceScheduler')
+            in_flight.append(request['InferenceSchedulerName'])
+            max_in_flight.append(len(in_flight))
+        try:
+            time.sleep(0.02)
+            return stop_inference_scheduler(**request)
+        finally:
+            with lock:
+                in_flight.remove(request['InferenceSchedulerName'])
+    replay.lookout_client.stop_inference_scheduler = slow_stop_inference_scheduler
+    
+    # The backoffs are not waited for:
+    sleep = asyncio.sleep
+    monkeypatch.setattr(lookout.asyncio, 'sleep', lambda delay: sleep(0))
+    
+    fleet = lookout.LookoutEquipmentSchedulerFleet(schedulers, max_concurrency=2, max_retries=20, initial_delay=0, max_delay=0)
+    results_df = fleet.stop()
+    
+    assert results_df['SchedulerName'].tolist() == [scheduler.scheduler_name for scheduler in schedulers]
+    assert max(max_in_flight) == 2
+    assert (results_df['Retries'] == 1).all()
+    
+    # The missing scheduler fails without stopping the others:
+    failures_df = results_df[~results_df['Success']]
+    assert failures_df['SchedulerName'].tolist() == ['missing-scheduler']
+    assert failures_df['Error'].iloc[0].startswith('ResourceNotFoundException')
+    assert (results_df.loc[results_df['Success'], 'Status'] == 'STOPPED').all()
+    assert (fleet.get_status()['Status'].dropna() == 'STOPPED').all()
@@ -0,0 +1,568 @@
+import asyncio
+import datetime
+import gzip
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+import lookout_equipment_utils as lookout
+import lookout_equipment_simulator as simulator
+
+def _ranges(*starts):
+    starts = pd.to_datetime(list(starts))
+    return pd.DataFrame({'start': starts, 'end': starts + pd.Timedelta('1h')})
+
+@pytest.fixture
+def replay():
+    index = pd.date_range('2020-01-01', periods=60, freq='1min', name='Timestamp')
+    tags_df = pd.DataFrame({'signal-0': np.arange(60.0)}, index=index)
+
+    return simulator.ReplaySimulator(tags_df, {'component': ['signal-0']}, speed=None)
+
+def test_describe_model_ranges_cache_follows_model_updates(replay, tmp_path):
+    cache_dir = str(tmp_path)
+    replay.lookout_client.add_model('model', _ranges('2020-01-02'), _ranges('2020-01-03'))
+    
+    with replay.patch_clients():
+        response, _, predicted_ranges = lookout.describe_model_ranges('model', cache_dir=cache_dir)
+        assert predicted_ranges['start'].tolist() == [pd.Timestamp('2020-01-03')]
+        
+        # The model is trained again under the same name:
+        replay.clock.advance('1h')
+        replay.lookout_client.add_model('model', _ranges('2020-01-02'), _ranges('2020-01-04', '2020-01-05'))
+        _, _, predicted_ranges = lookout.describe_model_ranges('model', cache_dir=cache_dir)
+        assert len(predicted_ranges) == 2
+        
+        # Offline reuse of the cache, with the same types as a fresh call:
+        cached_response, _, cached_ranges = lookout.describe_model_ranges('model', cache_dir=cache_dir, validate=False)
+        pd.testing.assert_frame_equal(cached_ranges, predicted_ranges)
+        assert isinstance(cached_response['LastUpdatedTime'], datetime.datetime)
+        assert cached_response['LastUpdatedTime'] > response['LastUpdatedTime']
+
+def test_export_figures_stays_in_output_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2020-01-01', periods=600, freq='1min', name='Timestamp')
+    tags_df = pd.DataFrame(rng.normal(size=(600, 2)), index=index, columns=['../escape', 'pump/flow'])
+    replay = simulator.ReplaySimulator(tags_df, {'component': list(tags_df.columns)}, speed=None)
+    replay.lookout_client.add_model('model', _ranges('2020-01-01 03:00'), _ranges('2020-01-01 06:00'))
+    
+    with replay.patch_clients():
+        analysis = lookout.LookoutEquipmentAnalysis('model', tags_df)
+        analysis.set_time_periods(index[300], index[-1], index[0], index[299])
+        analysis.compute_histograms()
+        figures_df = analysis.export_figures(str(tmp_path / 'figures'), kinds='histogram')
+        
+    assert len(figures_df) == 2
+    for file_name in figures_df['File']:
+        assert os.path.dirname(os.path.abspath(file_name)) == str(tmp_path / 'figures')
+        assert os.path.exists(file_name)
+        
+    with pytest.raises(Exception, match='Unknown figure kind'):
+        analysis.export_figures(str(tmp_path / 'figures'), kinds=('histogram', 'scatter'))
+
+def test_signal_views_do_not_write_to_the_source(replay):
+    tags_df = pd.DataFrame({'signal-0': np.arange(60.0)}, index=pd.date_range('2020-01-01', periods=60, freq='1min'))
+    with replay.patch_clients():
+        analysis = lookout.LookoutEquipmentAnalysis('model', tags_df)
+        
+    tag_df = analysis.df_list['signal-0']
+    try:
+        tag_df.iloc[0, 0] = -1.0
+    except ValueError:
+        pass
+    assert tags_df.iloc[0, 0] == 0.0
+    assert analysis.tags_values[0, 0] == 0.0
+
+def test_vectorized_distances_match_the_per_signal_loop():
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2020-01-01', periods=2000, freq='1min', name='Timestamp')
+    values = rng.normal(size=(2000, 8)) * rng.uniform(0.1, 10.0, size=8)
+    values[1000:1200] += rng.uniform(0.0, 3.0, size=8)
+    tags_df = pd.DataFrame(values, index=index, columns=[f'signal-{i}' for i in range(8)])
+    replay = simulator.ReplaySimulator(tags_df, {'component': list(tags_df.columns)}, speed=None)
+    replay.lookout_client.add_model('model', _ranges('2020-01-01 03:00'), _ranges('2020-01-01 16:40', '2020-01-01 18:00'))
+    
+    with replay.patch_clients():
+        analysis = lookout.LookoutEquipmentAnalysis('model', tags_df)
+        analysis.set_time_periods(index[1000], index[-1], index[0], index[999])
+        analysis.compute_histograms(vectorized=False)
+        legacy_rank = analysis.rank
+        analysis.compute_histograms(vectorized=True)
+    
+    # The vectorized bins always have num_bins bins, the legacy loop gets one
+    # more when np.arange() rounds up: the distances differ slightly.
+    for tag, distance in legacy_rank.items():
+        assert analysis.rank[tag] == pytest.approx(distance, abs=1e-3)
+    assert list(analysis.rank)[0] == list(legacy_rank)[0]
+
+def test_fan_out_listing_only_shards_multiple_pages(replay):
+    for i in range(30):
+        replay.lookout_client.add_model(f'model-{i:02d}', _ranges('2020-01-02'), _ranges('2020-01-03'))
+    calls = []
+    list_models = replay.lookout_client.list_models
+    def counting_list_models(**request):
+        calls.append(request)
+        return list_models(**request)
+    replay.lookout_client.list_models = counting_list_models
+    
+    with replay.patch_clients():
+        models_list = lookout.list_models_for_datasets('model-0', fan_out=True)
+        assert models_list == [f'model-{i:02d}' for i in range(10)]
+        assert len(calls) == 1
+        
+        calls.clear()
+        models_list = lookout.list_models_for_datasets('model-', max_results=10, fan_out=True)
+        assert models_list == [f'model-{i:02d}' for i in range(30)]
+        assert len(calls) > len(lookout.RESOURCE_NAME_CHARACTERS)
+        
+        # A model named like the prefix is found in the first page, which 
+        # is kept: no describe call is needed to find it.
+        replay.lookout_client.add_model('model-', _ranges('2020-01-02'), _ranges('2020-01-03'))
+        describe_model = replay.lookout_client.describe_model
+        def failing_describe_model(**request):
+            raise AssertionError(f'Unexpected describe_model call: {request}')
+        replay.lookout_client.describe_model = failing_describe_model
+        models_list = lookout.list_models_for_datasets('model-', max_results=10, fan_out=True)
+        replay.lookout_client.describe_model = describe_model
+        assert models_list == ['model-'] + [f'model-{i:02d}' for i in range(30)]
+
+def test_fetch_s3_objects_caches_nested_keys(tmp_path):
+    s3_client = simulator.LocalS3Client()
+    s3_client.create_bucket(Bucket='bucket')
+    s3_objects = [{'Bucket': 'bucket', 'Key': key} for key in ['a/b', 'a/b/c', '../a', 'a//b']]
+    for s3_object in s3_objects:
+        s3_client.put_object(Body=s3_object['Key'].encode(), **s3_object)
+        
+    # The cache is filled, then read back without querying S3:
+    for revalidate in [True, False]:
+        contents = lookout.fetch_s3_objects(s3_objects, s3_client=s3_client, cache_dir=str(tmp_path / 'cache'), revalidate=revalidate)
+        assert contents == [s3_object['Key'].encode() for s3_object in s3_objects]
+    assert os.listdir(tmp_path) == ['cache']
+    
+    s3_client.put_object(Bucket='bucket', Key='a/b', Body=b'new')
+    contents = lookout.fetch_s3_objects(s3_objects[:1], s3_client=s3_client, cache_dir=str(tmp_path / 'cache'))
+    assert contents == [b'new']
+
+def test_evaluate_ranges_f1_without_ranges():
+    labelled_ranges = _ranges('2020-01-02', '2020-01-04')
+    metrics, _, _ = lookout.evaluate_ranges(labelled_ranges, _ranges('2020-01-03'))
+    assert (metrics['event_precision'], metrics['event_recall'], metrics['event_f1']) == (0.0, 0.0, 0.0)
+    
+    metrics, _, _ = lookout.evaluate_ranges(labelled_ranges, _ranges())
+    assert np.isnan(metrics['event_precision'])
+    assert np.isnan(metrics['event_f1'])
+    
+    metrics, _, _ = lookout.evaluate_ranges(_ranges(), _ranges('2020-01-03'))
+    assert np.isnan(metrics['event_recall'])
+    assert np.isnan(metrics['event_f1'])
+    
+    metrics, _, _ = lookout.evaluate_ranges(labelled_ranges, _ranges('2020-01-02', '2020-01-03'))
+    assert metrics['event_f1'] == pytest.approx(0.5)
+
+def test_export_components_rejects_tags_needing_quotes(tmp_path):
+    index = pd.date_range('2020-01-01', periods=3, freq='1min', name='Timestamp')
+    tags_df = pd.DataFrame({'flow': [1.0, np.nan, 3.0], 'pressure, bar': 0.0}, index=index)
+    
+    component_files = lookout.export_components(tags_df[['flow']], {'pump': ['flow']}, str(tmp_path))
+    with open(component_files['pump']) as f:
+        assert f.read().splitlines() == [
+            'Timestamp,flow', '2020-01-01T00:00:00.000000,1', '2020-01-01T00:01:00.000000,', '2020-01-01T00:02:00.000000,3'
+        ]
+        
+    with pytest.raises(Exception, match='Tag names cannot contain'):
+        lookout.export_components(tags_df, {'valve': list(tags_df.columns)}, str(tmp_path))
+    assert not os.path.exists(tmp_path / 'valve')
+
+def _legacy_mask(index, ranges_df):
+    mask = pd.Series(0.0, index=index)
+    for _, row in ranges_df.iterrows():
+        mask.loc[row['start']:row['end']] = 1.0
+        
+    return mask.values == 1.0
+
+def _legacy_ranges(index, mask):
+    ranges, start, previous = [], None, None
+    for timestamp, value in zip(index, mask):
+        if value and (start is None):
+            start = timestamp
+        elif (not value) and (start is not None):
+            ranges.append((start, previous))
+            start = None
+        previous = timestamp
+    if start is not None:
+        ranges.append((start, previous))
+        
+    return pd.DataFrame(ranges, columns=['start', 'end'])
+
+@pytest.mark.parametrize('tz', [None, 'UTC', 'Europe/Paris'])
+def test_ranges_to_mask_matches_the_loc_loop(tz):
+    index = pd.date_range('2020-01-01', periods=14, freq='1min', tz=tz)
+    ranges_df = pd.DataFrame([
+        ('2020-01-01 00:02', '2020-01-01 00:12'),   # Overlapped by the next ones
+        ('2020-01-01 00:10', '2020-01-01 00:05'),   # Reversed
+        ('2020-01-01 00:03', '2020-01-01 00:04'),
+        ('2019-12-31 23:00', '2020-01-01 00:00'),   # Starts before the index
+        ('2020-01-01 00:13', '2020-01-02 00:00'),   # Ends after the index
+        ('2020-01-02 00:00', '2020-01-03 00:00'),   # Out of the index
+    ], columns=['start', 'end'])
+    
+    # Naive ranges are given as strings to the legacy loop, which then
+    # reads them in the time zone of the index:
+    mask = lookout.ranges_to_mask(index, ranges_df.apply(pd.to_datetime))
+    expected_mask = _legacy_mask(index, ranges_df)
+    np.testing.assert_array_equal(mask, expected_mask)
+    assert mask.tolist() == [True] + [False] + [True] * 12
+    
+    ranges_df = lookout.mask_to_ranges(index, mask)
+    pd.testing.assert_frame_equal(ranges_df, _legacy_ranges(index, mask))
+    np.testing.assert_array_equal(lookout.ranges_to_mask(index, ranges_df), mask)
+
+def test_mask_to_ranges_matches_the_loop():
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2020-01-01', periods=500, freq='1min', tz='UTC')
+    for mask in [rng.random(500) > 0.7, np.ones(500, dtype=bool), np.zeros(500, dtype=bool)]:
+        ranges_df = lookout.mask_to_ranges(index, mask)
+        pd.testing.assert_frame_equal(ranges_df, _legacy_ranges(index, mask), check_index_type=False, check_dtype=False)
+        np.testing.assert_array_equal(lookout.ranges_to_mask(index, ranges_df), mask)
+
+@pytest.mark.parametrize('backend', ['process', 'thread'])
+def test_parallel_distances_match_the_serial_computation(backend):
+    rng = np.random.default_rng(0)
+    values = np.asfortranarray(rng.normal(size=(1000, 7)))
+    values[::13, 2] = np.nan
+    values[:, 5] = 1.0
+    anomaly_mask = np.zeros(1000, dtype=bool)
+    anomaly_mask[600:700] = True
+    normal_mask = ~anomaly_mask
+    
+    expected = lookout.compute_signal_distances(values, normal_mask, anomaly_mask, num_bins=20)
+    results = lookout.compute_signal_distances_parallel(values, normal_mask, anomaly_mask, num_bins=20, n_jobs=3, backend=backend)
+    for result, expected_result in zip(results, expected):
+        np.testing.assert_array_equal(result, expected_result)
+
+@pytest.mark.parametrize('backend', ['process', 'thread'])
+def test_parallel_export_matches_the_serial_export(tmp_path, backend):
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2020-01-01', periods=100, freq='1min', name='Timestamp')
+    tags_df = pd.DataFrame(rng.normal(size=(100, 10)), index=index, columns=[f'signal-{i}' for i in range(10)])
+    tags_description = {f'component-{i}': [f'signal-{i}', f'signal-{9 - i}'] for i in range(5)}
+    
+    expected_files = lookout.export_components(tags_df, tags_description, str(tmp_path / 'serial'))
+    component_files = lookout.export_components(tags_df, tags_description, str(tmp_path / backend), max_workers=2, backend=backend)
+    assert list(component_files) == list(expected_files)
+    for component, fname in component_files.items():
+        with open(fname) as f, open(expected_files[component]) as expected_f:
+            assert f.read() == expected_f.read()
+
+def _describe_sequence(*statuses):
+    responses = iter(statuses)
+    def describe():
+        status = next(responses)
+        if isinstance(status, Exception):
+            raise status
+        return {'Status': status}
+        
+    return describe
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    async def sleep(delay):
+        sleeps.append(delay)
+    # The module imports asyncio lazily, through a copy of its namespace:
+    monkeypatch.setattr(lookout.asyncio, 'sleep', sleep)
+    
+    return sleeps
+
+def test_wait_for_status_until_a_terminal_status(sleeps):
+    throttling = ClientError({'Error': {'Code': 'ThrottlingException'}}, 'DescribeModel')
+    describe = _describe_sequence('IN_PROGRESS', throttling, 'IN_PROGRESS', 'SUCCESS')
+    statuses = []
+    
+    response = asyncio.run(lookout.wait_for_status(
+        describe, ['IN_PROGRESS'], callback=lambda status, response: statuses.append(status)
+    ))
+    assert response == {'Status': 'SUCCESS'}
+    assert statuses == ['IN_PROGRESS', 'IN_PROGRESS', 'SUCCESS']
+    assert len(sleeps) == 3
+
+def test_wait_for_status_returns_failures(sleeps):
+    statuses = []
+    async def callback(status, response):
+        statuses.append(status)
+        
+    response = asyncio.run(lookout.wait_for_status(_describe_sequence('IN_PROGRESS', 'FAILED'), ['IN_PROGRESS'], callback=callback))
+    assert response == {'Status': 'FAILED'}
+    assert statuses == ['IN_PROGRESS', 'FAILED']
+    
+    # Other errors than throttling are not retried:
+    error = ClientError({'Error': {'Code': 'ResourceNotFoundException'}}, 'DescribeModel')
+    with pytest.raises(ClientError):
+        asyncio.run(lookout.wait_for_status(_describe_sequence('IN_PROGRESS', error), ['IN_PROGRESS']))
+
+def test_wait_for_status_caps_the_backoff(sleeps):
+    describe = _describe_sequence(*(['IN_PROGRESS'] * 20 + ['SUCCESS']))
+    asyncio.run(lookout.wait_for_status(describe, ['IN_PROGRESS'], initial_delay=1, max_delay=8, backoff_factor=2))
+    
+    # The delay doubles up to max_delay, each sleep being jittered between
+    # half the delay and the delay:
+    delays = [1, 2, 4] + [8] * 17
+    assert len(sleeps) == len(delays)
+    for sleep_time, delay in zip(sleeps, delays):
+        assert delay / 2 <= sleep_time <= delay
+
+def test_wait_for_status_timeout():
+    describe = lambda: {'Status': 'IN_PROGRESS'}
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(lookout.wait_for_status(describe, ['IN_PROGRESS'], timeout=0.05, initial_delay=0.01, max_delay=0.02))
+
+def test_train_model_async(monkeypatch, sleeps):
+    class FakeClient:
+        def create_model(self, **request):
+            self.model_request = request
+            self.describe_model = lambda ModelName: next(responses)
+    client = FakeClient()
+    responses = iter([{'ModelName': 'model', 'Status': status} for status in ['IN_PROGRESS', 'IN_PROGRESS', 'SUCCESS']])
+    monkeypatch.setattr(lookout, 'get_client', lambda region_name: client)
+    
+    response = asyncio.run(lookout.train_model_async({'ModelName': 'model', 'DatasetName': 'dataset'}))
+    assert client.model_request == {'ModelName': 'model', 'DatasetName': 'dataset'}
+    assert response['Status'] == 'SUCCESS'
+    assert len(sleeps) == 2
+
+def test_ingest_data_async(monkeypatch, sleeps):
+    class FakeClient:
+        def describe_data_ingestion_job(self, JobId):
+            return next(responses)
+    responses = iter([{'JobId': 'job', 'Status': status} for status in ['IN_PROGRESS', 'FAILED']])
+    monkeypatch.setattr(lookout, 'get_client', lambda region_name: FakeClient())
+    monkeypatch.setattr(lookout, 'ingest_data', lambda *args: ('job', 'IN_PROGRESS'))
+    
+    response = asyncio.run(lookout.ingest_data_async('role', 'dataset', 'bucket', 'prefix'))
+    assert response == {'JobId': 'job', 'Status': 'FAILED'}
+
+def test_compute_etag_matches_s3(tmp_path):
+    fname = str(tmp_path / 'data.bin')
+    with open(fname, 'wb') as f:
+        f.write(bytes(range(256)) * 12 * 4096)
+        
+    # ETags of this 12 MB file on S3, sent in one part or in 8 MB parts:
+    assert lookout.compute_etag(fname, multipart_threshold=16 * 1024 * 1024) == 'ee8e104a3ce4b8f60f0e0106f20f51a4'
+    assert lookout.compute_etag(fname) == 'ced53fb2e4a477a442f2b7ad14abff57-2'
+    
+    # Parts are at least 5 MB, whatever the chunk size requested:
+    assert lookout.compute_etag(fname, multipart_chunksize=1024 * 1024) == lookout.compute_etag(fname, multipart_chunksize=5 * 1024 * 1024)
+
+def test_upload_to_s3_skips_unchanged_files(tmp_path):
+    source = tmp_path / 'dataset'
+    os.makedirs(source / 'component')
+    with open(source / 'component' / 'small.csv', 'wb') as f:
+        f.write(b'Timestamp,signal\n')
+    with open(source / 'component' / 'large.csv', 'wb') as f:
+        f.write(bytes(range(256)) * 12 * 4096)
+    s3_client = simulator.LocalS3Client()
+    s3_client.create_bucket(Bucket='bucket')
+    
+    uploads_df = lookout.upload_to_s3(str(source), 'bucket', 'prefix', s3_client=s3_client)
+    assert uploads_df['Status'].tolist() == ['uploaded', 'uploaded']
+    assert s3_client.head_object(Bucket='bucket', Key='prefix/component/large.csv')['ETag'] == '"ced53fb2e4a477a442f2b7ad14abff57-2"'
+    
+    uploads_df = lookout.upload_to_s3(str(source), 'bucket', 'prefix', s3_client=s3_client)
+    assert uploads_df['Status'].tolist() == ['skipped', 'skipped']
+    
+    # A file changed without changing its size is sent again:
+    with open(source / 'component' / 'large.csv', 'r+b') as f:
+        f.seek(10 * 1024 * 1024)
+        f.write(b'changed')
+    uploads_df = lookout.upload_to_s3(str(source), 'bucket', 'prefix', s3_client=s3_client)
+    assert uploads_df.set_index('Key')['Status'].to_dict() == {'prefix/component/large.csv': 'uploaded', 'prefix/component/small.csv': 'skipped'}
+    s3_object = s3_client.get_object(Bucket='bucket', Key='prefix/component/large.csv')
+    assert s3_object['Body'].read()[10 * 1024 * 1024:][:7] == b'changed'
+
+def _write_component_files(root_dir, files):
+    for relative_path, content in files.items():
+        fname = os.path.join(root_dir, *relative_path.split('/'))
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        with open(fname, 'wb') as f:
+            f.write(gzip.compress(content) if fname.endswith('.gz') else content)
+
+def test_infer_component_fields_types(tmp_path):
+    long_header = 'Timestamp,' + ','.join(f'signal-{i}' for i in range(50))
+    _write_component_files(str(tmp_path), {
+        'pump/pump.csv': b'Timestamp,flow,pressure\n2020-01-01T00:00:00,1.5,\n2020-01-01T00:01:00,-2e3,3\n',
+        'pump/pump-2.csv.gz': b'Timestamp,flow,temperature\n2020-01-01T00:02:00,1,20\n',
+        'valve/valve.csv.gz': (long_header + '\n' + '2020-01-01T00:00:00' + ',0.5' * 50 + '\n').encode(),
+        'fan.csv': b'\xef\xbb\xbfTimestamp,speed',
+        'empty/empty.csv': b''
+    })
+    
+    # Headers longer than the first read and a header without line break:
+    component_fields_map = lookout.infer_component_fields(str(tmp_path), sample_rows=2, header_bytes=16)
+    assert component_fields_map == {
+        'fan': ['Timestamp', 'speed'],
+        'pump': ['Timestamp', 'flow', 'temperature', 'pressure'],
+        'valve': long_header.split(',')
+    }
+    
+    _write_component_files(str(tmp_path), {'pump/pump-3.csv': b'Timestamp,flow,status\n2020-01-01T00:03:00,1,OPEN\n'})
+    assert lookout.infer_component_fields(str(tmp_path)) == lookout.infer_component_fields(str(tmp_path), sample_rows=0)
+    with pytest.raises(Exception, match=r"non numeric values: \['pump/status'\]"):
+        lookout.infer_component_fields(str(tmp_path), sample_rows=5)
+
+def test_infer_component_fields_from_s3():
+    s3_client = simulator.LocalS3Client()
+    s3_client.create_bucket(Bucket='bucket')
+    content = b'Timestamp,' + b','.join(b'signal-%d' % i for i in range(2000)) + b'\n'
+    s3_client.put_object(Bucket='bucket', Key='dataset/pump/pump.csv.gz', Body=gzip.compress(content * 3))
+    s3_client.put_object(Bucket='bucket', Key='dataset/valve/valve.csv', Body=b'Timestamp,position\n')
+    s3_client.put_object(Bucket='bucket', Key='other/fan/fan.csv', Body=b'Timestamp,speed\n')
+    
+    component_fields_map = lookout.infer_component_fields('s3://bucket/dataset', header_bytes=64, s3_client=s3_client)
+    assert component_fields_map == {'pump': content.decode().strip().split(','), 'valve': ['Timestamp', 'position']}
+
+@pytest.mark.parametrize('header', [b'Timestamp,flow,flow', b'Timestamp,,flow', b'Timestamp,flow, '])
+def test_infer_component_fields_malformed_headers(tmp_path, header):
+    _write_component_files(str(tmp_path), {'pump/pump.csv': header + b'\n2020-01-01T00:00:00,1,2\n'})
+    with pytest.raises(Exception, match='Empty or duplicated field names in the header of pump/pump.csv'):
+        lookout.infer_component_fields(str(tmp_path))
+
+def test_input_file_names(replay, tmp_path):
+    scheduler = replay.add_scheduler('scheduler')
+    producer = lookout.InferenceInputProducer(scheduler, {'pump': ['signal-0']}, output_dir=str(tmp_path))
+    naive_time = pd.Timestamp('2020-01-01 12:00')
+    utc_time = pd.Timestamp('2020-01-01 10:00', tz='UTC')
+    
+    # Naive times are already in the time zone of the scheduler:
+    scheduler.timezone_offset = '+02:00'
+    assert producer.get_file_name('pump', naive_time) == 'pump_20200101120000.csv'
+    assert producer.get_file_name('pump', utc_time) == 'pump_20200101120000.csv'
+    assert producer.get_file_name('pump', utc_time.tz_convert('America/New_York')) == 'pump_20200101120000.csv'
+    
+    scheduler.component_delimiter = '-'
+    scheduler.timestamp_format = 'yyyy-MM-dd-HH-mm-ss'
+    assert producer.get_file_name('pump', utc_time) == 'pump-2020-01-01-12-00-00.csv'
+    
+    scheduler.timestamp_format = 'EPOCH'
+    assert producer.get_file_name('pump', utc_time) == 'pump-1577872800.csv'
+    assert producer.get_file_name('pump', naive_time) == 'pump-1577872800.csv'
+    assert simulator._parse_file_timestamp('1577872800', 'EPOCH', pd.Timedelta(hours=2)) == naive_time
+    
+    scheduler.timestamp_format = 'yyyyMMdd'
+    with pytest.raises(Exception, match='Unknown timestamp format'):
+        producer.get_file_name('pump', utc_time)
+
+def test_input_files_use_the_scheduler_time_zone(replay, tmp_path):
+    scheduler = replay.add_scheduler('scheduler')
+    scheduler.timezone_offset = '-05:30'
+    producer = lookout.InferenceInputProducer(scheduler, {'pump': ['signal-0']}, output_dir=str(tmp_path))
+    index = pd.date_range('2020-01-01 10:00', periods=10, freq='1min', tz='UTC', name='Timestamp')
+    tags_df = pd.DataFrame({'signal-0': np.arange(10.0)}, index=index)
+    
+    files = producer.produce(tags_df, index[0])
+    assert [os.path.basename(f) for f in files] == ['pump_20200101043000.csv']
+    with open(files[0]) as f:
+        assert f.read().splitlines()[1] == '2020-01-01T04:30:00.000000,0'
+
+def test_model_comparison_matches_the_analysis_of_each_model():
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2020-01-01', periods=3000, freq='1min', name='Timestamp')
+    values = rng.normal(size=(3000, 6)) * rng.uniform(0.1, 10.0, size=6)
+    values[2000:2300] += rng.uniform(0.0, 3.0, size=6)
+    tags_df = pd.DataFrame(values, index=index, columns=[f'signal-{i}' for i in range(6)])
+    replay = simulator.ReplaySimulator(tags_df, {'component': list(tags_df.columns)}, speed=None)
+    
+    labelled_ranges = _ranges('2020-01-02 09:00', '2020-01-02 20:00')
+    predicted_ranges = {
+        'model-a': _ranges('2020-01-02 09:30'),
+        # A false alarm and a range starting before the second event:
+        'model-b': _ranges('2020-01-02 09:50', '2020-01-02 16:00', '2020-01-02 19:30')
+    }
+    for model_name, ranges_df in predicted_ranges.items():
+        replay.lookout_client.add_model(
+            model_name, labelled_ranges, ranges_df, 
+            training_start=index[0], training_end=index[1499], evaluation_start=index[1500], evaluation_end=index[-1]
+        )
+        
+    with replay.patch_clients():
+        comparison = lookout.LookoutEquipmentModelComparison(tags_df, model_names=list(predicted_ranges))
+        comparison_df = comparison.compare()
+        ranks_df = comparison.get_ranks()
+        
+        for model_name, ranges_df in predicted_ranges.items():
+            analysis = lookout.LookoutEquipmentAnalysis(model_name, tags_df)
+            analysis.set_time_periods(index[1500], index[-1], index[0], index[1499])
+            analysis.compute_histograms()
+            for tag, distance in analysis.rank.items():
+                assert ranks_df.loc[tag, model_name] == pytest.approx(distance, rel=1e-9)
+            assert comparison_df.loc[model_name, 'TopSignals'] == list(analysis.rank)[:3]
+            assert comparison_df.loc[model_name, 'Coverage'] == analysis.anomaly_mask.sum() / 1500
+            
+            # The overlap counts of a ranges index give the same events:
+            metrics, events_df, false_alarms_df = lookout.evaluate_ranges(labelled_ranges, ranges_df, index[1500], index[-1])
+            counts = lookout.RangesIndex(ranges_df).count(labelled_ranges)
+            np.testing.assert_array_equal(counts > 0, events_df['Detected'])
+            false_alarms = lookout.RangesIndex(labelled_ranges).count(ranges_df) == 0
+            assert false_alarms.sum() == len(false_alarms_df) == comparison_df.loc[model_name, 'FalseAlarms']
+            assert comparison_df.loc[model_name, 'PredictedRanges'] == len(ranges_df)
+            assert comparison_df.loc[model_name, 'EventRecall'] == metrics['event_recall']
+            assert comparison_df.loc[model_name, 'EventPrecision'] == metrics['event_precision']
+
+def test_drop_duplicated_timestamps_keeps_the_last_prediction():
+    index = pd.to_datetime(['2020-01-01 00:02', '2020-01-01 00:00', '2020-01-01 00:01', '2020-01-01 00:00'])
+    results_df = pd.DataFrame({'Predictions': [0, 0, 1, 1]}, index=index)
+    
+    results_df = lookout._drop_duplicated_timestamps(results_df)
+    assert results_df.index.tolist() == list(pd.to_datetime(['2020-01-01 00:00', '2020-01-01 00:01', '2020-01-01 00:02']))
+    assert results_df['Predictions'].tolist() == [1, 1, 0]
+    
+def test_predictions_store_reads_overlapping_partitions_once(tmp_path):
+    store = lookout.PredictionsStore(str(tmp_path))
+    index = pd.date_range('2020-01-01 22:00', periods=240, freq='1min', name='Timestamp')
+    
+    # Three appends overlapping each other and the two daily partitions,
+    # the last one appended overriding the previous predictions:
+    appends = [(index[:150], 0), (index[100:200], 1), (index[120:130], 0)]
+    for append_index, value in appends:
+        store.append('scheduler', pd.DataFrame({'Predictions': value}, index=append_index))
+    assert len(os.listdir(os.path.join(store._scheduler_dir('scheduler'), 'date=2020-01-02'))) == 3
+    
+    expected_df = pd.DataFrame({'Predictions': 0}, index=index[:200])
+    expected_df.iloc[100:120] = 1
+    expected_df.iloc[130:200] = 1
+    results_df = store.read('scheduler')
+    assert results_df.index.is_unique
+    pd.testing.assert_frame_equal(results_df, expected_df, check_freq=False)
+    
+    # Reading a time range removes the same duplicates:
+    pd.testing.assert_frame_equal(
+        store.read('scheduler', '2020-01-02 00:00', '2020-01-02 01:00'), 
+        expected_df.loc['2020-01-02 00:00':'2020-01-02 01:00'], 
+        check_freq=False
+    )
+    ranges_df = store.read_ranges('scheduler')
+    assert ranges_df['start'].tolist() == [index[100], index[130]]
+    assert ranges_df['end'].tolist() == [index[119], index[199]]
+
+def test_clients_cache_keys_on_the_configuration():
+    lookout.clear_clients_cache()
+    try:
+        client = lookout.get_s3_client(config=Config(retries={'mode': 'standard'}))
+        assert lookout.get_s3_client(config=Config(retries={'mode': 'standard'})) is client
+        assert lookout.get_s3_client(config=Config(retries={'mode': 'adaptive'})) is not client
+        assert lookout.get_s3_client() is not client
+        
+        # An option given explicitly overrides the max_pool_connections 
+        # argument, a default option does not:
+        client = lookout.get_s3_client(max_pool_connections=50, config=Config())
+        assert client.meta.config.max_pool_connections == 50
+        other_client = lookout.get_s3_client(max_pool_connections=50, config=Config(max_pool_connections=10))
+        assert other_client is not client
+        assert other_client.meta.config.max_pool_connections == 10
+        assert lookout.get_s3_client(max_pool_connections=10) is other_client
+    finally:
+        lookout.clear_clients_cache()
@@ -0,0 +1,564 @@
+# Standard python imports:
+import atexit
+import functools
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+# Error codes of the throttled AWS calls:
+THROTTLING_ERROR_CODES = ['ThrottlingException', 'TooManyRequestsException', 'RequestLimitExceeded']
+
+# Instrumentation is disabled by default (see enable_instrumentation()). It
+# can also be enabled without code change with this environment variable,
+# for instance LOOKOUT_INSTRUMENTATION="logging,prometheus:/tmp/lookout.prom"
+INSTRUMENTATION_ENVIRONMENT_VARIABLE = 'LOOKOUT_INSTRUMENTATION'
+_instrumentation = None
+
+class InstrumentationSink:
+    """
+    Base class of the destinations of the instrumentation records. A sink
+    only overrides the methods it needs.
+    
+    METHODS
+    =======
+        record_span():
+            Called each time a timed operation ends
+            
+        record_counter():
+            Called each time a counter is incremented
+            
+        flush():
+            Called to write the records kept in memory by the sink
+    """
+    def record_span(self, name, labels, start_time, duration, amounts):
+        """
+        Record a timed operation.
+        
+        PARAMS
+        ======
+            name: string
+                Name of the operation (aws.call, analysis.compute_histograms...)
+                
+            labels: dict
+                Attributes of the operation with a small number of possible
+                values (AWS service and operation, error...)
+                
+            start_time: float
+                Start of the operation in seconds since the epoch
+                
+            duration: float
+                Duration of the operation in seconds
+                
+            amounts: dict
+                Quantities processed by the operation (rows, bytes...)
+        """
+        pass
+        
+    def record_counter(self, name, labels, value):
+        """
+        Record the increment of a counter (aws.throttles for instance).
+        """
+        pass
+        
+    def flush(self):
+        pass
+
+class LoggingSink(InstrumentationSink):
+    """
+    Log each timed operation and each counter increment.
+    
+    ATTRIBUTES
+    ==========
+        logger: logging.Logger
+            Logger to use (the logger of this module by default)
+            
+        level: integer
+            Level of the log records (logging.INFO by default)
+    """
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.level = level
+        
+    def record_span(self, name, labels, start_time, duration, amounts):
+        if self.logger.isEnabledFor(self.level):
+            details = ' '.join(f'{key}={value}' for key, value in {**labels, **amounts}.items())
+            self.logger.log(self.level, '%s took %.3fs %s', name, duration, details)
+        
+    def record_counter(self, name, labels, value):
+        if self.logger.isEnabledFor(self.level):
+            details = ' '.join(f'{key}={value}' for key, value in labels.items())
+            self.logger.log(self.level, '%s +%s %s', name, value, details)
+            
+class PrometheusTextfileSink(InstrumentationSink):
+    """
+    Aggregate the records and write them in the Prometheus text format, to
+    a file collected by the textfile collector of the node exporter. Each
+    operation gives a summary of its durations (<prefix>_<name>_seconds) 
+    and a counter for each of its amounts (<prefix>_<name>_<amount>_total).
+    
+    ATTRIBUTES
+    ==========
+        path: string
+            Path of the file to write (replaced atomically)
+            
+        prefix: string
+            Prefix of the metric names (default: 'lookout')
+            
+        flush_interval: float
+            Minimum number of seconds between two writes of the file while 
+            recording (default: 15). The file is also written on flush()
+    """
+    def __init__(self, path, prefix='lookout', flush_interval=15.0):
+        self.path = path
+        self.prefix = prefix
+        self.flush_interval = flush_interval
+        self._summaries = dict()
+        self._counters = dict()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        
+    def _metric_name(self, name, suffix):
+        return re.sub('[^a-zA-Z0-9_]', '_', f'{self.prefix}_{name}_{suffix}')
+        
+    def record_span(self, name, labels, start_time, duration, amounts):
+        labels = tuple(sorted(labels.items()))
+        with self._lock:
+            summary = self._summaries.setdefault((self._metric_name(name, 'seconds'), labels), [0, 0.0])
+            summary[0] += 1
+            summary[1] += duration
+            for amount, value in amounts.items():
+                key = (self._metric_name(f'{name}_{amount}', 'total'), labels)
+                self._counters[key] = self._counters.get(key, 0) + value
+                
+        self._flush_if_due()
+        
+    def record_counter(self, name, labels, value):
+        key = (self._metric_name(name, 'total'), tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            
+        self._flush_if_due()
+        
+    def _flush_if_due(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+            
+    def flush(self):
+        with self._lock:
+            self._last_flush = time.monotonic()
+            lines = []
+            for metric_type, metrics in [('summary', self._summaries), ('counter', self._counters)]:
+                declared = set()
+                for (metric, labels), value in sorted(metrics.items()):
+                    if metric not in declared:
+                        lines.append(f'# TYPE {metric} {metric_type}')
+                        declared.add(metric)
+                    labels = _format_prometheus_labels(labels)
+                    if metric_type == 'summary':
+                        lines.append(f'{metric}_count{labels} {value[0]}')
+                        lines.append(f'{metric}_sum{labels} {value[1]:.6f}')
+                    else:
+                        lines.append(f'{metric}{labels} {value}')
+                        
+            # The collector must never read a partially written file:
+            tmp_fname = f'{self.path}.{uuid.uuid4().hex}.tmp'
+            with open(tmp_fname, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.replace(tmp_fname, self.path)
+            
+def _format_prometheus_labels(labels):
+    """
+    Format a tuple of (name, value) pairs as Prometheus labels.
+    """
+    if len(labels) == 0:
+        return ''
+        
+    escaped = [
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) 
+        for name, value in labels
+    ]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+    
+class OpenTelemetrySink(InstrumentationSink):
+    """
+    Forward the records to OpenTelemetry: each timed operation becomes a 
+    span (with its labels and amounts as attributes) and a duration 
+    histogram, each amount and counter becomes an OpenTelemetry counter.
+    The exporters are configured by the application, through the global
+    tracer and meter providers or the ones given to this sink. This sink
+    needs the opentelemetry-api package.
+    
+    ATTRIBUTES
+    ==========
+        tracer: opentelemetry.trace.Tracer
+            Tracer used to create the spans
+            
+        meter: opentelemetry.metrics.Meter
+            Meter used to create the counters and histograms
+    """
+    def __init__(self, tracer_provider=None, meter_provider=None):
+        try:
+            from opentelemetry import metrics, trace
+        except ImportError:
+            raise Exception('The OpenTelemetry sink needs the opentelemetry-api package: pip install opentelemetry-api')
+            
+        self._trace = trace
+        self.tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
+        self.meter = metrics.get_meter(__name__, meter_provider=meter_provider)
+        self._instruments = dict()
+        self._lock = threading.Lock()
+        
+    def _get_instrument(self, kind, name, unit):
+        with self._lock:
+            instrument = self._instruments.get((kind, name))
+            if instrument is None:
+                if kind == 'histogram':
+                    instrument = self.meter.create_histogram(name, unit=unit)
+                else:
+                    instrument = self.meter.create_counter(name, unit=unit)
+                self._instruments[(kind, name)] = instrument
+                
+        return instrument
+        
+    def record_span(self, name, labels, start_time, duration, amounts):
+        start_time_ns = int(start_time * 1e9)
+        span = self.tracer.start_span(name, start_time=start_time_ns, attributes={**labels, **amounts})
+        if 'error' in labels:
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, labels['error']))
+        span.end(end_time=start_time_ns + int(duration * 1e9))
+        
+        self._get_instrument('histogram', f'{name}.duration', 's').record(duration, attributes=labels)
+        for amount, value in amounts.items():
+            self._get_instrument('counter', f'{name}.{amount}', '1').add(value, attributes=labels)
+            
+    def record_counter(self, name, labels, value):
+        self._get_instrument('counter', name, '1').add(value, attributes=labels)
+
+class Instrumentation:
+    """
+    Collect the timing spans and the counters recorded by the utilities and
+    forward them to a list of sinks. Totals are also kept in memory.
+    
+    ATTRIBUTES
+    ==========
+        sinks: list of InstrumentationSink
+            Destinations of the records
+            
+    METHODS
+    =======
+        span():
+            Time a block of code (to use in a with statement)
+            
+        record_span():
+            Record an operation timed elsewhere
+            
+        increment():
+            Increment a counter
+            
+        get_summary():
+            Get the number of calls and durations of each operation
+            
+        get_counters():
+            Get the totals of each counter
+            
+        flush():
+            Flush all the sinks
+    """
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks) if sinks is not None else []
+        self._lock = threading.Lock()
+        self._spans = dict()
+        self._counters = dict()
+        
+    def span(self, name, **labels):
+        """
+        Time a block of code. The object returned has an add() method to 
+        record the quantities processed by the block (rows, bytes...).
+        
+        PARAMS
+        ======
+            name: string
+                Name of the operation
+                
+            labels:
+                Attributes of the operation with a small number of values
+        """
+        return _Span(self, name, labels)
+        
+    def record_span(self, name, labels, start_time, duration, amounts=None):
+        """
+        Record a timed operation (see InstrumentationSink.record_span()).
+        """
+        amounts = amounts if amounts is not None else dict()
+        with self._lock:
+            span = self._spans.setdefault(name, [0, 0.0, 0.0])
+            span[0] += 1
+            span[1] += duration
+            span[2] = max(span[2], duration)
+            for amount, value in amounts.items():
+                counter = f'{name}.{amount}'
+                self._counters[counter] = self._counters.get(counter, 0) + value
+                
+        for sink in self.sinks:
+            sink.record_span(name, labels, start_time, duration, amounts)
+            
+    def increment(self, name, value=1, **labels):
+        """
+        Increment a counter.
+        
+        PARAMS
+        ======
+            name: string
+                Name of the counter
+                
+            value: number (default: 1)
+                Increment
+                
+            labels:
+                Attributes of the increment with a small number of values
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+            
+        for sink in self.sinks:
+            sink.record_counter(name, labels, value)
+            
+    def get_summary(self):
+        """
+        Get the number of calls and the durations of each operation.
+        
+        RETURNS
+        =======
+            summary_df: pandas.DataFrame
+                A dataframe with the Count, Total, Mean and Max duration (in
+                seconds) of each operation, by decreasing total duration
+        """
+        with self._lock:
+            records = [
+                {'Name': name, 'Count': count, 'Total': total, 'Mean': total / count, 'Max': maximum}
+                for name, (count, total, maximum) in self._spans.items()
+            ]
+            
+        # pandas is only imported when a summary is requested:
+        import pandas as pd
+        
+        summary_df = pd.DataFrame(records, columns=['Name', 'Count', 'Total', 'Mean', 'Max'])
+        summary_df = summary_df.sort_values(by='Total', ascending=False).set_index('Name')
+        
+        return summary_df
+        
+    def get_counters(self):
+        """
+        Get the totals of the counters, including the amounts recorded by 
+        the operations (named <operation>.<amount>).
+        
+        RETURNS
+        =======
+            counters: dict
+                The total of each counter
+        """
+        with self._lock:
+            return dict(self._counters)
+            
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+            
+class _Span:
+    """
+    A block of code timed by an Instrumentation object.
+    """
+    def __init__(self, instrumentation, name, labels):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.labels = labels
+        self.amounts = dict()
+        
+    def add(self, **amounts):
+        for amount, value in amounts.items():
+            self.amounts[amount] = self.amounts.get(amount, 0) + value
+            
+    def __enter__(self):
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        return self
+        
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self._start
+        labels = self.labels if exc_type is None else {**self.labels, 'error': exc_type.__name__}
+        self.instrumentation.record_span(self.name, labels, self.start_time, duration, self.amounts)
+        
+        return False
+    
+class _NullSpan:
+    """
+    Used in place of a span when the instrumentation is disabled.
+    """
+    def add(self, **amounts):
+        pass
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+        
+_NULL_SPAN = _NullSpan()
+
+def enable_instrumentation(sinks=None):
+    """
+    Start recording timing spans and counters for the AWS calls made with
+    the clients of lookout_equipment_utils.get_client() and get_s3_client()
+    (latency, retries, throttles and errors) and for the main computation 
+    stages (time ranges, signals ranking, results download, plots...).
+    
+    PARAMS
+    ======
+        sinks: list of InstrumentationSink (default: None)
+            Destinations of the records (LoggingSink, PrometheusTextfileSink,
+            OpenTelemetrySink...). The totals are kept in memory in any case
+            (see Instrumentation.get_summary())
+            
+    RETURNS
+    =======
+        instrumentation: Instrumentation
+            The object collecting the records
+    """
+    global _instrumentation
+    
+    if _instrumentation is not None:
+        _instrumentation.flush()
+    _instrumentation = Instrumentation(sinks)
+    
+    return _instrumentation
+    
+def disable_instrumentation():
+    """
+    Stop recording (the sinks are flushed first).
+    """
+    global _instrumentation
+    
+    if _instrumentation is not None:
+        _instrumentation.flush()
+    _instrumentation = None
+    
+def get_instrumentation():
+    """
+    Returns the current Instrumentation object (None when disabled).
+    """
+    return _instrumentation
+    
+def _span(name, **labels):
+    """
+    Time a block of code when the instrumentation is enabled.
+    """
+    instrumentation = _instrumentation
+    if instrumentation is None:
+        return _NULL_SPAN
+        
+    return instrumentation.span(name, **labels)
+    
+def _instrumented(name):
+    """
+    Decorator timing each call of a function when the instrumentation is
+    enabled.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _span(name):
+                return function(*args, **kwargs)
+                
+        return wrapper
+        
+    return decorator
+    
+def _flush_instrumentation():
+    if _instrumentation is not None:
+        _instrumentation.flush()
+        
+def _parse_instrumentation_sinks(specification):
+    """
+    Build the sinks listed in a comma separated specification: "logging" 
+    (or "logging:<LEVEL>"), "prometheus:<path>" and "opentelemetry".
+    """
+    sinks = []
+    for item in specification.split(','):
+        kind, _, argument = item.strip().partition(':')
+        if kind == 'logging':
+            sinks.append(LoggingSink(level=logging.getLevelName(argument.upper()) if argument else logging.INFO))
+        elif kind == 'prometheus':
+            if argument == '':
+                raise Exception('The prometheus instrumentation sink needs a file path: "prometheus:<path>".')
+            sinks.append(PrometheusTextfileSink(argument))
+        elif kind == 'opentelemetry':
+            sinks.append(OpenTelemetrySink())
+        else:
+            raise Exception(f'Unknown instrumentation sink "{kind}": expecting logging, prometheus or opentelemetry.')
+            
+    return sinks
+
+def instrument_client(client):
+    """
+    Record the latency, retries, throttles and errors of the calls made 
+    with a boto3 client while the instrumentation is enabled. The clients
+    of lookout_equipment_utils.get_client() and get_s3_client() are 
+    already instrumented.
+    
+    PARAMS
+    ======
+        client: boto3.client
+            The client to instrument
+    """
+    events = client.meta.events
+    events.register('before-call', _before_aws_call, unique_id='lookout-before-call')
+    events.register('after-call', _after_aws_call, unique_id='lookout-after-call')
+    events.register('after-call-error', _after_aws_call_error, unique_id='lookout-after-call-error')
+    events.register('needs-retry', _on_aws_needs_retry, unique_id='lookout-needs-retry')
+    
+def _before_aws_call(model, context, **kwargs):
+    if _instrumentation is not None:
+        context['lookout_instrumentation'] = (
+            model.service_model.service_name, model.name, time.time(), time.perf_counter()
+        )
+        
+def _after_aws_call(http_response, parsed, context, **kwargs):
+    call = context.pop('lookout_instrumentation', None)
+    if (_instrumentation is None) or (call is None):
+        return
+        
+    service, operation, start_time, start = call
+    labels = {'service': service, 'operation': operation}
+    if http_response.status_code >= 300:
+        labels['error'] = parsed.get('Error', {}).get('Code', str(http_response.status_code))
+    amounts = {'retries': parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)}
+    _instrumentation.record_span('aws.call', labels, start_time, time.perf_counter() - start, amounts)
+    
+def _after_aws_call_error(exception, context, **kwargs):
+    call = context.pop('lookout_instrumentation', None)
+    if (_instrumentation is None) or (call is None):
+        return
+        
+    service, operation, start_time, start = call
+    labels = {'service': service, 'operation': operation, 'error': type(exception).__name__}
+    _instrumentation.record_span('aws.call', labels, start_time, time.perf_counter() - start)
+    
+def _on_aws_needs_retry(response, operation, **kwargs):
+    # Called after each attempt, the throttled ones included:
+    if (_instrumentation is None) or (response is None):
+        return
+        
+    error_code = response[1].get('Error', {}).get('Code')
+    if (error_code in THROTTLING_ERROR_CODES) or (error_code == 'SlowDown'):
+        _instrumentation.increment(
+            'aws.throttles', 
+            service=operation.service_model.service_name, 
+            operation=operation.name
+        )
+        
+if os.environ.get(INSTRUMENTATION_ENVIRONMENT_VARIABLE):
+    enable_instrumentation(_parse_instrumentation_sinks(os.environ[INSTRUMENTATION_ENVIRONMENT_VARIABLE]))
+atexit.register(_flush_instrumentation)
@@ -0,0 +1,1067 @@
+# Standard python and AWS imports:
+import bisect
+import contextlib
+import csv
+import datetime
+import hashlib
+import io
+import json
+import numpy as np
+import pandas as pd
+import random
+import threading
+import time
+import types
+import uuid
+
+from botocore.config import Config
+from botocore.exceptions import ClientError, OperationNotPageableError
+from botocore.hooks import HierarchicalEmitter
+
+import lookout_equipment_utils as lookout
+
+# Statuses of the executions written by the simulated service:
+SUCCESS = 'SUCCESS'
+FAILED = 'FAILED'
+
+def _client_error(code, message, operation_name):
+    """
+    Build the same exception boto3 raises when an API call fails.
+    """
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation_name)
+
+class _StreamingBody:
+    """
+    Minimal stand-in for the botocore streaming body of a GetObject response.
+    """
+    def __init__(self, content):
+        self._stream = io.BytesIO(content)
+
+    def read(self, amt=None):
+        return self._stream.read(amt)
+
+    def close(self):
+        self._stream.close()
+
+def _read_body(body):
+    """
+    Read the body of a request (bytes, string or file object) as bytes.
+    """
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    elif not isinstance(body, bytes):
+        return body.read()
+
+    return body
+
+class SimulatedClock:
+    """
+    A clock running N times faster than the real time, or only moving when
+    it is explicitly advanced.
+
+    ATTRIBUTES
+    ==========
+        start: pandas.Timestamp
+            Simulated time (UTC) when the clock was created
+
+        speed: float
+            Number of simulated seconds per real second (None for a clock
+            only moving with advance())
+
+    METHODS
+    =======
+        now():
+            Returns the current simulated time
+
+        advance():
+            Move the simulated time forward
+    """
+    def __init__(self, start, speed=1.0):
+        """
+        PARAMS
+        ======
+            start: pandas.Timestamp
+                Initial simulated time (naive timestamps are taken as UTC)
+
+            speed: float (default: 1.0)
+                Number of simulated seconds per real second. When None, the
+                clock only moves with advance()
+        """
+        start = pd.Timestamp(start)
+        self.start = start.tz_localize('UTC') if start.tzinfo is None else start.tz_convert('UTC')
+        self.speed = speed
+        self._real_start = time.monotonic()
+        self._offset = pd.Timedelta(0)
+        self._lock = threading.Lock()
+
+    def now(self):
+        """
+        Returns the current simulated time (a UTC pandas.Timestamp).
+        """
+        with self._lock:
+            now = self.start + self._offset
+        if self.speed:
+            now += pd.Timedelta(seconds=(time.monotonic() - self._real_start) * self.speed)
+
+        return now.floor('us')
+
+    def advance(self, duration):
+        """
+        Move the simulated time forward by a duration (string or
+        pandas.Timedelta).
+        """
+        with self._lock:
+            self._offset += pd.Timedelta(duration)
+
+class LocalS3Client:
+    """
+    An in-memory stand-in for the subset of the S3 client used by the
+    utilities: objects are stored in a dictionary per bucket with their
+    keys kept sorted, so that prefix listings stay fast with many objects.
+    Thread-safe.
+
+    METHODS
+    =======
+        create_bucket(), put_object(), upload_file(), get_object(),
+        head_object(), delete_object(), list_objects_v2(),
+        create_multipart_upload(), upload_part(), 
+        complete_multipart_upload(), abort_multipart_upload():
+            Same parameters and responses as the boto3 S3 client methods
+            (with the same ETags), so that the boto3 transfer manager can
+            upload files with it
+            
+        get_paginator():
+            Only the list_objects_v2 paginator (the only one used by the
+            utilities) is available: other operations raise the same
+            OperationNotPageableError as boto3
+            
+        subscribe():
+            Register a function called for each object written
+    """
+    def __init__(self):
+        self._buckets = dict()
+        self._keys = dict()
+        self._subscribers = []
+        self._uploads = dict()
+        self._lock = threading.Lock()
+        
+        # Used by the transfer manager to register its handlers:
+        self.meta = types.SimpleNamespace(events=HierarchicalEmitter(), config=Config(), region_name='us-east-1')
+
+    def subscribe(self, callback):
+        """
+        Register a function called with the bucket and the key of each
+        object written (like an S3 event notification).
+        """
+        self._subscribers.append(callback)
+
+    def create_bucket(self, Bucket, **kwargs):
+        with self._lock:
+            self._buckets.setdefault(Bucket, dict())
+            self._keys.setdefault(Bucket, [])
+
+        return {'Location': f'/{Bucket}'}
+
+    def _get_bucket(self, bucket, operation_name):
+        if bucket not in self._buckets:
+            raise _client_error('NoSuchBucket', f'The bucket {bucket} does not exist', operation_name)
+
+        return self._buckets[bucket]
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        Body = _read_body(Body)
+        etag = hashlib.md5(Body).hexdigest()
+        self._write_object(Bucket, Key, Body, etag, 'PutObject')
+
+        return {'ETag': f'"{etag}"'}
+
+    def _write_object(self, bucket, key, body, etag, operation_name):
+        with self._lock:
+            objects = self._get_bucket(bucket, operation_name)
+            if key not in objects:
+                bisect.insort(self._keys[bucket], key)
+            objects[key] = {
+                'Body': body,
+                'ETag': f'"{etag}"',
+                'LastModified': datetime.datetime.now(datetime.timezone.utc)
+            }
+        for callback in self._subscribers:
+            callback(bucket, key)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._get_bucket(Bucket, 'CreateMultipartUpload')
+            self._uploads[upload_id] = dict()
+
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body=b'', **kwargs):
+        Body = _read_body(Body)
+        etag = hashlib.md5(Body).hexdigest()
+        with self._lock:
+            if UploadId not in self._uploads:
+                raise _client_error('NoSuchUpload', f'The upload {UploadId} does not exist', 'UploadPart')
+            self._uploads[UploadId][PartNumber] = Body
+
+        return {'ETag': f'"{etag}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        with self._lock:
+            if UploadId not in self._uploads:
+                raise _client_error('NoSuchUpload', f'The upload {UploadId} does not exist', 'CompleteMultipartUpload')
+            parts = self._uploads.pop(UploadId)
+        parts = [parts[part['PartNumber']] for part in sorted(MultipartUpload['Parts'], key=lambda part: part['PartNumber'])]
+
+        # The ETag of a multipart object is the MD5 of the MD5 of its 
+        # parts, followed by the number of parts:
+        parts_md5 = b''.join(hashlib.md5(part).digest() for part in parts)
+        etag = f'{hashlib.md5(parts_md5).hexdigest()}-{len(parts)}'
+        self._write_object(Bucket, Key, b''.join(parts), etag, 'CompleteMultipartUpload')
+
+        return {'Bucket': Bucket, 'Key': Key, 'ETag': f'"{etag}"'}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+
+        return {}
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read())
+
+    def _get_object(self, bucket, key, operation_name):
+        with self._lock:
+            objects = self._get_bucket(bucket, operation_name)
+            if key not in objects:
+                raise _client_error('NoSuchKey', f'The key {key} does not exist', operation_name)
+
+            return objects[key]
+
+    def get_object(self, Bucket, Key, Range=None, IfNoneMatch=None, **kwargs):
+        s3_object = self._get_object(Bucket, Key, 'GetObject')
+        if (IfNoneMatch is not None) and (IfNoneMatch == s3_object['ETag']):
+            raise _client_error('304', 'Not Modified', 'GetObject')
+
+        content = s3_object['Body']
+        if Range is not None:
+            start, end = Range[len('bytes='):].split('-')
+            content = content[int(start):int(end) + 1]
+
+        return {
+            'Body': _StreamingBody(content),
+            'ContentLength': len(content),
+            'ETag': s3_object['ETag'],
+            'LastModified': s3_object['LastModified']
+        }
+
+    def head_object(self, Bucket, Key, **kwargs):
+        s3_object = self._get_object(Bucket, Key, 'HeadObject')
+
+        return {
+            'ContentLength': len(s3_object['Body']),
+            'ETag': s3_object['ETag'],
+            'LastModified': s3_object['LastModified']
+        }
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        with self._lock:
+            objects = self._get_bucket(Bucket, 'DeleteObject')
+            if Key in objects:
+                del objects[Key]
+                keys = self._keys[Bucket]
+                del keys[bisect.bisect_left(keys, Key)]
+
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', MaxKeys=1000, ContinuationToken=None, StartAfter=None, **kwargs):
+        with self._lock:
+            objects = self._get_bucket(Bucket, 'ListObjectsV2')
+            keys = self._keys[Bucket]
+            first = bisect.bisect_left(keys, Prefix)
+            after = ContinuationToken or StartAfter
+            if after is not None:
+                first = max(first, bisect.bisect_right(keys, after))
+
+            contents = []
+            position = first
+            while (position < len(keys)) and keys[position].startswith(Prefix) and (len(contents) < MaxKeys):
+                s3_object = objects[keys[position]]
+                contents.append({
+                    'Key': keys[position],
+                    'Size': len(s3_object['Body']),
+                    'ETag': s3_object['ETag'],
+                    'LastModified': s3_object['LastModified']
+                })
+                position += 1
+            is_truncated = (position < len(keys)) and keys[position].startswith(Prefix)
+
+        response = {'Name': Bucket, 'Prefix': Prefix, 'KeyCount': len(contents), 'IsTruncated': is_truncated}
+        if len(contents) > 0:
+            response['Contents'] = contents
+        if is_truncated:
+            response['NextContinuationToken'] = contents[-1]['Key']
+
+        return response
+
+    def get_paginator(self, operation_name):
+        if operation_name != 'list_objects_v2':
+            raise OperationNotPageableError(operation_name=operation_name)
+
+        return _ListObjectsPaginator(self)
+
+class _ListObjectsPaginator:
+    """
+    Paginator over the list_objects_v2() responses of the local S3 client.
+    """
+    def __init__(self, s3_client):
+        self.s3_client = s3_client
+
+    def paginate(self, **request):
+        while True:
+            response = self.s3_client.list_objects_v2(**request)
+            yield response
+
+            if not response['IsTruncated']:
+                return
+            request['ContinuationToken'] = response['NextContinuationToken']
+
+class FakeLookoutEquipmentClient:
+    """
+    An in-process stand-in for the inference scheduler API of Lookout for
+    Equipment. Schedulers wake up on a simulated clock: each execution
+    reads the input files of its data window from the (local) S3 client,
+    computes synthetic predictions and writes a result object along with
+    its execution summary, like the service does.
+
+    Status transitions are immediate: a scheduler is RUNNING right after
+    its creation or its start, and STOPPED right after it is stopped.
+
+    ATTRIBUTES
+    ==========
+        s3_client: LocalS3Client
+            Where the input files are read and the results are written
+
+        clock: SimulatedClock
+            The clock driving the executions
+
+    METHODS
+    =======
+        create_inference_scheduler(), describe_inference_scheduler(),
+        start_inference_scheduler(), stop_inference_scheduler(),
+        delete_inference_scheduler(), list_inference_schedulers(),
+        list_inference_executions(), describe_model(), list_models():
+            Same parameters and responses as the boto3 client methods
+
+        add_model():
+            Register a trained model with its labelled and predicted ranges
+
+        run_pending():
+            Run all the executions due at the current simulated time
+    """
+    def __init__(self, s3_client, clock, predict_function=None, anomaly_rate=0.05, throttle_rate=0.0, seed=0):
+        """
+        PARAMS
+        ======
+            s3_client: LocalS3Client
+                Where the input files are read and the results are written
+
+            clock: SimulatedClock
+                The clock driving the executions
+
+            predict_function: callable (default: None)
+                Function taking the dataframe of an execution (indexed by
+                timestamp, one column per tag) and returning a 0/1 array
+                with one prediction per row. By default, anomalies are
+                drawn at random
+
+            anomaly_rate: float (default: 0.05)
+                Share of anomalous predictions drawn by default
+
+            throttle_rate: float (default: 0.0)
+                Probability for each API call to fail with a
+                ThrottlingException (to exercise the retries)
+
+            seed: integer (default: 0)
+                Seed of the random draws
+        """
+        self.s3_client = s3_client
+        self.clock = clock
+        self.predict_function = predict_function
+        self.anomaly_rate = anomaly_rate
+        self.throttle_rate = throttle_rate
+        self.seed = seed
+
+        self._schedulers = dict()
+        self._executions = dict()
+        self._models = dict()
+        self._input_indexes = dict()
+        self._new_keys = None
+        if hasattr(s3_client, 'subscribe'):
+            self._new_keys = []
+            s3_client.subscribe(lambda bucket, key: self._new_keys.append((bucket, key)))
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _check_throttling(self, operation_name):
+        with self._lock:
+            throttled = self._random.random() < self.throttle_rate
+        if throttled:
+            raise _client_error('ThrottlingException', 'Rate exceeded', operation_name)
+
+    def _get_scheduler(self, scheduler_name, operation_name):
+        if scheduler_name not in self._schedulers:
+            raise _client_error('ResourceNotFoundException', f'Scheduler {scheduler_name} not found', operation_name)
+
+        return self._schedulers[scheduler_name]
+
+    def create_inference_scheduler(self,
+                                   ModelName,
+                                   InferenceSchedulerName,
+                                   DataUploadFrequency,
+                                   DataInputConfiguration,
+                                   DataOutputConfiguration,
+                                   RoleArn,
+                                   DataDelayOffsetInMinutes=None,
+                                   **kwargs):
+        self._check_throttling('CreateInferenceScheduler')
+        now = self.clock.now()
+        with self._lock:
+            if InferenceSchedulerName in self._schedulers:
+                raise _client_error('ConflictException', f'Scheduler {InferenceSchedulerName} already exists', 'CreateInferenceScheduler')
+
+            self._schedulers[InferenceSchedulerName] = {
+                'ModelName': ModelName,
+                'ModelArn': f'arn:aws:lookoutequipment:simulator:000000000000:model/{ModelName}',
+                'InferenceSchedulerName': InferenceSchedulerName,
+                'InferenceSchedulerArn': f'arn:aws:lookoutequipment:simulator:000000000000:inference-scheduler/{InferenceSchedulerName}',
+                'Status': 'RUNNING',
+                'DataDelayOffsetInMinutes': DataDelayOffsetInMinutes or 0,
+                'DataUploadFrequency': DataUploadFrequency,
+                'CreatedAt': now.to_pydatetime(),
+                'UpdatedAt': now.to_pydatetime(),
+                'DataInputConfiguration': DataInputConfiguration,
+                'DataOutputConfiguration': DataOutputConfiguration,
+                'RoleArn': RoleArn,
+                'NextWakeup': self._next_wakeup(now, DataUploadFrequency)
+            }
+            self._executions[InferenceSchedulerName] = []
+
+        return {
+            'InferenceSchedulerName': InferenceSchedulerName,
+            'InferenceSchedulerArn': self._schedulers[InferenceSchedulerName]['InferenceSchedulerArn'],
+            'Status': 'PENDING'
+        }
+
+    def describe_inference_scheduler(self, InferenceSchedulerName):
+        self._check_throttling('DescribeInferenceScheduler')
+        with self._lock:
+            scheduler = self._get_scheduler(InferenceSchedulerName, 'DescribeInferenceScheduler')
+            response = {key: value for key, value in scheduler.items() if key != 'NextWakeup'}
+
+        return response
+
+    def start_inference_scheduler(self, InferenceSchedulerName):
+        self._check_throttling('StartInferenceScheduler')
+        now = self.clock.now()
+        with self._lock:
+            scheduler = self._get_scheduler(InferenceSchedulerName, 'StartInferenceScheduler')
+            if scheduler['Status'] != 'RUNNING':
+                scheduler['NextWakeup'] = self._next_wakeup(now, scheduler['DataUploadFrequency'])
+            scheduler['Status'] = 'RUNNING'
+            scheduler['UpdatedAt'] = now.to_pydatetime()
+
+        return {'InferenceSchedulerName': InferenceSchedulerName, 'Status': 'PENDING'}
+
+    def stop_inference_scheduler(self, InferenceSchedulerName):
+        self._check_throttling('StopInferenceScheduler')
+        with self._lock:
+            scheduler = self._get_scheduler(InferenceSchedulerName, 'StopInferenceScheduler')
+            scheduler['Status'] = 'STOPPED'
+            scheduler['UpdatedAt'] = self.clock.now().to_pydatetime()
+
+        return {'InferenceSchedulerName': InferenceSchedulerName, 'Status': 'STOPPING'}
+
+    def delete_inference_scheduler(self, InferenceSchedulerName):
+        self._check_throttling('DeleteInferenceScheduler')
+        with self._lock:
+            scheduler = self._get_scheduler(InferenceSchedulerName, 'DeleteInferenceScheduler')
+            if scheduler['Status'] != 'STOPPED':
+                raise _client_error('ConflictException', f'Scheduler {InferenceSchedulerName} is not stopped', 'DeleteInferenceScheduler')
+            del self._schedulers[InferenceSchedulerName]
+            del self._executions[InferenceSchedulerName]
+
+        return {}
+
+    def list_inference_schedulers(self, InferenceSchedulerNameBeginsWith='', ModelName=None, MaxResults=50, NextToken=None):
+        self._check_throttling('ListInferenceSchedulers')
+        with self._lock:
+            summaries = [
+                {
+                    key: scheduler[key]
+                    for key in ['ModelName', 'ModelArn', 'InferenceSchedulerName', 'InferenceSchedulerArn',
+                                'Status', 'DataDelayOffsetInMinutes', 'DataUploadFrequency']
+                }
+                for name, scheduler in sorted(self._schedulers.items())
+                if name.startswith(InferenceSchedulerNameBeginsWith or '')
+                and ((ModelName is None) or (scheduler['ModelName'] == ModelName))
+            ]
+
+        return self._paginate_response(summaries, 'InferenceSchedulerSummaries', MaxResults, NextToken)
+
+    def add_model(self,
+                  model_name,
+                  labelled_ranges,
+                  predicted_ranges,
+                  dataset_name='simulated-dataset',
+                  training_start=None,
+                  training_end=None,
+                  evaluation_start=None,
+                  evaluation_end=None):
+        """
+        Register a trained model, described by describe_model() with the
+        given anomaly ranges in its ModelMetrics document.
+
+        PARAMS
+        ======
+            model_name: string
+                Name of the model
+
+            labelled_ranges: pandas.DataFrame
+                The labelled ranges (start and end columns)
+
+            predicted_ranges: pandas.DataFrame
+                The ranges predicted over the evaluation period (start and
+                end columns)
+
+            dataset_name: string (default: 'simulated-dataset')
+                Name of the dataset the model was trained on
+
+            training_start, training_end, evaluation_start, evaluation_end:
+                Boundaries of the training and evaluation periods
+        """
+        def to_records(ranges_df):
+            return [
+                {'start': pd.Timestamp(start).isoformat(), 'end': pd.Timestamp(end).isoformat()}
+                for start, end in zip(ranges_df['start'], ranges_df['end'])
+            ]
+
+        def to_datetime(timestamp):
+            return None if timestamp is None else _to_utc(timestamp).to_pydatetime()
+
+        now = self.clock.now()
+        model_metrics = {
+            'labeled_ranges': to_records(labelled_ranges),
+            'predicted_ranges': to_records(predicted_ranges)
+        }
+        with self._lock:
+            self._models[model_name] = {
+                'ModelName': model_name,
+                'ModelArn': f'arn:aws:lookoutequipment:simulator:000000000000:model/{model_name}',
+                'DatasetName': dataset_name,
+                'DatasetArn': f'arn:aws:lookoutequipment:simulator:000000000000:dataset/{dataset_name}',
+                'Status': 'SUCCESS',
+                'TrainingDataStartTime': to_datetime(training_start),
+                'TrainingDataEndTime': to_datetime(training_end),
+                'EvaluationDataStartTime': to_datetime(evaluation_start),
+                'EvaluationDataEndTime': to_datetime(evaluation_end),
+                'CreatedAt': now.to_pydatetime(),
+                'LastUpdatedTime': now.to_pydatetime(),
+                'ModelMetrics': json.dumps(model_metrics)
+            }
+
+    def describe_model(self, ModelName):
+        self._check_throttling('DescribeModel')
+        with self._lock:
+            if ModelName not in self._models:
+                raise _client_error('ResourceNotFoundException', f'Model {ModelName} not found', 'DescribeModel')
+            response = dict(self._models[ModelName])
+
+        return response
+
+    def list_models(self, ModelNameBeginsWith=None, DatasetNameBeginsWith=None, Status=None, MaxResults=50, NextToken=None):
+        self._check_throttling('ListModels')
+        with self._lock:
+            summaries = [
+                {key: model[key] for key in ['ModelName', 'ModelArn', 'DatasetName', 'DatasetArn', 'Status', 'CreatedAt']}
+                for name, model in sorted(self._models.items())
+                if name.startswith(ModelNameBeginsWith or '')
+                and model['DatasetName'].startswith(DatasetNameBeginsWith or '')
+                and ((Status is None) or (model['Status'] == Status))
+            ]
+
+        return self._paginate_response(summaries, 'ModelSummaries', MaxResults, NextToken)
+
+    def list_inference_executions(self,
+                                  InferenceSchedulerName,
+                                  DataStartTimeAfter=None,
+                                  DataEndTimeBefore=None,
+                                  Status=None,
+                                  MaxResults=50,
+                                  NextToken=None):
+        self._check_throttling('ListInferenceExecutions')
+        data_start_time_after = None if DataStartTimeAfter is None else _to_utc(DataStartTimeAfter)
+        data_end_time_before = None if DataEndTimeBefore is None else _to_utc(DataEndTimeBefore)
+        with self._lock:
+            _ = self._get_scheduler(InferenceSchedulerName, 'ListInferenceExecutions')
+            summaries = [
+                summary for summary in reversed(self._executions[InferenceSchedulerName])
+                if ((Status is None) or (summary['Status'] == Status))
+                and ((data_start_time_after is None) or (summary['DataStartTime'] >= data_start_time_after))
+                and ((data_end_time_before is None) or (summary['DataEndTime'] <= data_end_time_before))
+            ]
+
+        return self._paginate_response(summaries, 'InferenceExecutionSummaries', MaxResults, NextToken)
+
+    @staticmethod
+    def _paginate_response(items, result_key, max_results, next_token):
+        """
+        Build a page of a paginated response: the token is the position of
+        the first item of the next page.
+        """
+        first = 0 if next_token is None else int(next_token)
+        response = {result_key: items[first:first + max_results]}
+        if first + max_results < len(items):
+            response['NextToken'] = str(first + max_results)
+
+        return response
+
+    @staticmethod
+    def _next_wakeup(now, upload_frequency):
+        """
+        The schedulers wake up at times aligned on their upload frequency.
+        """
+        return now.ceil(pd.Timedelta(upload_frequency))
+
+    def run_pending(self):
+        """
+        Run all the executions due at the current simulated time, for all
+        the running schedulers.
+
+        RETURNS
+        =======
+            execution_summaries: list of dict
+                The summary of each execution run
+        """
+        now = self.clock.now()
+        due_executions = []
+        with self._lock:
+            for scheduler in self._schedulers.values():
+                frequency = pd.Timedelta(scheduler['DataUploadFrequency'])
+                while (scheduler['Status'] == 'RUNNING') and (scheduler['NextWakeup'] <= now):
+                    due_executions.append((scheduler, scheduler['NextWakeup']))
+                    scheduler['NextWakeup'] += frequency
+
+        execution_summaries = [self._run_execution(scheduler, wakeup_time) for scheduler, wakeup_time in due_executions]
+
+        return execution_summaries
+
+    def _run_execution(self, scheduler, wakeup_time):
+        """
+        Run a single execution: read the input files of its data window,
+        write the predictions to the output location and record the
+        execution summary.
+        """
+        frequency = pd.Timedelta(scheduler['DataUploadFrequency'])
+        data_end_time = wakeup_time - pd.Timedelta(minutes=scheduler['DataDelayOffsetInMinutes'])
+        data_start_time = data_end_time - frequency
+        input_config = scheduler['DataInputConfiguration']
+        output_config = scheduler['DataOutputConfiguration']['S3OutputConfiguration']
+
+        summary = {
+            'ModelName': scheduler['ModelName'],
+            'ModelArn': scheduler['ModelArn'],
+            'InferenceSchedulerName': scheduler['InferenceSchedulerName'],
+            'InferenceSchedulerArn': scheduler['InferenceSchedulerArn'],
+            'ScheduledStartTime': wakeup_time.to_pydatetime(),
+            'DataStartTime': data_start_time.to_pydatetime(),
+            'DataEndTime': data_end_time.to_pydatetime(),
+            'DataInputConfiguration': input_config,
+            'DataOutputConfiguration': scheduler['DataOutputConfiguration']
+        }
+
+        data_df = self._read_input_data(input_config, data_start_time, data_end_time)
+        if data_df.shape[0] == 0:
+            summary.update({'Status': FAILED, 'FailedReason': 'No input data found for this execution'})
+
+        else:
+            if self.predict_function is not None:
+                predictions = np.asarray(self.predict_function(data_df)).astype(int)
+            else:
+                rng = np.random.default_rng([self.seed, int(wakeup_time.value // 10**9), len(scheduler['InferenceSchedulerName'])])
+                predictions = (rng.random(data_df.shape[0]) < self.anomaly_rate).astype(int)
+
+            # Results are written as one timestamp,prediction line per row:
+            timestamps = lookout.format_timestamps(data_df.index.values)
+            content = '\n'.join([f'{timestamp},{prediction}' for timestamp, prediction in zip(timestamps, predictions)]) + '\n'
+            prefix = output_config.get('Prefix', '').strip('/')
+            key = '/'.join([
+                part for part in [
+                    prefix,
+                    scheduler['InferenceSchedulerName'],
+                    wakeup_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    'results',
+                    'results.csv'
+                ]
+                if len(part) > 0
+            ])
+            self.s3_client.put_object(Bucket=output_config['Bucket'], Key=key, Body=content.encode('utf-8'))
+            summary.update({'Status': SUCCESS, 'CustomerResultObject': {'Bucket': output_config['Bucket'], 'Key': key}})
+
+        with self._lock:
+            if scheduler['InferenceSchedulerName'] in self._executions:
+                self._executions[scheduler['InferenceSchedulerName']].append(summary)
+
+        return summary
+
+    def _read_input_data(self, input_config, data_start_time, data_end_time):
+        """
+        Read the rows of the data window from the input files whose name
+        timestamp falls in this window, all components joined on their
+        timestamps.
+        """
+        s3_input_config = input_config['S3InputConfiguration']
+        name_config = input_config.get('InferenceInputNameConfiguration', dict())
+        delimiter = name_config.get('ComponentTimestampDelimiter', '_')
+        timestamp_format = name_config.get('TimestampFormat', 'yyyyMMddHHmmss')
+
+        # File names and contents use the time zone of the input:
+        offset = lookout._parse_timezone_offset(input_config.get('InputTimeZoneOffset', '+00:00'))
+        local_start_time = (data_start_time + offset).tz_localize(None)
+        local_end_time = (data_end_time + offset).tz_localize(None)
+
+        bucket = s3_input_config['Bucket']
+        prefix = s3_input_config.get('Prefix', '').strip('/')
+        prefix = f'{prefix}/' if len(prefix) > 0 else ''
+        files = self._get_input_index(bucket, prefix, delimiter, timestamp_format, offset)
+        first = bisect.bisect_left(files, (local_start_time, ''))
+        last = bisect.bisect_left(files, (local_end_time, ''))
+        
+        components_df = []
+        for _, key in files[first:last]:
+            content = self.s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+            component_df = _parse_input_file(content)
+            component_df = component_df[(component_df.index >= local_start_time) & (component_df.index < local_end_time)]
+            components_df.append(component_df)
+
+        if len(components_df) == 0:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name='Timestamp'))
+
+        data_df = pd.concat(components_df, axis=1).sort_index()
+
+        return data_df
+
+    def _get_input_index(self, bucket, prefix, delimiter, timestamp_format, offset):
+        """
+        Returns the (timestamp, key) pairs of the input files of a location,
+        sorted by the timestamp of their name. With the local S3 client, the
+        index is updated with the objects written since the last call only;
+        otherwise the whole location is listed.
+        """
+        index_key = (bucket, prefix, delimiter, timestamp_format, offset)
+        if self._new_keys is None:
+            keys = [s3_object['Key'] for s3_object in lookout.list_s3_objects(self.s3_client, bucket, prefix)]
+            input_index = {'position': 0, 'keys': set(), 'files': []}
+        else:
+            with self._lock:
+                input_index = self._input_indexes.setdefault(index_key, {'position': 0, 'keys': set(), 'files': []})
+                new_keys = self._new_keys[input_index['position']:]
+                input_index['position'] += len(new_keys)
+            keys = [key for key_bucket, key in new_keys if (key_bucket == bucket) and key.startswith(prefix)]
+            
+        for key in keys:
+            file_name = key[len(prefix):]
+            if ('/' in file_name) or (not file_name.endswith('.csv')) or (key in input_index['keys']):
+                continue
+            _, _, file_timestamp = file_name[:-len('.csv')].rpartition(delimiter)
+            file_timestamp = _parse_file_timestamp(file_timestamp, timestamp_format, offset)
+            if file_timestamp is not None:
+                input_index['keys'].add(key)
+                bisect.insort(input_index['files'], (file_timestamp, key))
+                
+        return input_index['files']
+
+def _parse_input_file(content):
+    """
+    Parse an input file (a timestamp column followed by numeric columns).
+    Input files only cover a single upload window: parsing them in plain
+    python is faster than going through a full CSV reader.
+    """
+    rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+    header, rows = rows[0], [row for row in rows[1:] if len(row) > 0]
+    timestamps = np.array([row[0] for row in rows], dtype='datetime64[ns]')
+    values = np.array([[float(value) if len(value) > 0 else np.nan for value in row[1:]] for row in rows], dtype=np.float64)
+    values = values.reshape(len(rows), len(header) - 1)
+    
+    return pd.DataFrame(values, index=pd.DatetimeIndex(timestamps, name='Timestamp'), columns=header[1:])
+
+def _to_utc(timestamp):
+    timestamp = pd.Timestamp(timestamp)
+    return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+def _parse_file_timestamp(file_timestamp, timestamp_format, offset):
+    """
+    Parse the timestamp of an input file name, in the time zone offset of 
+    the input (None if it does not match the expected format).
+    """
+    try:
+        if timestamp_format == 'EPOCH':
+            return pd.Timestamp(int(file_timestamp), unit='s') + offset
+        return pd.Timestamp(datetime.datetime.strptime(file_timestamp, lookout.INPUT_TIMESTAMP_FORMATS[timestamp_format]))
+
+    except (ValueError, KeyError):
+        return None
+
+class ReplaySimulator:
+    """
+    Replay historical sensor data through simulated inference schedulers,
+    N times faster than real time. At each step, the input files of the
+    elapsed upload windows are produced (with InferenceInputProducer) in a
+    local S3 stand-in, then the due executions are run by a fake service
+    that writes synthetic results. The scheduler objects, the predictions
+    fetchers and the monitoring code can then be used as with the real
+    service, inside patch_clients().
+
+    ATTRIBUTES
+    ==========
+        tags_df: pandas.DataFrame
+            The historical data replayed (indexed by time, one column per
+            tag)
+
+        clock: SimulatedClock
+            The simulated clock, starting at the beginning of the data
+
+        s3_client: LocalS3Client
+            The local S3 stand-in
+
+        lookout_client: FakeLookoutEquipmentClient
+            The simulated service
+
+        schedulers: dict
+            The LookoutEquipmentScheduler object of each scheduler added
+
+    METHODS
+    =======
+        patch_clients():
+            Context manager routing get_client() and get_s3_client() to
+            the simulated clients
+
+        add_scheduler():
+            Create a simulated scheduler fed with the replayed data
+
+        step():
+            Produce the input files and run the executions due so far
+
+        run():
+            Step the simulation until a given simulated time
+    """
+    def __init__(self,
+                 tags_df,
+                 tags_description,
+                 speed=60.0,
+                 start=None,
+                 predict_function=None,
+                 anomaly_rate=0.05,
+                 throttle_rate=0.0,
+                 input_bucket='simulator-input',
+                 output_bucket='simulator-output',
+                 max_workers=16,
+                 seed=0):
+        """
+        PARAMS
+        ======
+            tags_df: pandas.DataFrame
+                The historical data to replay (indexed by time in UTC, one
+                column per tag), the expander.parquet dataframe for instance
+
+            tags_description: pandas.DataFrame or dict
+                Either a dataframe with a 'Subsystem' and a 'Tag' column or
+                a dictionary with the list of tags of each component
+
+            speed: float (default: 60.0)
+                Number of simulated seconds per real second. When None, the
+                simulated time only moves with run() or clock.advance()
+
+            start: pandas.Timestamp (default: None)
+                Simulated time to start at (start of the data by default)
+
+            predict_function, anomaly_rate, throttle_rate:
+                How the fake service behaves, see FakeLookoutEquipmentClient
+
+            input_bucket: string (default: 'simulator-input')
+                Bucket receiving the input files of all the schedulers
+
+            output_bucket: string (default: 'simulator-output')
+                Bucket receiving the results of all the schedulers
+
+            max_workers: integer (default: 16)
+                Number of input files written concurrently
+        """
+        self.tags_df = tags_df
+        self.tags_description = tags_description
+        self.input_bucket = input_bucket
+        self.output_bucket = output_bucket
+        self.max_workers = max_workers
+
+        self.clock = SimulatedClock(tags_df.index[0] if start is None else start, speed=speed)
+        self.s3_client = LocalS3Client()
+        self.s3_client.create_bucket(Bucket=input_bucket)
+        self.s3_client.create_bucket(Bucket=output_bucket)
+        self.lookout_client = FakeLookoutEquipmentClient(
+            self.s3_client,
+            self.clock,
+            predict_function=predict_function,
+            anomaly_rate=anomaly_rate,
+            throttle_rate=throttle_rate,
+            seed=seed
+        )
+
+        self.schedulers = dict()
+        self._producers = dict()
+
+    @contextlib.contextmanager
+    def patch_clients(self):
+        """
+        Context manager routing the get_client() and get_s3_client() calls
+        of lookout_equipment_utils to the simulated clients, so that any
+        code creating its own clients uses the simulation.
+        """
+        get_client = lookout.get_client
+        get_s3_client = lookout.get_s3_client
+        lookout.get_client = lambda *args, **kwargs: self.lookout_client
+        lookout.get_s3_client = lambda *args, **kwargs: self.s3_client
+        try:
+            yield self
+        finally:
+            lookout.get_client = get_client
+            lookout.get_s3_client = get_s3_client
+
+    def add_scheduler(self,
+                      scheduler_name,
+                      model_name='simulated-model',
+                      upload_frequency='PT5M',
+                      delay_offset=None,
+                      component_delimiter='_',
+                      timestamp_format='yyyyMMddHHmmss'):
+        """
+        Create a running scheduler in the simulated service. Its input files
+        are produced from the replayed data at each step.
+
+        PARAMS
+        ======
+            scheduler_name: string
+                Name of the scheduler
+
+            model_name: string (default: 'simulated-model')
+                Name of the model of the scheduler
+
+            upload_frequency, delay_offset, component_delimiter,
+            timestamp_format:
+                Scheduler parameters, see LookoutEquipmentScheduler.set_parameters()
+
+        RETURNS
+        =======
+            scheduler: LookoutEquipmentScheduler
+                The scheduler object, bound to the simulated clients
+        """
+        with self.patch_clients():
+            scheduler = lookout.LookoutEquipmentScheduler(scheduler_name, model_name, region_name='simulator')
+
+        scheduler.set_parameters(
+            input_bucket=self.input_bucket,
+            input_prefix=f'{scheduler_name}/input/',
+            output_bucket=self.output_bucket,
+            output_prefix=f'{scheduler_name}/output/',
+            role_arn='arn:aws:iam::000000000000:role/simulator',
+            upload_frequency=upload_frequency,
+            delay_offset=delay_offset,
+            component_delimiter=component_delimiter,
+            timestamp_format=timestamp_format
+        )
+        self.lookout_client.create_inference_scheduler(**scheduler._get_create_request())
+
+        producer = lookout.InferenceInputProducer(
+            scheduler,
+            self.tags_description,
+            max_workers=self.max_workers,
+            s3_client=self.s3_client
+        )
+
+        # Input files are produced from the start of the current window:
+        frequency = pd.Timedelta(upload_frequency)
+        self.schedulers[scheduler_name] = scheduler
+        self._producers[scheduler_name] = [producer, self.clock.now().floor(frequency)]
+
+        return scheduler
+
+    def step(self):
+        """
+        Produce the input files of all the upload windows elapsed since the
+        last step, then run the executions due at the current simulated time.
+
+        RETURNS
+        =======
+            execution_summaries: list of dict
+                The summary of each execution run during this step
+        """
+        now = self.clock.now()
+        for scheduler_name, (producer, produced_until) in self._producers.items():
+            frequency = pd.Timedelta(self.schedulers[scheduler_name].upload_frequency)
+            window_end = now.floor(frequency)
+            if window_end > produced_until:
+                producer.produce_range(
+                    self.tags_df,
+                    produced_until.tz_localize(None),
+                    window_end.tz_localize(None)
+                )
+                self._producers[scheduler_name][1] = window_end
+
+        execution_summaries = self.lookout_client.run_pending()
+
+        return execution_summaries
+
+    def run(self, until=None, duration=None, interval=1.0, callback=None):
+        """
+        Step the simulation until a given simulated time. With a real time
+        clock, a step is run every interval seconds. With a manual clock,
+        the simulated time is advanced by interval seconds between steps
+        (steps then run as fast as possible).
+
+        PARAMS
+        ======
+            until: pandas.Timestamp (default: None)
+                Simulated time (UTC) at which to stop
+
+            duration: string or pandas.Timedelta (default: None)
+                Simulated duration to run for, when until is not set
+
+            interval: float (default: 1.0)
+                Seconds between two steps
+
+            callback: callable (default: None)
+                Function called with the simulator and the new execution
+                summaries after each step (a monitoring loop for instance)
+
+        RETURNS
+        =======
+            num_executions: integer
+                Total number of executions run
+        """
+        if until is None:
+            until = self.clock.now() + pd.Timedelta(duration)
+        until = _to_utc(until)
+
+        num_executions = 0
+        while True:
+            execution_summaries = self.step()
+            num_executions += len(execution_summaries)
+            if callback is not None:
+                callback(self, execution_summaries)
+            if self.clock.now() >= until:
+                return num_executions
+
+            if self.clock.speed:
+                time.sleep(interval)
+            else:
+                self.clock.advance(pd.Timedelta(seconds=interval))
@@ -1,52 +1,339 @@
-# Standard python and AWS imports:
-import boto3
+# Standard python imports:
+import concurrent.futures
+import csv
+import datetime
+import functools
+import gzip
+import hashlib
+import importlib
+import io
 import json
-import matplotlib.pyplot as plt
-import numpy as np
 import os
-import pandas as pd
 import pprint
+import random
+import re
+import threading
 import time
+import types
 import uuid
+import zlib
 
-from botocore.config import Config
-from matplotlib.dates import DateFormatter
-from matplotlib import gridspec
-from scipy.stats import wasserstein_distance
+from collections.abc import Mapping
 from typing import List, Dict
-from tqdm import tqdm
+
+# Timing spans and counters (see lookout_equipment_instrumentation.py):
+from lookout_equipment_instrumentation import (
+    INSTRUMENTATION_ENVIRONMENT_VARIABLE,
+    THROTTLING_ERROR_CODES,
+    Instrumentation,
+    InstrumentationSink,
+    LoggingSink,
+    OpenTelemetrySink,
+    PrometheusTextfileSink,
+    disable_instrumentation,
+    enable_instrumentation,
+    get_instrumentation,
+    instrument_client,
+    _instrumented,
+    _span
+)
+
+class _LazyModule(types.ModuleType):
+    """
+    A module only imported when one of its attributes is first accessed.
+    The third party libraries (AWS, plotting, statistics, dataframes) take
+    most of the import time of this module: a script only listing resources
+    or managing schedulers does not load the plotting and statistics ones.
+    """
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        
+        return getattr(module, attribute)
+
+# AWS, data, plotting and statistics imports (loaded on first use):
+asyncio = _LazyModule('asyncio')
+boto3 = _LazyModule('boto3')
+boto3_transfer = _LazyModule('boto3.s3.transfer')
+botocore_config = _LazyModule('botocore.config')
+botocore_exceptions = _LazyModule('botocore.exceptions')
+gridspec = _LazyModule('matplotlib.gridspec')
+mdates = _LazyModule('matplotlib.dates')
+np = _LazyModule('numpy')
+pa = _LazyModule('pyarrow')
+pcsv = _LazyModule('pyarrow.csv')
+pd = _LazyModule('pandas')
+plt = _LazyModule('matplotlib.pyplot')
+pq = _LazyModule('pyarrow.parquet')
+s3transfer_utils = _LazyModule('s3transfer.utils')
+shared_memory = _LazyModule('multiprocessing.shared_memory')
+stats = _LazyModule('scipy.stats')
+tqdm = _LazyModule('tqdm')
+
+# orjson is optional: it is used to parse the model 
+# metrics faster when it is available:
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Parameters
 DEFAULT_REGION = 'eu-west-1'
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+RESOURCE_NAME_CHARACTERS = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_-'
+
+# Timestamp formats accepted by the schedulers in the input file names
+# (EPOCH is handled separately):
+INPUT_TIMESTAMP_FORMATS = {
+    'yyyyMMddHHmmss': '%Y%m%d%H%M%S',
+    'yyyy-MM-dd-HH-mm-ss': '%Y-%m-%d-%H-%M-%S'
+}
 
-def get_client(region_name=DEFAULT_REGION):
+# boto3 clients are thread-safe but expensive to build: 
+# they are cached and shared by all the functions and classes:
+_clients_cache = dict()
+_clients_lock = threading.Lock()
+
+def get_client(region_name=DEFAULT_REGION, max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS, config=None):
     """
-    Get a boto3 client for the Amazon Lookout for Equipment service.
+    Get a boto3 client for the Amazon Lookout for Equipment service. Clients
+    are cached: the same client (and its pool of open connections) is
+    returned for a given region and configuration.
     
     PARAMS
     ======
         region_name: string
             AWS region name. (Default: eu-west-1)
+            
+        max_pool_connections: integer (default: 10)
+            Maximum number of connections kept open by the client. Increase
+            it when sharing the client between many threads.
+            
+        config: botocore.config.Config (default: None)
+            Additional client configuration, merged with the default one
     
     RETURN
     ======
         lookoutequipment_client
             A boto3 client to interact with the L4E service
     """
-    lookoutequipment_client = boto3.client(
+    lookoutequipment_client = _get_cached_client(
         service_name='lookoutequipment',
         region_name=region_name,
-        config=Config(connect_timeout=30, read_timeout=30, retries={'max_attempts': 3}),
+        max_pool_connections=max_pool_connections,
+        config=config,
         endpoint_url=f'https://lookoutequipment.{region_name}.amazonaws.com/'
     )
     
     return lookoutequipment_client
 
+def clear_clients_cache():
+    """
+    Remove all the boto3 clients from the cache: new clients will be built
+    on the next calls (after a change of credentials for instance).
+    """
+    with _clients_lock:
+        _clients_cache.clear()
+
+def get_s3_client(region_name=DEFAULT_REGION, 
+                  max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS, 
+                  config=None, 
+                  endpoint_url=None):
+    """
+    Get a cached boto3 client for Amazon S3.
+    
+    PARAMS
+    ======
+        region_name: string
+            AWS region name. (Default: eu-west-1)
+            
+        max_pool_connections: integer (default: 10)
+            Maximum number of connections kept open by the client
+            
+        config: botocore.config.Config (default: None)
+            Additional client configuration, merged with the default one
+            
+        endpoint_url: string (default: None)
+            Use this to target an S3 compatible service other than Amazon
+            S3 (a local stand-in for tests for instance)
+    
+    RETURN
+    ======
+        s3_client
+            A boto3 client to interact with Amazon S3
+    """
+    s3_client = _get_cached_client(
+        service_name='s3',
+        region_name=region_name,
+        max_pool_connections=max_pool_connections,
+        config=config,
+        endpoint_url=endpoint_url
+    )
+    
+    return s3_client
+
+def _get_cached_client(service_name, region_name, max_pool_connections, config=None, endpoint_url=None):
+    """
+    Build a boto3 client or get it from the cache if one was already built
+    with the same parameters. Clients are keyed by the value of each option
+    of their final configuration (the default one merged with config).
+    """
+    client_config = botocore_config.Config(
+        connect_timeout=30, 
+        read_timeout=30, 
+        retries={'max_attempts': 3},
+        max_pool_connections=max_pool_connections
+    )
+    if config is not None:
+        client_config = client_config.merge(config)
+        
+    config_options = tuple(
+        (option, repr(getattr(client_config, option))) 
+        for option in botocore_config.Config.OPTION_DEFAULTS
+    )
+    key = (service_name, region_name, config_options, endpoint_url)
+    
+    with _clients_lock:
+        client = _clients_cache.get(key)
+        if client is None:
+            client = boto3.client(
+                service_name=service_name,
+                region_name=region_name,
+                config=client_config,
+                endpoint_url=endpoint_url
+            )
+            instrument_client(client)
+            _clients_cache[key] = client
+            
+    return client
+
+
+def paginate(client_method, result_key, **request):
+    """
+    Iterate over all the items returned by a paginated API call, following
+    the NextToken of each response. Items are yielded as soon as each page
+    is received.
+    
+    PARAMS
+    ======
+        client_method: callable
+            The boto3 client method to call (lookoutequipment_client.list_models
+            for instance)
+            
+        result_key: string
+            Name of the list of items in each response
+            
+        request: 
+            Parameters of the API call
+            
+    RETURNS
+    =======
+        items: generator
+            A generator over all the items of all the pages
+    """
+    while True:
+        response = client_method(**request)
+        yield from response[result_key]
+        
+        if 'NextToken' not in response:
+            return
+        request['NextToken'] = response['NextToken']
+
+def paginate_concurrently(client_method, result_key, shards, max_workers=8, **request):
+    """
+    Iterate over the items returned by several paginated API calls running
+    concurrently. Each shard is a set of additional request parameters 
+    (a name prefix or a time window for instance) listing a part of the 
+    items. Items are yielded shard after shard, in the order of the shards.
+    
+    PARAMS
+    ======
+        client_method: callable
+            The boto3 client method to call
+            
+        result_key: string
+            Name of the list of items in each response
+            
+        shards: list of dict
+            Parameters specific to each shard, added to the request
+            
+        max_workers: integer (default: 8)
+            Maximum number of shards listed at the same time
+            
+        request:
+            Parameters of the API call common to all the shards
+            
+    RETURNS
+    =======
+        items: generator
+            A generator over all the items of all the shards
+    """
+    def list_shard(shard):
+        return list(paginate(client_method, result_key, **request, **shard))
+        
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(list_shard, shard) for shard in shards]
+        for future in futures:
+            yield from future.result()
+
+def _list_names(client_method, 
+                result_key, 
+                name_key, 
+                name_prefix_key, 
+                name_prefix, 
+                describe_method, 
+                fan_out, 
+                max_workers, 
+                **request):
+    """
+    List resource names, optionally fanning out over the next character of
+    the name prefix: one shard per possible character is listed 
+    concurrently (resource names are made of RESOURCE_NAME_CHARACTERS).
+    A resource named exactly like the prefix is not covered by these shards
+    and is looked for with its describe method. The fan out only happens
+    when the names do not fit in a single page: the names of this first
+    page are kept (the shards listing them again are deduplicated), and 
+    the describe call is skipped when they include the prefix itself.
+    """
+    if name_prefix is not None:
+        request[name_prefix_key] = name_prefix
+    if not fan_out:
+        return [item[name_key] for item in paginate(client_method, result_key, **request)]
+        
+    # Most listings fit in one page: the shards
+    # are only listed when there is a next one:
+    response = client_method(**request)
+    names_list = [item[name_key] for item in response[result_key]]
+    if 'NextToken' not in response:
+        return names_list
+        
+    request.pop(name_prefix_key, None)
+    prefix = '' if name_prefix is None else name_prefix
+    shards = [{name_prefix_key: prefix + c} for c in RESOURCE_NAME_CHARACTERS]
+    seen_names = set(names_list)
+    
+    if (prefix != '') and (prefix not in seen_names):
+        try:
+            describe_method(**{name_key: prefix})
+            names_list.append(prefix)
+            seen_names.add(prefix)
+        except botocore_exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+                
+    for item in paginate_concurrently(client_method, result_key, shards, max_workers, **request):
+        if item[name_key] not in seen_names:
+            names_list.append(item[name_key])
+            seen_names.add(item[name_key])
+            
+    return names_list
 
 def list_datasets(
     dataset_name_prefix=None,
     max_results=50,
-    region_name=DEFAULT_REGION
+    region_name=DEFAULT_REGION,
+    fan_out=False,
+    max_workers=8
 ):
     """
     List all the Lookout for Equipment datasets available in this account.
@@ -58,39 +345,35 @@ def list_datasets(
             this prefix. Defaults to None to list all datasets.
             
         max_results: integer (default: 50)
-            Max number of datasets to return 
+            Max number of datasets to return per page
             
         region_name: string
             AWS region name. (Default: eu-west-1)
             
+        fan_out: boolean (default: False)
+            If True, the listing is split by the next character of the
+            dataset names and the parts are listed concurrently
+            
+        max_workers: integer (default: 8)
+            Maximum number of concurrent listings when fan_out is True
+            
     RETURN
     ======
         dataset_list: list of strings
             A list with all the dataset names found in the current region
     """
-    # Initialization:
-    dataset_list = []
-    has_more_records = True
     lookoutequipment_client = get_client(region_name=region_name)
-    
-    # Building the request:
-    kargs = {"MaxResults": max_results}
-    if dataset_name_prefix is not None:
-        kargs["DatasetNameBeginsWith"] = dataset_name_prefix
-    
-    # We query for the list of datasets, until there are none left to fetch:
-    while has_more_records:
-        # Query for the list of L4E datasets available for this AWS account:
-        list_datasets_response = lookoutequipment_client.list_datasets(**kargs)
-        if "NextToken" in list_datasets_response:
-            kargs["NextToken"] = list_datasets_response["NextToken"]
-        else:
-            has_more_records = False
-        
-        # Add the dataset names to the list:
-        dataset_summaries = list_datasets_response["DatasetSummaries"]
-        for dataset_summary in dataset_summaries:
-            dataset_list.append(dataset_summary['DatasetName'])
+    dataset_list = _list_names(
+        lookoutequipment_client.list_datasets,
+        result_key='DatasetSummaries',
+        name_key='DatasetName',
+        name_prefix_key='DatasetNameBeginsWith',
+        name_prefix=dataset_name_prefix,
+        describe_method=lookoutequipment_client.describe_dataset,
+        fan_out=fan_out,
+        max_workers=max_workers,
+        MaxResults=max_results
+    )
     
     return dataset_list
 
@@ -98,7 +381,9 @@ def list_models_for_datasets(
     model_name_prefix=None, 
     dataset_name_prefix=None,
     max_results=50,
-    region_name=DEFAULT_REGION
+    region_name=DEFAULT_REGION,
+    fan_out=False,
+    max_workers=8
 ):
     """
     List all the models available in a given region.
@@ -113,7 +398,17 @@ def list_models_for_datasets(
             making use of this particular dataset are returned
 
         max_results: integer (default: 50)
-            Max number of datasets to return 
+            Max number of models to return per page
+            
+        region_name: string
+            AWS region name. (Default: eu-west-1)
+            
+        fan_out: boolean (default: False)
+            If True, the listing is split by the next character of the
+            model names and the parts are listed concurrently
+            
+        max_workers: integer (default: 8)
+            Maximum number of concurrent listings when fan_out is True
             
     RETURNS
     =======
@@ -121,31 +416,31 @@ def list_models_for_datasets(
             List of all the models corresponding to the input parameters
             (regions and dataset)
     """
-    # Initialization:
-    models_list = []
-    has_more_records = True
     lookoutequipment_client = get_client(region_name=region_name)
     
     # Building the request:
     list_models_request = {"MaxResults": max_results}
-    if model_name_prefix is not None:
-        list_models_request["ModelNameBeginsWith"] = model_name_prefix
     if dataset_name_prefix is not None:
         list_models_request["DatasetNameBeginsWith"] = dataset_name_prefix
+        
+    # The exact name match needs to be filtered by dataset too:
+    def describe_model(ModelName):
+        describe_model_response = lookoutequipment_client.describe_model(ModelName=ModelName)
+        if (dataset_name_prefix is not None) and (not describe_model_response['DatasetName'].startswith(dataset_name_prefix)):
+            raise botocore_exceptions.ClientError({'Error': {'Code': 'ResourceNotFoundException'}}, 'DescribeModel')
+        return describe_model_response
 
-    # We query for the list of models, until there are none left to fetch:
-    while has_more_records:
-        # Query for the list of L4E models available for this AWS account:
-        list_models_response = lookoutequipment_client.list_models(**list_models_request)
-        if "NextToken" in list_models_response:
-            list_models_request["NextToken"] = list_models_response["NextToken"]
-        else:
-            has_more_records = False
-
-        # Add the model names to the list:
-        model_summaries = list_models_response["ModelSummaries"]
-        for model_summary in model_summaries:
-            models_list.append(model_summary['ModelName'])
+    models_list = _list_names(
+        lookoutequipment_client.list_models,
+        result_key='ModelSummaries',
+        name_key='ModelName',
+        name_prefix_key='ModelNameBeginsWith',
+        name_prefix=model_name_prefix,
+        describe_method=describe_model,
+        fan_out=fan_out,
+        max_workers=max_workers,
+        **list_models_request
+    )
 
     return models_list
 
@@ -247,7 +542,7 @@ def delete_dataset(DATASET_NAME, region_name=DEFAULT_REGION):
         error_code = e.response['Error']['Code']
         if (error_code == 'ConflictException'):
             print('Dataset is used by at least a model, deleting the associated model(s) before deleting dataset.')
-            models_list = list_models_for_datasets(DATASET_NAME_FOR_LIST_MODELS=DATASET_NAME)
+            models_list = list_models_for_datasets(dataset_name_prefix=DATASET_NAME, region_name=region_name)
 
             for model_name_to_delete in models_list:
                 delete_model_response = lookoutequipment_client.delete_model(ModelName=model_name_to_delete)
@@ -259,884 +554,4658 @@ def delete_dataset(DATASET_NAME, region_name=DEFAULT_REGION):
         elif (error_code == 'ResourceNotFoundException'):
             print(f'Dataset "{DATASET_NAME}" not found: creating a dataset with this name is possible.')
 
-            
-def create_data_schema(component_fields_map: Dict):
-    return json.dumps(_create_data_schema_map(component_fields_map=component_fields_map))
-
-def _create_data_schema_map(component_fields_map: Dict):
-    data_schema = dict()
-    component_schema_list = list()
-    data_schema['Components'] = component_schema_list
-
-    for component_name in component_fields_map:
-        component_schema = _create_component_schema(component_name, component_fields_map[component_name])
-        component_schema_list.append(component_schema)
-
-    return data_schema
-
-def _create_component_schema(component_name: str, field_names: List):
-    component_schema = dict()
-    component_schema['ComponentName'] = component_name
-    col_list = []
-    component_schema['Columns'] = col_list
-
-    is_first_field = True
-    for field_name in field_names:
-        if is_first_field:
-            ts_col = dict()
-            ts_col['Name'] = field_name
-            ts_col['Type'] = 'DATETIME'
-            col_list.append(ts_col)
-            is_first_field = False
-        else:
-            attr_col = dict()
-            attr_col['Name'] = field_name
-            attr_col['Type'] = 'DOUBLE'
-            col_list.append(attr_col)
-    return component_schema
-    
-def plot_timeseries(timeseries_df, tag_name, 
-                    start=None, end=None, 
-                    plot_rolling_avg=False, 
-                    labels_df=None, 
-                    predictions=None,
-                    tag_split=None,
-                    custom_grid=True,
-                    fig_width=18,
-                    prediction_titles=None
-                   ):
+def fetch_s3_objects(s3_objects, 
+                     s3_client=None, 
+                     cache_dir=None, 
+                     max_workers=16, 
+                     revalidate=True,
+                     region_name=DEFAULT_REGION):
     """
-    This function plots a time series signal with a line plot and can combine
-    this with labelled and predicted anomaly ranges.
+    Download a list of S3 objects concurrently. When a cache directory is
+    provided, each object is stored on disk under its bucket, a hash of its
+    key and its ETag: cached objects are only downloaded again if they 
+    changed on S3.
     
     PARAMS
     ======
-        timeseries_df: pandas.DataFrame
-            A dataframe containing the time series to plot
-        
-        tag_name: string
-            The name of the tag that we can add in the label
-        
-        start: string or pandas.Datetime (default: None)
-            Starting timestamp of the signal to plot. If not provided, will use
-            the whole signal
-        
-        end: string or pandas.Datetime (default: None)
-            End timestamp of the signal to plot. If not provided, will use the
-            whole signal
+        s3_objects: list of dict
+            A list of objects to download, each described by a dictionary
+            with a Bucket and a Key entry (like the CustomerResultObject of
+            the inference execution summaries)
+            
+        s3_client: boto3 S3 client (default: None)
+            Client to use. By default, a cached client from get_s3_client()
+            is used
+            
+        cache_dir: string (default: None)
+            Local directory where the objects are cached. No cache is used 
+            when not provided
+            
+        max_workers: integer (default: 16)
+            Maximum number of objects downloaded at the same time
+            
+        revalidate: boolean (default: True)
+            If True, a conditional request is sent for each cached object to
+            check that it did not change (no data is transferred when it did
+            not). If False, cached objects are used without querying S3
+            
+        region_name: string
+            AWS region name. (Default: eu-west-1)
+            
+    RETURNS
+    =======
+        contents: list of bytes
+            The content of each object, in the same order as s3_objects
+    """
+    if len(s3_objects) == 0:
+        return []
         
-        plot_rolling_avg: boolean (default: False)
-            If set to true, will add a rolling average curve on top of the
-            line plot for the time series.
+    if s3_client is None:
+        s3_client = get_s3_client(region_name=region_name, max_pool_connections=max_workers)
+
+    with _span('s3.fetch_objects') as span, \
+         concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        contents = list(executor.map(
+            lambda s3_object: _fetch_s3_object(
+                s3_client, s3_object['Bucket'], s3_object['Key'], cache_dir, revalidate
+            ),
+            s3_objects
+        ))
+        span.add(objects=len(contents), bytes=sum(len(content) for content in contents))
         
-        labels_df: pandas.DataFrame (default: None)
-            If provided, this is a dataframe with all the labelled anomalies.
-            This will be rendered as a filled-in plots below the time series
-            itself.
+    return contents
+
+def _fetch_s3_object(s3_client, bucket, key, cache_dir, revalidate):
+    """
+    Download a single S3 object, going through the local cache if any.
+    """
+    if cache_dir is None:
+        return s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
         
-        predictions: pandas.DataFrame or list of pandas.DataFrame
-            If provided, this is a dataframe with all the predicted anomalies.
-            This will be rendered as a filled-in plots below the time series
-            itself.
+    # Look for a cached version of this object. The key is hashed: a key
+    # used as a directory would clash with the keys it prefixes (a/b and 
+    # a/b/c) and could hold relative parts (.. or empty components):
+    object_dir = os.path.join(cache_dir, bucket, hashlib.sha256(key.encode('utf-8')).hexdigest())
+    cached_etag = None
+    if os.path.isdir(object_dir):
+        cached_etags = [
+            f for f in os.listdir(object_dir) 
+            if (not f.endswith('.tmp')) and os.path.isfile(os.path.join(object_dir, f))
+        ]
+        if len(cached_etags) > 0:
+            cached_etag = cached_etags[0]
             
-        tag_split: string or pandas.Datetime
-            If provided, the line plot will plot the first part of the time
-            series with a colour and the second part in grey. This can be
-            used to show the split between training and evaluation period for
-            instance.
-        
-        custom_grid: boolean (default: True)
-            Will show a custom grid with month name mentionned for each quarter
-            and lighter lines for the other month to prevent clutter on the
-            horizontal axis.
+    if cached_etag is not None:
+        if not revalidate:
+            with open(os.path.join(object_dir, cached_etag), 'rb') as f:
+                return f.read()
+                
+        try:
+            response = s3_client.get_object(Bucket=bucket, Key=key, IfNoneMatch=f'"{cached_etag}"')
+            
+        except botocore_exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ['304', 'NotModified']:
+                with open(os.path.join(object_dir, cached_etag), 'rb') as f:
+                    return f.read()
+            raise
+            
+    else:
+        response = s3_client.get_object(Bucket=bucket, Key=key)
         
-        fig_width: integer (default: 18)
-            Figure width.
+    # Object is new or has changed: we update the cache:
+    content = response['Body'].read()
+    etag = response['ETag'].strip('"')
+    os.makedirs(object_dir, exist_ok=True)
+    tmp_fname = os.path.join(object_dir, f'{uuid.uuid4().hex}.tmp')
+    with open(tmp_fname, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_fname, os.path.join(object_dir, etag))
+    if (cached_etag is not None) and (cached_etag != etag):
+        os.remove(os.path.join(object_dir, cached_etag))
         
-        prediction_titles: list of strings (default: None)
-            If we want to plot multiple predictions, we can set the titles for
-            each of the prediction plot.
+    return content
+
+
+def list_s3_objects(s3_client, bucket, prefix):
+    """
+    Iterate over all the objects under an S3 prefix (S3 listings are 
+    paginated with continuation tokens rather than a NextToken).
     
+    PARAMS
+    ======
+        s3_client: boto3.client
+            The S3 client to use
+            
+        bucket: string
+            The bucket to list
+            
+        prefix: string
+            The prefix of the objects to list
+            
     RETURNS
     =======
-        fig: matplotlib.pyplot.figure
-            A figure where the plots are drawn
-            
-        ax: matplotlib.pyplot.Axis
-            An axis where the plots are drawn
+        s3_objects: generator
+            A generator over the description of each object (with its 
+            Key, Size and ETag)
     """
-    if start is None:
-        start = timeseries_df.index.min()
-    elif type(start) == str:
-        start = pd.to_datetime(start)
-        
-    if end is None:
-        end = timeseries_df.index.max()
-    elif type(end) == str:
-        end = pd.to_datetime(end)
-        
-    if (tag_split is not None) & (type(tag_split) == str):
-        tag_split = pd.to_datetime(tag_split)
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        yield from page.get('Contents', [])
 
-    # Prepare the figure:
-    fig_height = 4
-    height_ratios = [8]
-    nb_plots = 1
+def upload_to_s3(source, 
+                 bucket, 
+                 prefix, 
+                 max_workers=10, 
+                 multipart_threshold=8 * 1024 * 1024, 
+                 multipart_chunksize=8 * 1024 * 1024, 
+                 skip_unchanged=True, 
+                 s3_client=None, 
+                 region_name=DEFAULT_REGION):
+    """
+    Upload a local directory tree (or a single file) to an S3 location. 
+    All the files share the same pool of workers and the large files are 
+    sent in several parts. Files for which an object with the same size 
+    and the same ETag already exists are skipped: uploading a refreshed 
+    dataset only moves the files that changed.
     
-    if labels_df is not None:
-        fig_height += 1
-        height_ratios += [1.5]
-        nb_plots += 1
-        
-    if predictions is not None:
-        if type(predictions) == pd.core.frame.DataFrame:
-            fig_height += 1
-            height_ratios += [1.5]
-            nb_plots += 1
-        elif type(predictions) == list:
-            fig_height += 1 * len(predictions)
-            height_ratios = height_ratios + [1.5] * len(predictions)
-            nb_plots += len(predictions)
+    PARAMS
+    ======
+        source: string
+            Local directory (its tree is reproduced under the prefix) or 
+            local file (uploaded as prefix/<file name>)
             
-    fig = plt.figure(figsize=(fig_width, fig_height))
-    gs = gridspec.GridSpec(nb_plots, 1, height_ratios=height_ratios, hspace=0.5)
-    ax = []
-    for i in range(nb_plots):
-        ax.append(fig.add_subplot(gs[i]))
+        bucket: string
+            Destination bucket
+            
+        prefix: string
+            Destination prefix
+            
+        max_workers: integer (default: 10)
+            Maximum number of concurrent requests (parts or small files)
+            
+        multipart_threshold: integer (default: 8 MB)
+            Size above which files are sent in several parts
+            
+        multipart_chunksize: integer (default: 8 MB)
+            Size of each part
+            
+        skip_unchanged: boolean (default: True)
+            If True, files already present in S3 are not uploaded again
+            
+        s3_client: boto3.client (default: None)
+            The S3 client to use
+            
+    RETURNS
+    =======
+        uploads_df: pandas.DataFrame
+            A dataframe with the File, Key, Size and Status (uploaded or 
+            skipped) of each file
+    """
+    if s3_client is None:
+        s3_client = get_s3_client(region_name=region_name, max_pool_connections=max_workers)
+    prefix = prefix.strip('/')
         
-    # Plot the time series signal:
-    data = timeseries_df[start:end].copy()
-    if tag_split is not None:
-        ax[0].plot(data.loc[start:tag_split, 'Value'], linewidth=0.5, alpha=0.5, label=f'{tag_name} - Training', color='tab:grey')
-        ax[0].plot(data.loc[tag_split:end, 'Value'], linewidth=0.5, alpha=0.8, label=f'{tag_name} - Evaluation')
+    # List the local files with their destination key:
+    files = []
+    if os.path.isfile(source):
+        files.append((source, f'{prefix}/{os.path.basename(source)}'.lstrip('/')))
     else:
-        ax[0].plot(data['Value'], linewidth=0.5, alpha=0.8, label=tag_name)
-    ax[0].set_xlim(start, end)
+        for root, _, fnames in os.walk(source):
+            for fname in sorted(fnames):
+                path = os.path.join(root, fname)
+                relative_path = os.path.relpath(path, source).replace(os.sep, '/')
+                files.append((path, f'{prefix}/{relative_path}'.lstrip('/')))
+    sizes = [os.path.getsize(path) for path, _ in files]
+                
+    # Files are unchanged when an object with the same size and ETag exists:
+    unchanged = [False] * len(files)
+    if skip_unchanged and (len(files) > 0):
+        existing_objects = {
+            s3_object['Key']: s3_object 
+            for s3_object in list_s3_objects(s3_client, bucket, prefix)
+        }
+        candidates = [
+            i for i, (path, key) in enumerate(files) 
+            if (key in existing_objects) and (existing_objects[key]['Size'] == sizes[i])
+        ]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            etags = executor.map(
+                lambda i: compute_etag(files[i][0], multipart_threshold, multipart_chunksize),
+                candidates
+            )
+            for i, etag in zip(candidates, etags):
+                unchanged[i] = (existing_objects[files[i][1]]['ETag'].strip('"') == etag)
+                
+    # All the uploads share a single transfer manager (and its pool of threads):
+    transfer_config = boto3_transfer.TransferConfig(
+        multipart_threshold=multipart_threshold, 
+        multipart_chunksize=multipart_chunksize, 
+        max_concurrency=max_workers
+    )
+    total_size = sum([size for size, is_unchanged in zip(sizes, unchanged) if not is_unchanged])
+    progress_bar = tqdm.tqdm(total=total_size, unit='B', unit_scale=True, desc='Uploading')
+    with boto3_transfer.create_transfer_manager(s3_client, transfer_config) as manager:
+        futures = [
+            manager.upload(path, bucket, key, subscribers=[boto3_transfer.ProgressCallbackInvoker(progress_bar.update)])
+            for (path, key), is_unchanged in zip(files, unchanged) if not is_unchanged
+        ]
+        for future in futures:
+            future.result()
+    progress_bar.close()
     
-    # Plot a daily rolling average:
-    if plot_rolling_avg == True:
-        daily_rolling_average = data['Value'].rolling(window=60*24).mean()
-        ax[0].plot(data.index, daily_rolling_average, alpha=0.5, color='white', linewidth=3)
-        ax[0].plot(data.index, daily_rolling_average, label='Daily rolling leverage', color='tab:red', linewidth=1)
+    uploads_df = pd.DataFrame({
+        'File': [path for path, _ in files],
+        'Key': [key for _, key in files],
+        'Size': sizes,
+        'Status': ['skipped' if is_unchanged else 'uploaded' for is_unchanged in unchanged]
+    })
+    
+    return uploads_df
 
-    # Configure custom grid:
-    ax_id = 0
-    if custom_grid:
-        date_format = DateFormatter("%Y-%m")
-        major_ticks = np.arange(start, end, 3, dtype='datetime64[M]')
-        minor_ticks = np.arange(start, end, 1, dtype='datetime64[M]')
-        ax[ax_id].xaxis.set_major_formatter(date_format)
-        ax[ax_id].set_xticks(major_ticks)
-        ax[ax_id].set_xticks(minor_ticks, minor=True)
-        ax[ax_id].grid(which='minor', axis='x', alpha=0.8)
-        ax[ax_id].grid(which='major', axis='x', alpha=1.0, linewidth=2)
-        ax[ax_id].xaxis.set_tick_params(rotation=30)
+def compute_etag(fname, multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024):
+    """
+    Compute the ETag S3 gives to a file uploaded with the given multipart
+    settings: the MD5 of the file for a single part upload, or the MD5 of
+    the concatenated MD5 of each part (followed by the number of parts) 
+    for a multipart upload. The transfer manager used by upload_to_s3() 
+    raises the part size to the S3 limits (at least 5 MB, at most 10,000 
+    parts): the same adjustment is applied here.
+    
+    PARAMS
+    ======
+        fname: string
+            The local file
+            
+        multipart_threshold: integer (default: 8 MB)
+            Size above which files are sent in several parts
+            
+        multipart_chunksize: integer (default: 8 MB)
+            Size of each part
+            
+    RETURNS
+    =======
+        etag: string
+            The expected ETag (without quotes)
+    """
+    multipart_chunksize = s3transfer_utils.ChunksizeAdjuster().adjust_chunksize(
+        multipart_chunksize, os.path.getsize(fname)
+    )
+    whole_md5 = hashlib.md5()
+    parts_md5 = []
+    with open(fname, 'rb') as f:
+        for chunk in iter(lambda: f.read(multipart_chunksize), b''):
+            whole_md5.update(chunk)
+            parts_md5.append(hashlib.md5(chunk).digest())
+            
+    if os.path.getsize(fname) < multipart_threshold:
+        return whole_md5.hexdigest()
+        
+    multipart_md5 = hashlib.md5(b''.join(parts_md5))
+    etag = f'{multipart_md5.hexdigest()}-{len(parts_md5)}'
+    
+    return etag
 
-    # Add the labels on a second plot:
-    if labels_df is not None:
-        ax_id += 1
-        label_index = pd.date_range(start=data.index.min(), end=data.index.max(), freq='1min')
-        label_data = pd.DataFrame(index=label_index)
-        label_data.loc[:, 'Label'] = 0.0
+def upload_and_ingest_data(source, 
+                           data_ingestion_role_arn, 
+                           dataset_name, 
+                           bucket, 
+                           prefix, 
+                           region_name=DEFAULT_REGION, 
+                           **upload_parameters):
+    """
+    Upload a local dataset directory to S3 (only the files that changed,
+    see upload_to_s3()) and start its ingestion into a dataset.
+    
+    PARAMS
+    ======
+        source: string
+            Local directory with one sub-directory per component
+            
+        data_ingestion_role_arn: string
+            The role used by the service to read the data
+            
+        dataset_name: string
+            The dataset to ingest the data into
+            
+        bucket: string
+            Destination bucket
+            
+        prefix: string
+            Destination prefix
+            
+        upload_parameters:
+            Other parameters passed to upload_to_s3()
+            
+    RETURNS
+    =======
+        uploads_df: pandas.DataFrame
+            The status of each file upload
+            
+        data_ingestion_job_id: string
+            The ID of the ingestion job
+            
+        data_ingestion_status: string
+            The status of the ingestion job
+    """
+    uploads_df = upload_to_s3(source, bucket, prefix, region_name=region_name, **upload_parameters)
+    prefix = prefix.strip('/') + '/' if len(prefix.strip('/')) > 0 else ''
+    data_ingestion_job_id, data_ingestion_status = ingest_data(
+        data_ingestion_role_arn, 
+        dataset_name, 
+        bucket, 
+        prefix, 
+        region_name=region_name
+    )
+    
+    return uploads_df, data_ingestion_job_id, data_ingestion_status
+            
+async def _run_in_thread(function, *args, **kwargs):
+    """
+    Run a blocking function (a boto3 call for instance) in the default
+    executor of the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(function, *args, **kwargs))
 
-        for index, row in labels_df.iterrows():
-            event_start = row['start']
-            event_end = row['end']
-            label_data.loc[event_start:event_end, 'Label'] = 1.0
+async def wait_for_status(describe_function,
+                          pending_statuses,
+                          timeout=None,
+                          callback=None,
+                          initial_delay=5,
+                          max_delay=60,
+                          backoff_factor=1.5,
+                          status_key='Status'):
+    """
+    Poll a resource until its status is not a pending status anymore. The
+    delay between two polls grows exponentially (with some random jitter
+    so that many resources polled at the same time do not hit the API 
+    together) and the coroutine sleeps between polls without blocking any
+    thread: many resources can be waited for concurrently.
+    
+    PARAMS
+    ======
+        describe_function: callable
+            Blocking function returning the description of the resource 
+            (a dictionary with a status field)
             
-        ax[ax_id].plot(label_data['Label'], color='tab:green', linewidth=0.5)
-        ax[ax_id].set_xlim(start, end)
-        ax[ax_id].fill_between(label_index, y1=label_data['Label'], y2=0, alpha=0.1, color='tab:green', label='Real anomaly range (label)')
-        ax[ax_id].axes.get_xaxis().set_ticks([])
-        ax[ax_id].axes.get_yaxis().set_ticks([])
-        ax[ax_id].set_xlabel('Anomaly ranges (labels)', fontsize=12)
+        pending_statuses: list of strings
+            Statuses for which the polling goes on
+            
+        timeout: float (default: None)
+            Maximum time to wait in seconds. An asyncio.TimeoutError is 
+            raised when the resource is still pending after this time
+            
+        callback: callable (default: None)
+            Function (or coroutine function) called after each poll with 
+            the status and the full description of the resource
+            
+        initial_delay: float (default: 5)
+            Delay in seconds before the second poll
+            
+        max_delay: float (default: 60)
+            Maximum delay in seconds between two polls
+            
+        backoff_factor: float (default: 1.5)
+            Factor applied to the delay after each poll
+            
+        status_key: string (default: 'Status')
+            Name of the status field in the description
+            
+    RETURNS
+    =======
+        response: dict
+            The last description of the resource
+    """
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    delay = initial_delay
+    
+    while True:
+        # Throttled calls are retried at the next poll:
+        try:
+            response = await _run_in_thread(describe_function)
+            
+        except botocore_exceptions.ClientError as e:
+            if e.response['Error']['Code'] not in THROTTLING_ERROR_CODES:
+                raise
+            response = None
+            
+        if response is not None:
+            status = response[status_key]
+            if callback is not None:
+                callback_result = callback(status, response)
+                if asyncio.iscoroutine(callback_result):
+                    await callback_result
+                    
+            if status not in pending_statuses:
+                return response
+                
+        # Exponential backoff with jitter:
+        sleep_time = delay / 2 + random.uniform(0, delay / 2)
+        delay = min(delay * backoff_factor, max_delay)
+        if deadline is not None:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f'Resource still pending after {timeout} seconds.')
+            sleep_time = min(sleep_time, remaining)
+            
+        await asyncio.sleep(sleep_time)
         
-    # Add the labels (anomaly range) on a 
-    # third plot located below the main ones:
-    if predictions is not None:
-        pred_index = pd.date_range(start=data.index.min(), end=data.index.max(), freq='1min')
-        pred_data = pd.DataFrame(index=pred_index)
+async def ingest_data_async(data_ingestion_role_arn, 
+                            dataset_name, 
+                            bucket, 
+                            prefix, 
+                            region_name=DEFAULT_REGION,
+                            timeout=None,
+                            callback=None,
+                            initial_delay=30,
+                            max_delay=300):
+    """
+    Start a data ingestion job and wait for it to complete without blocking
+    the event loop.
+    
+    PARAMS
+    ======
+        data_ingestion_role_arn, dataset_name, bucket, prefix, region_name:
+            See ingest_data()
+            
+        timeout, callback, initial_delay, max_delay:
+            Polling parameters, see wait_for_status()
+            
+    RETURNS
+    =======
+        describe_data_ingestion_job_response: dict
+            The description of the ingestion job once completed
+    """
+    lookoutequipment_client = get_client(region_name=region_name)
+    data_ingestion_job_id, _ = await _run_in_thread(
+        ingest_data, data_ingestion_role_arn, dataset_name, bucket, prefix, region_name
+    )
+    
+    describe_data_ingestion_job_response = await wait_for_status(
+        functools.partial(lookoutequipment_client.describe_data_ingestion_job, JobId=data_ingestion_job_id),
+        pending_statuses=['IN_PROGRESS'],
+        timeout=timeout,
+        callback=callback,
+        initial_delay=initial_delay,
+        max_delay=max_delay
+    )
+    
+    return describe_data_ingestion_job_response
+
+async def train_model_async(create_model_request,
+                            region_name=DEFAULT_REGION,
+                            timeout=None,
+                            callback=None,
+                            initial_delay=60,
+                            max_delay=600):
+    """
+    Create a model and wait for its training to complete without blocking
+    the event loop.
+    
+    PARAMS
+    ======
+        create_model_request: dict
+            Parameters of the CreateModel API call
+            
+        region_name: string
+            AWS region name. (Default: eu-west-1)
+            
+        timeout, callback, initial_delay, max_delay:
+            Polling parameters, see wait_for_status()
+            
+    RETURNS
+    =======
+        describe_model_response: dict
+            The description of the model once the training is over
+    """
+    lookoutequipment_client = get_client(region_name=region_name)
+    await _run_in_thread(lookoutequipment_client.create_model, **create_model_request)
+    
+    describe_model_response = await wait_for_status(
+        functools.partial(lookoutequipment_client.describe_model, ModelName=create_model_request['ModelName']),
+        pending_statuses=['IN_PROGRESS'],
+        timeout=timeout,
+        callback=callback,
+        initial_delay=initial_delay,
+        max_delay=max_delay
+    )
+    
+    return describe_model_response
+            
+def create_data_schema(component_fields_map: Dict):
+    return json.dumps(_create_data_schema_map(component_fields_map=component_fields_map))
+
+def _create_data_schema_map(component_fields_map: Dict):
+    data_schema = dict()
+    component_schema_list = list()
+    data_schema['Components'] = component_schema_list
+
+    for component_name in component_fields_map:
+        component_schema = _create_component_schema(component_name, component_fields_map[component_name])
+        component_schema_list.append(component_schema)
+
+    return data_schema
+
+def _create_component_schema(component_name: str, field_names: List):
+    component_schema = dict()
+    component_schema['ComponentName'] = component_name
+    col_list = []
+    component_schema['Columns'] = col_list
+
+    is_first_field = True
+    for field_name in field_names:
+        if is_first_field:
+            ts_col = dict()
+            ts_col['Name'] = field_name
+            ts_col['Type'] = 'DATETIME'
+            col_list.append(ts_col)
+            is_first_field = False
+        else:
+            attr_col = dict()
+            attr_col['Name'] = field_name
+            attr_col['Type'] = 'DOUBLE'
+            col_list.append(attr_col)
+    return component_schema
+
+def _get_component_tags(tags_description):
+    """
+    Normalize a tags description into a dictionary with the list of tags
+    of each component.
+    
+    PARAMS
+    ======
+        tags_description: pandas.DataFrame or dict
+            Either a dataframe with a 'Subsystem' and a 'Tag' column (like
+            the tags_description.csv file of the dataset) or a dictionary 
+            with the list of tags of each component
+            
+    RETURNS
+    =======
+        component_tags: dict
+            The list of tags of each component (in their original order)
+    """
+    if isinstance(tags_description, pd.DataFrame):
+        component_tags = dict()
+        for component, tag in zip(tags_description['Subsystem'], tags_description['Tag']):
+            component_tags.setdefault(component, []).append(tag)
+            
+    else:
+        component_tags = {component: list(tags) for component, tags in tags_description.items()}
         
-        if type(predictions) == pd.core.frame.DataFrame:
-            ax_id += 1
-            pred_data.loc[:, 'prediction'] = 0.0
+    return component_tags
 
-            for index, row in predictions.iterrows():
-                event_start = row['start']
-                event_end = row['end']
-                pred_data.loc[event_start:event_end, 'prediction'] = 1.0
+def format_timestamps(timestamps):
+    """
+    Format timestamps as ISO 8601 strings with a microsecond precision 
+    (e.g. 2015-04-05T00:00:00.000000), like strftime('%Y-%m-%dT%H:%M:%S.%f')
+    would, but in a single vectorized call.
+    
+    PARAMS
+    ======
+        timestamps: pandas.DatetimeIndex or numpy.array of datetime64
+            The (timezone naive) timestamps to format
+            
+    RETURNS
+    =======
+        formatted_timestamps: numpy.array of strings
+            The formatted timestamps
+    """
+    timestamps = np.asarray(timestamps, dtype='datetime64[us]')
+    formatted_timestamps = np.datetime_as_string(timestamps, unit='us')
+    
+    return formatted_timestamps
 
-            ax[ax_id].plot(pred_data['prediction'], color='tab:red', linewidth=0.5)
-            ax[ax_id].set_xlim(start, end)
-            ax[ax_id].fill_between(pred_index, 
-                             y1=pred_data['prediction'],
-                             y2=0, 
-                             alpha=0.1, 
-                             color='tab:red')
-            ax[ax_id].axes.get_xaxis().set_ticks([])
-            ax[ax_id].axes.get_yaxis().set_ticks([])
-            ax[ax_id].set_xlabel('Anomaly ranges (Prediction)', fontsize=12)
+def export_components(tags_df, 
+                      tags_description, 
+                      output_dir, 
+                      max_workers=None, 
+                      backend='process', 
+                      chunk_size=100000, 
+                      compression=None, 
+                      overwrite=False):
+    """
+    Export a wide dataframe with all the tags into one CSV file per 
+    component, with the layout expected by Lookout for Equipment:
+    output_dir/<component>/<component>.csv, a Timestamp column first and
+    then one column per tag. Components are exported in parallel and each
+    file is written by chunks of rows.
+    
+    PARAMS
+    ======
+        tags_df: pandas.DataFrame
+            A dataframe indexed by time with one column per tag
             
-        elif type(predictions) == list:
-            for prediction_index, p in enumerate(predictions):
-                ax_id += 1
-                pred_data.loc[:, 'prediction'] = 0.0
-
-                for index, row in p.iterrows():
-                    event_start = row['start']
-                    event_end = row['end']
-                    pred_data.loc[event_start:event_end, 'prediction'] = 1.0
-                
-                ax[ax_id].plot(pred_data['prediction'], color='tab:red', linewidth=0.5)
-                ax[ax_id].set_xlim(start, end)
-                ax[ax_id].fill_between(pred_index,
-                                 y1=pred_data['prediction'],
-                                 y2=0, 
-                                 alpha=0.1, 
-                                 color='tab:red')
-                ax[ax_id].axes.get_xaxis().set_ticks([])
-                ax[ax_id].axes.get_yaxis().set_ticks([])
-                ax[ax_id].set_xlabel(prediction_titles[prediction_index], fontsize=12)
+        tags_description: pandas.DataFrame or dict
+            Either a dataframe with a 'Subsystem' and a 'Tag' column or a
+            dictionary with the list of tags of each component
+            
+        output_dir: string
+            The directory where to write the component directories
+            
+        max_workers: integer (default: None)
+            Number of components to export in parallel (-1 to use all the
+            CPUs). By default, components are exported one after the other
+            
+        backend: string (default: 'process')
+            Type of pool ('process' or 'thread') to use with max_workers
+            
+        chunk_size: integer (default: 100000)
+            Number of rows to format and write at once
+            
+        compression: string (default: None)
+            Set to 'gzip' to write gzipped files (<component>.csv.gz)
+            
+        overwrite: boolean (default: False)
+            If False, the components with an existing file are skipped
+            
+    RETURNS
+    =======
+        component_files: dict
+            The path of the file of each component
+    """
+    if compression not in [None, 'gzip']:
+        raise Exception(f'Unknown compression "{compression}": expecting None or "gzip".')
+    if backend not in ['process', 'thread']:
+        raise Exception(f'Unknown backend "{backend}": expecting "process" or "thread".')
         
-    # Show the plot with a legend:
-    ax[0].legend(fontsize=10, loc='upper right', framealpha=0.4)
+    component_tags = _get_component_tags(tags_description)
+    for tags in component_tags.values():
+        _check_csv_header(tags)
+    extension = '.csv.gz' if compression == 'gzip' else '.csv'
+    timestamps = np.asarray(tags_df.index, dtype='datetime64[ns]')
+    
+    jobs = dict()
+    component_files = dict()
+    for component, tags in component_tags.items():
+        fname = os.path.join(output_dir, component, f'{component}{extension}')
+        component_files.update({component: fname})
+        if overwrite or not os.path.exists(fname):
+            jobs.update({component: (fname, tags)})
+            
+    # Only send each worker the columns of its own component. They are
+    # extracted when the job is started, so that only the components
+    # being written are held in memory next to the dataframe:
+    def get_job(fname, tags):
+        return fname, timestamps, tags_df[tags].to_numpy(), tags, chunk_size, compression
+            
+    if max_workers == -1:
+        max_workers = os.cpu_count()
         
-    return fig, ax
+    if (max_workers is None) or (max_workers <= 1) or (len(jobs) <= 1):
+        for component, job in tqdm.tqdm(jobs.items(), desc='Exporting components'):
+            _export_component(*get_job(*job))
+            
+    else:
+        if backend == 'process':
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+            
+        with executor, tqdm.tqdm(total=len(jobs), desc='Exporting components') as progress_bar:
+            pending_jobs = list(jobs.values())
+            futures = set()
+            while (len(pending_jobs) > 0) or (len(futures) > 0):
+                while (len(pending_jobs) > 0) and (len(futures) < max_workers):
+                    futures.add(executor.submit(_export_component, *get_job(*pending_jobs.pop(0))))
+                    
+                done, futures = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    progress_bar.update(1)
+            
+    return component_files
 
-class LookoutEquipmentAnalysis:
+def _export_component(fname, timestamps, values, tags, chunk_size, compression):
     """
-    A class to manage Lookout for Equipment result analysis
+    Write the CSV file of a single component, one chunk of rows at a time.
+    Missing values are written as empty fields. The file is written under 
+    a temporary name first so that an interrupted export never leaves a 
+    truncated file behind.
+    """
+    os.makedirs(os.path.dirname(fname), exist_ok=True)
+    tmp_fname = fname + '.tmp'
     
-    ATTRIBUTES
-    ==========
-        model_name: string
-            The name of the Lookout for Equipment trained model
-                
-        predicted_ranges: pandas.DataFrame
-            A Pandas dataframe with the predicted anomaly ranges listed in
-            chronological order with a Start and End columns
+    with pa.OSFile(tmp_fname, 'wb') as raw_handle:
+        handle = pa.CompressedOutputStream(raw_handle, 'gzip') if compression == 'gzip' else raw_handle
+        _write_csv(handle, timestamps, values, tags, chunk_size)
+        if compression == 'gzip':
+            handle.close()
+            
+    os.replace(tmp_fname, fname)
+    
+    return fname
 
-        labelled_ranges: pandas.DataFrame
-            A Pandas dataframe with the labelled anomaly ranges listed in
-            chronological order with a Start and End columns
+def _check_csv_header(tags):
+    """
+    Raise an exception for the tag names which cannot be written in a CSV
+    header without quotes.
+    """
+    invalid_tags = [tag for tag in tags if re.search('[,"\r\n]', tag)]
+    if len(invalid_tags) > 0:
+        raise Exception(f'Tag names cannot contain commas, quotes or line breaks: {invalid_tags}')
 
-        df_list: list of pandas.DataFrame
-            A list with each time series into a dataframe
+def _write_csv(handle, timestamps, values, tags, chunk_size=100000):
+    """
+    Write a Timestamp column followed by one column per tag in CSV format
+    to a pyarrow output stream (or any binary file object), one chunk of 
+    rows at a time. Missing values are written as empty fields. The header
+    is written without quotes: tag names which would need them (with a 
+    comma, a quote or a line break) raise an exception.
+    """
+    _check_csv_header(tags)
+    schema = pa.schema([('Timestamp', pa.string())] + [(tag, pa.float64()) for tag in tags])
+    write_options = pcsv.WriteOptions(include_header=False, quoting_style='none')
+    handle.write((','.join(['Timestamp'] + list(tags)) + '\n').encode('utf-8'))
+    
+    with pcsv.CSVWriter(handle, schema, write_options=write_options) as writer:
+        for start in range(0, values.shape[0], chunk_size):
+            chunk = values[start:start + chunk_size]
+            columns = [pa.array(format_timestamps(timestamps[start:start + chunk_size]))]
+            columns += [pa.array(chunk[:, position], type=pa.float64(), from_pandas=True) for position in range(chunk.shape[1])]
+            writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
 
-    METHODS
-    =======
-        set_time_periods():
-            Sets the time period used for the analysis of the model evaluations
+def infer_component_fields(source, 
+                           sample_rows=0, 
+                           max_workers=16, 
+                           header_bytes=65536, 
+                           s3_client=None, 
+                           region_name=DEFAULT_REGION):
+    """
+    Build the component fields map expected by create_data_schema() from a
+    directory of component files (one sub-directory per component, like 
+    the one written by export_components()). Only the first bytes of each
+    file are read (with ranged GET requests for S3 objects), concurrently.
+    
+    PARAMS
+    ======
+        source: string
+            A local directory or an S3 location (s3://bucket/prefix/)
             
-        get_predictions():
-            Get the anomaly ranges predicted by the current model
+        sample_rows: integer (default: 0)
+            Number of data rows to read after the header of each file. When
+            positive, the values of these rows are checked and an exception
+            is raised for the fields with non numeric values (the service
+            only accepts a timestamp followed by DOUBLE fields). Headers 
+            with empty or duplicated field names always raise an exception
             
-        get_labels():
-            Get the labelled ranges as provided to the model before training
+        max_workers: integer (default: 16)
+            Number of files to read concurrently
             
-        compute_histograms():
-            This method loops through each signal and computes two distributions
-            of the values in the time series: one for all the anomalies found in
-            the evaluation period and another one with all the normal values 
-            found in the same period. It then ranks every signals based on the
+        header_bytes: integer (default: 65536)
+            Number of bytes to read first from each file (this is doubled
+            until enough lines are read)
+            
+        s3_client: boto3.client (default: None)
+            The S3 client to use for an S3 source
+            
+    RETURNS
+    =======
+        component_fields_map: dict
+            The list of fields of each component, the timestamp first
+    """
+    # List the files of each component along with their size:
+    files = []
+    if source.startswith('s3://'):
+        bucket, _, prefix = source[len('s3://'):].partition('/')
+        if (len(prefix) > 0) and (not prefix.endswith('/')):
+            prefix += '/'
+        if s3_client is None:
+            s3_client = get_s3_client(region_name=region_name, max_pool_connections=max_workers)
+        for s3_object in list_s3_objects(s3_client, bucket, prefix):
+            if not s3_object['Key'].endswith('/'):
+                read_range = functools.partial(_read_s3_range, s3_client, bucket, s3_object['Key'])
+                files.append((s3_object['Key'][len(prefix):], s3_object['Size'], read_range))
+                
+    else:
+        for root, _, fnames in os.walk(source):
+            for fname in fnames:
+                path = os.path.join(root, fname)
+                relative_path = os.path.relpath(path, source).replace(os.sep, '/')
+                files.append((relative_path, os.path.getsize(path), functools.partial(_read_local_range, path)))
+                
+    files = sorted(files, key=lambda f: f[0])
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        all_rows = list(executor.map(
+            lambda f: _read_head_rows(f[2], f[1], 1 + sample_rows, header_bytes, f[0].endswith('.gz')),
+            files
+        ))
+    
+    # Each sub-directory is a component (files at the root 
+    # are components on their own), that can be split into
+    # several files with the same fields:
+    component_fields_map = dict()
+    non_numeric_fields = []
+    for (relative_path, _, _), rows in zip(files, all_rows):
+        if len(rows) == 0:
+            continue
+            
+        header = [field.strip() for field in rows[0]]
+        if ('' in header) or (len(set(header)) < len(header)):
+            raise Exception(f'Empty or duplicated field names in the header of {relative_path}: {rows[0]}')
+            
+        if '/' in relative_path:
+            component = relative_path.split('/')[0]
+        else:
+            component = relative_path.split('.')[0]
+            
+        fields = component_fields_map.setdefault(component, [])
+        for field in rows[0]:
+            if field not in fields:
+                fields.append(field)
+                
+        for row in rows[1:]:
+            for field, value in zip(rows[0][1:], row[1:]):
+                if (len(value) > 0) and (not _is_number(value)):
+                    non_numeric_fields.append(f'{component}/{field}')
+                
+    if len(non_numeric_fields) > 0:
+        non_numeric_fields = sorted(set(non_numeric_fields))
+        raise Exception(f'Fields with non numeric values: {non_numeric_fields}')
+        
+    return component_fields_map
+
+def _read_local_range(path, start, end):
+    """
+    Read the bytes between two positions (included) of a local file.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start + 1)
+
+def _read_s3_range(s3_client, bucket, key, start, end):
+    """
+    Read the bytes between two positions (included) of an S3 object.
+    """
+    response = s3_client.get_object(Bucket=bucket, Key=key, Range=f'bytes={start}-{end}')
+    return response['Body'].read()
+
+def _read_head_rows(read_range, size, num_rows, header_bytes, compressed):
+    """
+    Read the first rows of a CSV file (optionally gzipped), fetching only
+    the bytes needed with the read_range function.
+    """
+    decompressor = zlib.decompressobj(wbits=31) if compressed else None
+    content = b''
+    offset = 0
+    chunk_size = header_bytes
+    while (offset < size) and (content.count(b'\n') < num_rows):
+        data = read_range(offset, min(offset + chunk_size, size) - 1)
+        offset += len(data)
+        if len(data) == 0:
+            break
+        content += decompressor.decompress(data) if compressed else data
+        chunk_size *= 2
+        
+    # The last line is only complete at the end of the file:
+    lines = content.decode('utf-8-sig', errors='replace').splitlines()
+    if (offset < size) and not content.endswith(b'\n'):
+        lines = lines[:-1]
+    rows = [row for row in csv.reader(lines[:num_rows]) if len(row) > 0]
+    
+    return rows
+
+def _is_number(value):
+    """
+    Checks if a CSV field can be parsed as a number.
+    """
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+def get_ranges_positions(index, ranges_df):
+    """
+    Locate a set of time ranges in a sorted time index. Both ends of each
+    range are inclusive, as with a .loc[start:end] slice: a range ending 
+    before its start is empty. Naive ranges are taken in the time zone of 
+    a timezone aware index, and timezone aware ranges are converted to UTC
+    for a naive index.
+
+    PARAMS
+    ======
+        index: pandas.DatetimeIndex
+            A sorted time index
+
+        ranges_df: pandas.DataFrame
+            A dataframe with a start and an end column
+
+    RETURNS
+    =======
+        first: numpy.array of integers
+            Position of the first index element of each range
+
+        last: numpy.array of integers
+            Position following the last index element of each range
+    """
+    index = pd.DatetimeIndex(index)
+    starts = _to_index_timezone(ranges_df['start'], index.tz)
+    ends = _to_index_timezone(ranges_df['end'], index.tz)
+    first = index.searchsorted(starts, side='left')
+    last = np.maximum(first, index.searchsorted(ends, side='right'))
+
+    return first, last
+
+def _to_index_timezone(timestamps, tz):
+    """
+    Convert a list of timestamps to a DatetimeIndex comparable with an index
+    in the tz time zone (None for a naive index).
+    """
+    timestamps = pd.DatetimeIndex(pd.to_datetime(timestamps))
+    if (tz is not None) and (timestamps.tz is None):
+        timestamps = timestamps.tz_localize(tz)
+    elif tz is not None:
+        timestamps = timestamps.tz_convert(tz)
+    elif timestamps.tz is not None:
+        timestamps = timestamps.tz_convert(None)
+        
+    return timestamps
+
+def ranges_to_mask(index, ranges_df):
+    """
+    Build a boolean mask over a time index with all the timestamps falling
+    in any of the ranges listed in a dataframe. Ranges are located with a
+    binary search and the mask is obtained with a cumulative sum over the
+    range boundaries: this is done in a single pass whatever the number of
+    ranges and ranges do not need to be sorted or disjoint.
+
+    PARAMS
+    ======
+        index: pandas.DatetimeIndex
+            A sorted time index
+
+        ranges_df: pandas.DataFrame
+            A dataframe with a start and an end column (like the ones
+            returned by LookoutEquipmentAnalysis.get_predictions())
+
+    RETURNS
+    =======
+        mask: numpy.array of booleans
+            An array of the same length as the index, set to True for each
+            timestamp included in at least one range
+    """
+    num_timestamps = len(index)
+    if (ranges_df is None) or (ranges_df.shape[0] == 0):
+        return np.zeros(num_timestamps, dtype=bool)
+
+    first, last = get_ranges_positions(index, ranges_df)
+    boundaries = np.bincount(first, minlength=num_timestamps + 1) \
+               - np.bincount(last, minlength=num_timestamps + 1)
+    mask = np.cumsum(boundaries[:-1]) > 0
+
+    return mask
+
+def mask_to_ranges(index, mask):
+    """
+    Convert a boolean mask over a time index back into a list of ranges.
+    Each range starts on the first timestamp of a run of True values and
+    ends on the last timestamp of this run.
+
+    PARAMS
+    ======
+        index: pandas.DatetimeIndex
+            A sorted time index
+
+        mask: numpy.array of booleans
+            An array of the same length as the index
+
+    RETURNS
+    =======
+        ranges_df: pandas.DataFrame
+            A dataframe with the ranges listed in chronological order with
+            a start and an end column
+    """
+    mask = np.asarray(mask, dtype=np.int8)
+    edges = np.diff(np.concatenate([[0], mask, [0]]))
+    first = np.flatnonzero(edges == 1)
+    last = np.flatnonzero(edges == -1) - 1
+
+    index = pd.DatetimeIndex(index)
+    ranges_df = pd.DataFrame({
+        'start': index[first],
+        'end': index[last]
+    })
+
+    return ranges_df
+
+def _to_datetime64(timestamps):
+    """
+    Convert a list of timestamps (strings, datetimes, timezone aware or not)
+    to a numpy array of naive UTC datetime64[ns].
+    """
+    timestamps = pd.DatetimeIndex(pd.to_datetime(timestamps))
+    if timestamps.tz is not None:
+        timestamps = timestamps.tz_convert(None)
+        
+    return timestamps.values.astype('datetime64[ns]')
+
+def _ranges_to_arrays(ranges_df, start=None, end=None):
+    """
+    Convert a ranges dataframe into sorted arrays of disjoint intervals 
+    (in nanoseconds since the epoch): ranges are sorted by start and the
+    overlapping ones are merged. Ranges can be clipped to a time period.
+    
+    RETURNS
+    =======
+        starts, ends: numpy.array of int64
+            Start and end of each interval (both inclusive), sorted in 
+            chronological order
+    """
+    if (ranges_df is None) or (ranges_df.shape[0] == 0):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        
+    starts = _to_datetime64(ranges_df['start']).view(np.int64)
+    ends = _to_datetime64(ranges_df['end']).view(np.int64)
+    
+    if start is not None:
+        starts = np.maximum(starts, pd.Timestamp(start).value)
+    if end is not None:
+        ends = np.minimum(ends, pd.Timestamp(end).value)
+    valid = starts <= ends
+    starts, ends = starts[valid], ends[valid]
+    
+    # A new interval begins with each range starting 
+    # after the end of all the previous ones:
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+    if len(starts) > 1:
+        previous_ends = np.maximum.accumulate(ends)[:-1]
+        new_interval = np.concatenate([[True], starts[1:] > previous_ends])
+        groups = np.flatnonzero(new_interval)
+        starts = starts[groups]
+        ends = np.maximum.reduceat(ends, groups)
+    
+    return starts, ends
+
+def _count_overlaps(starts, ends, other_starts, other_ends):
+    """
+    For each interval, locate the sorted disjoint other intervals which
+    overlap it with two binary searches.
+    
+    RETURNS
+    =======
+        first, last: numpy.array of integers
+            The other intervals overlapping interval i are the ones from
+            position first[i] (included) to last[i] (excluded)
+    """
+    first = np.searchsorted(other_ends, starts, side='left')
+    last = np.searchsorted(other_starts, ends, side='right')
+    
+    return first, np.maximum(first, last)
+
+def _overlap_durations(starts, ends, other_starts, other_ends, first, last):
+    """
+    Total duration (in nanoseconds) of the other intervals overlapping each
+    interval, clipped to this interval, from the cumulative durations of 
+    the other intervals.
+    """
+    if len(other_starts) == 0:
+        return np.zeros(len(starts), dtype=np.int64)
+        
+    cumulative_durations = np.concatenate([[0], np.cumsum(other_ends - other_starts)])
+    overlaps = cumulative_durations[last] - cumulative_durations[first]
+    
+    # Only the first and the last overlapping 
+    # intervals can stick out of each interval:
+    found = last > first
+    head = np.where(found, starts - other_starts[np.minimum(first, len(other_starts) - 1)], 0)
+    tail = np.where(found, other_ends[np.maximum(last - 1, 0)] - ends, 0)
+    overlaps = overlaps - np.maximum(head, 0) - np.maximum(tail, 0)
+    
+    return overlaps
+
+def evaluate_ranges(labelled_ranges, predicted_ranges, start=None, end=None, early_warning=None):
+    """
+    Compare predicted anomaly ranges with the labelled ones, event per 
+    event. Both lists of ranges are sorted and merged into disjoint 
+    intervals, then matched with binary searches: the cost only depends on 
+    the number of ranges (O(n log n)), not on their duration.
+    
+    A labelled event is detected when at least one predicted range overlaps 
+    it (or ends less than early_warning before it starts). A predicted 
+    range is a false alarm when it does not overlap any labelled event 
+    (extended by early_warning in the same way).
+    
+    PARAMS
+    ======
+        labelled_ranges: pandas.DataFrame
+            The labelled ranges, with a start and an end column
+            
+        predicted_ranges: pandas.DataFrame
+            The predicted ranges, with a start and an end column
+            
+        start: datetime (default: None)
+            If provided, ranges are clipped to start at this date at the
+            earliest (start of the evaluation period for instance)
+            
+        end: datetime (default: None)
+            If provided, ranges are clipped to end at this date at the latest
+            
+        early_warning: string or pandas.Timedelta (default: None)
+            Predicted ranges ending at most this duration before a labelled
+            event are considered as early detections of this event
+            
+    RETURNS
+    =======
+        metrics: dict
+            The event counts, precision, recall and F1 score at event level,
+            the overlap precision and recall (share of the predicted and
+            labelled time shared by both), the number and total duration 
+            of the false alarms, and the mean and median lead times.
+            Ratios without any range to compute them on are NaN: the event
+            precision without predicted ranges, the event recall without
+            labelled events and the F1 score when either of them is NaN.
+            The F1 score is 0.0 when the precision and recall are both 0.0
+            
+        events_df: pandas.DataFrame
+            One row per labelled event with its start, end, whether it was
+            Detected, its LeadTime (time between the start of the first 
+            matching predicted range and the start of the event: negative
+            when the event was detected late) and its Overlap (predicted
+            time within the event)
+            
+        false_alarms_df: pandas.DataFrame
+            One row per false alarm with its start, end and Duration
+    """
+    with _span('analysis.evaluate_ranges') as span:
+        labelled_starts, labelled_ends = _ranges_to_arrays(labelled_ranges, start, end)
+        predicted_starts, predicted_ends = _ranges_to_arrays(predicted_ranges, start, end)
+        span.add(labelled_ranges=len(labelled_starts), predicted_ranges=len(predicted_starts))
+        
+        # Labelled events extended to the start of their early warning period:
+        early_warning = 0 if early_warning is None else pd.Timedelta(early_warning).value
+        window_starts = labelled_starts - early_warning
+        
+        # Match each labelled event with the predicted ranges:
+        first, last = _count_overlaps(window_starts, labelled_ends, predicted_starts, predicted_ends)
+        detected = last > first
+        lead_times = np.full(len(labelled_starts), np.iinfo(np.int64).min)
+        lead_times[detected] = labelled_starts[detected] - predicted_starts[first[detected]]
+        overlap_first, overlap_last = _count_overlaps(labelled_starts, labelled_ends, predicted_starts, predicted_ends)
+        overlaps = _overlap_durations(
+            labelled_starts, labelled_ends, predicted_starts, predicted_ends, overlap_first, overlap_last
+        )
+        
+        # Match each predicted range with the (extended) labelled events:
+        first, last = _count_overlaps(predicted_starts, predicted_ends, window_starts, labelled_ends)
+        false_alarm = last == first
+        
+        events_df = pd.DataFrame({
+            'start': labelled_starts.view('datetime64[ns]'),
+            'end': labelled_ends.view('datetime64[ns]'),
+            'Detected': detected,
+            'LeadTime': lead_times.view('timedelta64[ns]'),
+            'Overlap': overlaps.view('timedelta64[ns]')
+        })
+        false_alarms_df = pd.DataFrame({
+            'start': predicted_starts[false_alarm].view('datetime64[ns]'),
+            'end': predicted_ends[false_alarm].view('datetime64[ns]'),
+            'Duration': (predicted_ends - predicted_starts)[false_alarm].view('timedelta64[ns]')
+        })
+        
+        metrics = _compute_event_metrics(
+            events_df, 
+            false_alarms_df, 
+            num_predicted=len(predicted_starts),
+            labelled_duration=int(np.sum(labelled_ends - labelled_starts)),
+            predicted_duration=int(np.sum(predicted_ends - predicted_starts))
+        )
+    
+    return metrics, events_df, false_alarms_df
+
+def _compute_event_metrics(events_df, false_alarms_df, num_predicted, labelled_duration, predicted_duration):
+    """
+    Aggregate the per event results of evaluate_ranges() into metrics.
+    """
+    def ratio(numerator, denominator):
+        return numerator / denominator if denominator > 0 else float('nan')
+        
+    num_detected = int(events_df['Detected'].sum())
+    num_true_predictions = num_predicted - len(false_alarms_df)
+    precision = ratio(num_true_predictions, num_predicted)
+    recall = ratio(num_detected, len(events_df))
+    if np.isnan(precision) or np.isnan(recall):
+        f1 = float('nan')
+    elif precision + recall == 0:
+        f1 = 0.0
+    else:
+        f1 = 2 * precision * recall / (precision + recall)
+    overlap_duration = int(events_df['Overlap'].values.view(np.int64).sum())
+    lead_times = events_df.loc[events_df['Detected'], 'LeadTime']
+    
+    metrics = {
+        'labelled_events': len(events_df),
+        'predicted_events': num_predicted,
+        'detected_events': num_detected,
+        'event_precision': precision,
+        'event_recall': recall,
+        'event_f1': f1,
+        'labelled_duration': pd.Timedelta(labelled_duration),
+        'predicted_duration': pd.Timedelta(predicted_duration),
+        'overlap_duration': pd.Timedelta(overlap_duration),
+        'overlap_precision': ratio(overlap_duration, predicted_duration),
+        'overlap_recall': ratio(overlap_duration, labelled_duration),
+        'false_alarms': len(false_alarms_df),
+        'false_alarm_duration': false_alarms_df['Duration'].sum(),
+        'mean_lead_time': lead_times.mean(),
+        'median_lead_time': lead_times.median()
+    }
+    
+    return metrics
+
+def parse_model_metrics(model_metrics):
+    """
+    Parse the ModelMetrics document returned by the DescribeModel API and
+    extract the labelled and predicted anomaly ranges. The document is
+    parsed only once, as JSON (with orjson when it is installed).
+    
+    PARAMS
+    ======
+        model_metrics: string or bytes
+            The ModelMetrics field of a DescribeModel response
+            
+    RETURNS
+    =======
+        labelled_ranges: pandas.DataFrame
+            The labelled anomaly ranges with a start and an end column
+            
+        predicted_ranges: pandas.DataFrame
+            The predicted anomaly ranges with a start and an end column
+    """
+    if orjson is not None:
+        metrics = orjson.loads(model_metrics)
+    else:
+        metrics = json.loads(model_metrics)
+        
+    labelled_ranges = _ranges_from_records(metrics.get('labeled_ranges', []))
+    predicted_ranges = _ranges_from_records(metrics.get('predicted_ranges', []))
+    
+    return labelled_ranges, predicted_ranges
+
+def _ranges_from_records(records):
+    """
+    Build a ranges dataframe with datetime64 start and end columns from a
+    list of {'start': ..., 'end': ...} dictionaries.
+    """
+    starts = pd.DatetimeIndex(pd.to_datetime([r['start'] for r in records]))
+    ends = pd.DatetimeIndex(pd.to_datetime([r['end'] for r in records]))
+    if starts.tz is not None:
+        starts = starts.tz_convert(None)
+    if ends.tz is not None:
+        ends = ends.tz_convert(None)
+        
+    ranges_df = pd.DataFrame({
+        'start': starts.values.astype('datetime64[ns]'), 
+        'end': ends.values.astype('datetime64[ns]')
+    })
+    
+    return ranges_df
+
+def describe_model_ranges(model_name, region_name=DEFAULT_REGION, cache_dir=None, refresh=False, validate=True):
+    """
+    Get the description of a model with its labelled and predicted anomaly
+    ranges. When a cache directory is provided, the description and the
+    parsed ranges of trained models are stored on disk, keyed by the model
+    name, its last update time and its active version. By default, the 
+    model is still described to check that the cached version is the 
+    current one (a model retrained, or deleted and created again with the
+    same name, gets a new version): only the parsing of its metrics is 
+    saved. With validate=False, the most recent cached version is used 
+    without any API call.
+    
+    PARAMS
+    ======
+        model_name: string
+            The name of the Lookout for Equipment trained model
+            
+        region_name: string
+            AWS region name. (Default: eu-west-1)
+            
+        cache_dir: string (default: None)
+            Directory where the model descriptions are cached
+            
+        refresh: boolean (default: False)
+            If True, the cache is ignored and the model is described again
+            
+        validate: boolean (default: True)
+            If False, a cached version of the model is used without 
+            checking that the model did not change (to work offline)
+            
+    RETURNS
+    =======
+        describe_model_response: dict
+            The DescribeModel response, without the ModelMetrics field 
+            (dates are datetimes, whether they come from the cache or not)
+            
+        labelled_ranges: pandas.DataFrame
+            The labelled anomaly ranges with a start and an end column
+            
+        predicted_ranges: pandas.DataFrame
+            The predicted anomaly ranges with a start and an end column
+    """
+    model_cache_dir = None if cache_dir is None else os.path.join(cache_dir, model_name)
+    
+    # The most recent version of the model is used when working offline:
+    if (model_cache_dir is not None) and (not refresh) and (not validate) and os.path.isdir(model_cache_dir):
+        cached_versions = sorted(f[:-len('.npz')] for f in os.listdir(model_cache_dir) if f.endswith('.npz'))
+        if len(cached_versions) > 0:
+            fname = os.path.join(model_cache_dir, cached_versions[-1])
+            with open(fname + '.json', 'r') as f:
+                describe_model_response = json.load(f, object_hook=_decode_json_datetime)
+            labelled_ranges, predicted_ranges = _load_cached_ranges(fname)
+            
+            return describe_model_response, labelled_ranges, predicted_ranges
+                
+    lookoutequipment_client = get_client(region_name=region_name)
+    describe_model_response = lookoutequipment_client.describe_model(ModelName=model_name)
+    describe_model_response.pop('ResponseMetadata', None)
+    model_metrics = describe_model_response.pop('ModelMetrics', None)
+    
+    # Only trained models are cached, as they won't change anymore:
+    fname = None
+    if (model_cache_dir is not None) and (describe_model_response.get('Status') == 'SUCCESS'):
+        last_updated = pd.to_datetime(describe_model_response.get('LastUpdatedTime', 0))
+        version = last_updated.strftime('%Y%m%dT%H%M%S%f')
+        if describe_model_response.get('ActiveModelVersion') is not None:
+            version += f'-v{describe_model_response["ActiveModelVersion"]}'
+        fname = os.path.join(model_cache_dir, version)
+        
+        if (not refresh) and os.path.exists(fname + '.npz'):
+            labelled_ranges, predicted_ranges = _load_cached_ranges(fname)
+            return describe_model_response, labelled_ranges, predicted_ranges
+    
+    if model_metrics is not None:
+        labelled_ranges, predicted_ranges = parse_model_metrics(model_metrics)
+    else:
+        labelled_ranges, predicted_ranges = _ranges_from_records([]), _ranges_from_records([])
+    
+    if fname is not None:
+        os.makedirs(model_cache_dir, exist_ok=True)
+        with open(fname + '.json.tmp', 'w') as f:
+            json.dump(describe_model_response, f, default=_encode_json_datetime)
+        with open(fname + '.npz.tmp', 'wb') as f:
+            np.savez(
+                f,
+                labelled_start=labelled_ranges['start'].values,
+                labelled_end=labelled_ranges['end'].values,
+                predicted_start=predicted_ranges['start'].values,
+                predicted_end=predicted_ranges['end'].values
+            )
+        os.replace(fname + '.json.tmp', fname + '.json')
+        os.replace(fname + '.npz.tmp', fname + '.npz')
+    
+    return describe_model_response, labelled_ranges, predicted_ranges
+
+def _load_cached_ranges(fname):
+    """
+    Load the labelled and predicted ranges of a cached model version.
+    """
+    ranges = np.load(fname + '.npz')
+    labelled_ranges = pd.DataFrame({'start': ranges['labelled_start'], 'end': ranges['labelled_end']})
+    predicted_ranges = pd.DataFrame({'start': ranges['predicted_start'], 'end': ranges['predicted_end']})
+    
+    return labelled_ranges, predicted_ranges
+
+def _encode_json_datetime(value):
+    """
+    JSON encoding of the datetimes of the API responses, tagged so that 
+    they are decoded as datetimes again by _decode_json_datetime().
+    """
+    if isinstance(value, datetime.datetime):
+        return {'$datetime': value.isoformat()}
+        
+    return str(value)
+
+def _decode_json_datetime(value):
+    if (len(value) == 1) and ('$datetime' in value):
+        return datetime.datetime.fromisoformat(value['$datetime'])
+        
+    return value
+
+def compute_signal_distances(values, normal_mask, anomaly_mask, num_bins=20, block_size=1048576):
+    """
+    Compute, for every column of a 2D array of signals, the histogram of
+    the normal values and the histogram of the anomalies, and the
+    Wasserstein distance between both distributions. All the columns are
+    processed at once: each column gets num_bins bins of equal width
+    spanning the whole range of values of this signal.
+
+    PARAMS
+    ======
+        values: numpy.array
+            A 2D array with one signal per column
+
+        normal_mask: numpy.array of booleans
+            Rows of the array to use as normal values
+
+        anomaly_mask: numpy.array of booleans
+            Rows of the array to use as anomalies
+
+        num_bins: integer (default: 20)
+            Number of bins to use to build the distributions
+
+        block_size: integer (default: 1048576)
+            Maximum number of values binned at once: columns are processed
+            by blocks to bound the temporary memory used.
+
+    RETURNS
+    =======
+        distances: numpy.array
+            Wasserstein distance for each signal (0.0 for constant or empty
+            signals)
+
+        bins: numpy.array
+            A (num_signals, num_bins + 1) array with the bin edges of each
+            signal
+
+        normal_histograms: numpy.array
+            A (num_signals, num_bins) array with the normalized histograms of
+            the normal values
+
+        anomaly_histograms: numpy.array
+            A (num_signals, num_bins) array with the normalized histograms of
+            the anomalies
+    """
+    values = np.asarray(values)
+    num_signals = values.shape[1]
+    min_values, bin_width, valid_signals, bins = _get_signal_bins(values, num_bins)
+
+    # Only the rows of each period are binned, by blocks of columns:
+    normal_histograms = np.zeros((num_signals, num_bins))
+    anomaly_histograms = np.zeros((num_signals, num_bins))
+    num_rows = max(np.count_nonzero(normal_mask), np.count_nonzero(anomaly_mask), 1)
+    block_columns = max(block_size // num_rows, 1)
+    for first in range(0, num_signals, block_columns):
+        columns = slice(first, first + block_columns)
+        block = values[:, columns]
+        normal_histograms[columns] = _batched_histograms(
+            block[normal_mask], min_values[columns], bin_width[columns], num_bins
+        )
+        anomaly_histograms[columns] = _batched_histograms(
+            block[anomaly_mask], min_values[columns], bin_width[columns], num_bins
+        )
+
+    distances = _histograms_distances(normal_histograms, anomaly_histograms, valid_signals)
+
+    return distances, bins, normal_histograms, anomaly_histograms
+
+def _get_signal_bins(values, num_bins):
+    """
+    Bin edges of each column of a 2D array of signals: num_bins bins of 
+    equal width spanning the whole range of values of the signal. The 
+    per-signal computation builds its edges with np.arange(), which adds
+    a last bin whenever the rounding overshoots the maximum: the distances
+    of both computations can then differ slightly (around 1e-4).
+    
+    RETURNS
+    =======
+        min_values, bin_width: numpy.array
+            First edge and width of the bins of each signal
+            
+        valid_signals: numpy.array of booleans
+            False for the constant or empty signals
+            
+        bins: numpy.array
+            A (num_signals, num_bins + 1) array with the bin edges
+    """
+    with np.errstate(all='ignore'):
+        min_values = np.nanmin(values, axis=0).astype(np.float64)
+        max_values = np.nanmax(values, axis=0).astype(np.float64)
+    bin_width = (max_values - min_values) / num_bins
+    valid_signals = np.isfinite(bin_width) & (bin_width > 0)
+    bins = min_values[:, np.newaxis] + bin_width[:, np.newaxis] * np.arange(num_bins + 1)
+    
+    return min_values, bin_width, valid_signals, bins
+
+def _histograms_distances(normal_histograms, anomaly_histograms, valid_signals):
+    """
+    Wasserstein distance between the normal and anomaly histograms of each
+    signal (0.0 for the invalid signals).
+    """
+    # With equal sample sizes and weights, the Wasserstein distance between
+    # two sets of values is the mean absolute difference of their sorted
+    # values. As in the per-signal computation, the normalized histograms
+    # themselves are the values being compared:
+    distances = np.mean(
+        np.abs(np.sort(normal_histograms, axis=1) - np.sort(anomaly_histograms, axis=1)),
+        axis=1
+    )
+    distances[~valid_signals] = 0.0
+    
+    return distances
+
+def _batched_histograms(values, min_values, bin_width, num_bins):
+    """
+    Compute a normalized histogram (density) for each column of a 2D array.
+    Missing values are ignored and the last bin is closed on both sides,
+    like with numpy.histogram().
+    """
+    num_signals = values.shape[1]
+    with np.errstate(all='ignore'):
+        bin_index = np.floor((values - min_values) / bin_width)
+    valid = np.isfinite(bin_index)
+    bin_index = np.clip(np.where(valid, bin_index, 0), 0, num_bins - 1).astype(np.int64)
+    bin_index += np.arange(num_signals) * num_bins
+
+    counts = np.bincount(bin_index[valid], minlength=num_signals * num_bins)
+    counts = counts.reshape(num_signals, num_bins).astype(np.float64)
+    with np.errstate(all='ignore'):
+        histograms = counts / counts.sum(axis=1, keepdims=True) / bin_width[:, np.newaxis]
+
+    return histograms
+
+def compute_signal_distances_parallel(values,
+                                      normal_mask,
+                                      anomaly_mask,
+                                      num_bins=20,
+                                      n_jobs=None,
+                                      backend='process',
+                                      executor=None):
+    """
+    Parallel version of compute_signal_distances(): the signals (columns)
+    are split in contiguous shards that are processed by a pool of workers.
+    With a process pool, the array is copied once in a shared memory block
+    that all the workers read from, instead of being pickled for each of
+    them. Results are always assembled in the columns order.
+
+    PARAMS
+    ======
+        values: numpy.array
+            A 2D array with one signal per column
+
+        normal_mask: numpy.array of booleans
+            Rows of the array to use as normal values
+
+        anomaly_mask: numpy.array of booleans
+            Rows of the array to use as anomalies
+
+        num_bins: integer (default: 20)
+            Number of bins to use to build the distributions
+
+        n_jobs: integer (default: None)
+            Number of workers to use. -1 uses all the available CPUs. When
+            None, the number of workers of the executor is used if one is
+            provided, otherwise everything is computed in the current thread.
+
+        backend: string (default: 'process')
+            Either 'process' or 'thread': type of pool to create when no
+            executor is provided.
+
+        executor: concurrent.futures.Executor (default: None)
+            An existing pool of workers to use. Process pools get the array
+            through shared memory, other executors get a direct reference.
+
+    RETURNS
+    =======
+        The same outputs as compute_signal_distances()
+    """
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    elif (n_jobs is None) and (executor is not None):
+        n_jobs = getattr(executor, '_max_workers', os.cpu_count())
+
+    if (n_jobs is None) or (n_jobs <= 1) or (values.shape[1] <= 1):
+        return compute_signal_distances(values, normal_mask, anomaly_mask, num_bins=num_bins)
+
+    if backend not in ['process', 'thread']:
+        raise Exception(f'Unknown backend "{backend}": expecting "process" or "thread".')
+
+    # Contiguous shards of columns keep the output order deterministic:
+    shards = [shard for shard in np.array_split(np.arange(values.shape[1]), n_jobs) if len(shard) > 0]
+    shards = [slice(shard[0], shard[-1] + 1) for shard in shards]
+
+    own_executor = executor is None
+    if own_executor:
+        if backend == 'process':
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs)
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+    use_shared_memory = isinstance(executor, concurrent.futures.ProcessPoolExecutor)
+
+    shm = None
+    shared_values = None
+    try:
+        if use_shared_memory:
+            shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            shared_values = np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf, order='F')
+            shared_values[:] = values
+            futures = [
+                executor.submit(
+                    _compute_shared_shard_distances,
+                    shm.name, values.shape, values.dtype.str, shard,
+                    normal_mask, anomaly_mask, num_bins
+                )
+                for shard in shards
+            ]
+        else:
+            futures = [
+                executor.submit(
+                    compute_signal_distances,
+                    values[:, shard], normal_mask, anomaly_mask, num_bins
+                )
+                for shard in shards
+            ]
+        results = [future.result() for future in futures]
+
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+        if shm is not None:
+            # The view must be released before the block can be closed:
+            shared_values = None
+            shm.close()
+            shm.unlink()
+
+    distances, bins, normal_histograms, anomaly_histograms = [
+        np.concatenate(outputs, axis=0) for outputs in zip(*results)
+    ]
+
+    return distances, bins, normal_histograms, anomaly_histograms
+
+def _compute_shared_shard_distances(shm_name, shape, dtype, shard, normal_mask, anomaly_mask, num_bins):
+    """
+    Worker used by compute_signal_distances_parallel(): attach to the shared
+    memory block holding the signals and process a shard of columns.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        values = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, order='F')
+        results = compute_signal_distances(values[:, shard], normal_mask, anomaly_mask, num_bins)
+        del values
+
+    finally:
+        shm.close()
+
+    return results
+
+@_instrumented('plot.timeseries')
+def plot_timeseries(timeseries_df, tag_name, 
+                    start=None, end=None, 
+                    plot_rolling_avg=False, 
+                    labels_df=None, 
+                    predictions=None,
+                    tag_split=None,
+                    custom_grid=True,
+                    fig_width=18,
+                    prediction_titles=None,
+                    downsample=False,
+                    max_points=None
+                   ):
+    """
+    This function plots a time series signal with a line plot and can combine
+    this with labelled and predicted anomaly ranges.
+    
+    PARAMS
+    ======
+        timeseries_df: pandas.DataFrame
+            A dataframe containing the time series to plot
+        
+        tag_name: string
+            The name of the tag that we can add in the label
+        
+        start: string or pandas.Datetime (default: None)
+            Starting timestamp of the signal to plot. If not provided, will use
+            the whole signal
+        
+        end: string or pandas.Datetime (default: None)
+            End timestamp of the signal to plot. If not provided, will use the
+            whole signal
+        
+        plot_rolling_avg: boolean (default: False)
+            If set to true, will add a rolling average curve on top of the
+            line plot for the time series.
+        
+        labels_df: pandas.DataFrame (default: None)
+            If provided, this is a dataframe with all the labelled anomalies.
+            This will be rendered as a filled-in plots below the time series
+            itself.
+        
+        predictions: pandas.DataFrame or list of pandas.DataFrame
+            If provided, this is a dataframe with all the predicted anomalies.
+            This will be rendered as a filled-in plots below the time series
+            itself.
+            
+        tag_split: string or pandas.Datetime
+            If provided, the line plot will plot the first part of the time
+            series with a colour and the second part in grey. This can be
+            used to show the split between training and evaluation period for
+            instance.
+        
+        custom_grid: boolean (default: True)
+            Will show a custom grid with month name mentionned for each quarter
+            and lighter lines for the other month to prevent clutter on the
+            horizontal axis.
+        
+        fig_width: integer (default: 18)
+            Figure width.
+        
+        prediction_titles: list of strings (default: None)
+            If we want to plot multiple predictions, we can set the titles for
+            each of the prediction plot.
+            
+        downsample: boolean (default: False)
+            If True, the time series is reduced to the minimum and maximum
+            values of as many time buckets as there are pixels across the
+            figure (see downsample_timeseries()) and the anomaly ranges are
+            drawn directly as spans: rendering time does not depend on the
+            length of the history anymore.
+            
+        max_points: integer (default: None)
+            Number of buckets used when downsampling. Defaults to the width
+            of the figure in pixels.
+    
+    RETURNS
+    =======
+        fig: matplotlib.pyplot.figure
+            A figure where the plots are drawn
+            
+        ax: matplotlib.pyplot.Axis
+            An axis where the plots are drawn
+    """
+    if start is None:
+        start = timeseries_df.index.min()
+    elif type(start) == str:
+        start = pd.to_datetime(start)
+        
+    if end is None:
+        end = timeseries_df.index.max()
+    elif type(end) == str:
+        end = pd.to_datetime(end)
+        
+    if (tag_split is not None) & (type(tag_split) == str):
+        tag_split = pd.to_datetime(tag_split)
+
+    # Prepare the figure:
+    fig_height = 4
+    height_ratios = [8]
+    nb_plots = 1
+    
+    if labels_df is not None:
+        fig_height += 1
+        height_ratios += [1.5]
+        nb_plots += 1
+        
+    if predictions is not None:
+        if type(predictions) == pd.core.frame.DataFrame:
+            fig_height += 1
+            height_ratios += [1.5]
+            nb_plots += 1
+        elif type(predictions) == list:
+            fig_height += 1 * len(predictions)
+            height_ratios = height_ratios + [1.5] * len(predictions)
+            nb_plots += len(predictions)
+            
+    fig = plt.figure(figsize=(fig_width, fig_height))
+    gs = gridspec.GridSpec(nb_plots, 1, height_ratios=height_ratios, hspace=0.5)
+    ax = []
+    for i in range(nb_plots):
+        ax.append(fig.add_subplot(gs[i]))
+        
+    # Plot the time series signal:
+    data = timeseries_df[start:end].copy()
+    num_buckets = None
+    if downsample:
+        num_buckets = max_points if max_points is not None else int(fig_width * fig.dpi)
+        
+    if tag_split is not None:
+        ax[0].plot(downsample_timeseries(data.loc[start:tag_split, 'Value'], num_buckets), linewidth=0.5, alpha=0.5, label=f'{tag_name} - Training', color='tab:grey')
+        ax[0].plot(downsample_timeseries(data.loc[tag_split:end, 'Value'], num_buckets), linewidth=0.5, alpha=0.8, label=f'{tag_name} - Evaluation')
+    else:
+        ax[0].plot(downsample_timeseries(data['Value'], num_buckets), linewidth=0.5, alpha=0.8, label=tag_name)
+    ax[0].set_xlim(start, end)
+    
+    # Plot a daily rolling average:
+    if plot_rolling_avg == True:
+        daily_rolling_average = data['Value'].rolling(window=60*24).mean()
+        daily_rolling_average = downsample_timeseries(daily_rolling_average, num_buckets)
+        ax[0].plot(daily_rolling_average.index, daily_rolling_average, alpha=0.5, color='white', linewidth=3)
+        ax[0].plot(daily_rolling_average.index, daily_rolling_average, label='Daily rolling leverage', color='tab:red', linewidth=1)
+
+    # Configure custom grid:
+    ax_id = 0
+    if custom_grid:
+        date_format = mdates.DateFormatter("%Y-%m")
+        major_ticks = np.arange(start, end, 3, dtype='datetime64[M]')
+        minor_ticks = np.arange(start, end, 1, dtype='datetime64[M]')
+        ax[ax_id].xaxis.set_major_formatter(date_format)
+        ax[ax_id].set_xticks(major_ticks)
+        ax[ax_id].set_xticks(minor_ticks, minor=True)
+        ax[ax_id].grid(which='minor', axis='x', alpha=0.8)
+        ax[ax_id].grid(which='major', axis='x', alpha=1.0, linewidth=2)
+        ax[ax_id].xaxis.set_tick_params(rotation=30)
+
+    # Add the labels on a second plot:
+    if labels_df is not None:
+        ax_id += 1
+        _plot_ranges_strip(ax[ax_id], labels_df, data.index, 'tab:green', downsample, label='Real anomaly range (label)')
+        ax[ax_id].set_xlim(start, end)
+        ax[ax_id].axes.get_xaxis().set_ticks([])
+        ax[ax_id].axes.get_yaxis().set_ticks([])
+        ax[ax_id].set_xlabel('Anomaly ranges (labels)', fontsize=12)
+        
+    # Add the labels (anomaly range) on a 
+    # third plot located below the main ones:
+    if predictions is not None:
+        if type(predictions) == pd.core.frame.DataFrame:
+            predictions = [predictions]
+            prediction_titles = ['Anomaly ranges (Prediction)']
+        elif prediction_titles is None:
+            prediction_titles = ['Anomaly ranges (Prediction)'] * len(predictions)
+            
+        for prediction_index, p in enumerate(predictions):
+            ax_id += 1
+            _plot_ranges_strip(ax[ax_id], p, data.index, 'tab:red', downsample)
+            ax[ax_id].set_xlim(start, end)
+            ax[ax_id].axes.get_xaxis().set_ticks([])
+            ax[ax_id].axes.get_yaxis().set_ticks([])
+            ax[ax_id].set_xlabel(prediction_titles[prediction_index], fontsize=12)
+        
+    # Show the plot with a legend:
+    ax[0].legend(fontsize=10, loc='upper right', framealpha=0.4)
+        
+    return fig, ax
+
+def _plot_ranges_strip(ax, ranges_df, data_index, color, as_spans, label=None):
+    """
+    Plot anomaly ranges as a strip: either as a dense 0/1 time series at a
+    1 minute resolution over the data index, or directly as spans drawn
+    from the ranges boundaries.
+    """
+    if as_spans:
+        starts = mdates.date2num(pd.DatetimeIndex(ranges_df['start']).values)
+        ends = mdates.date2num(pd.DatetimeIndex(ranges_df['end']).values)
+        ax.broken_barh(
+            list(zip(starts, ends - starts)), 
+            (0, 1), 
+            facecolors=color, 
+            edgecolors=color,
+            linewidth=0.5,
+            alpha=0.1, 
+            label=label
+        )
+        ax.set_ylim(-0.05, 1.05)
+        
+    else:
+        strip_index = pd.date_range(start=data_index.min(), end=data_index.max(), freq='1min')
+        strip_data = pd.Series(ranges_to_mask(strip_index, ranges_df).astype(float), index=strip_index)
+        ax.plot(strip_data, color=color, linewidth=0.5)
+        ax.fill_between(strip_index, y1=strip_data, y2=0, alpha=0.1, color=color, label=label)
+
+def downsample_timeseries(series, num_buckets):
+    """
+    Reduce a time series to a min/max envelope: the series is split in 
+    buckets of consecutive values and only the minimum and the maximum of
+    each bucket are kept (in their chronological order). With one bucket
+    per pixel, a line plot of the envelope looks the same as a plot of the
+    whole series.
+    
+    PARAMS
+    ======
+        series: pandas.Series
+            The time series to downsample
+            
+        num_buckets: integer
+            Number of buckets to split the series into. If None, or if the
+            series is short enough, the series is returned untouched
+            
+    RETURNS
+    =======
+        downsampled_series: pandas.Series
+            A series with at most 2 x num_buckets values
+    """
+    num_values = series.shape[0]
+    if (num_buckets is None) or (num_values <= 2 * num_buckets):
+        return series
+        
+    # Pad the values so that they can be reshaped in buckets:
+    bucket_size = int(np.ceil(num_values / num_buckets))
+    num_buckets = int(np.ceil(num_values / bucket_size))
+    values = np.full(num_buckets * bucket_size, np.nan)
+    values[:num_values] = series.values
+    values = values.reshape(num_buckets, bucket_size)
+    
+    # Position of the min and max of each bucket (missing values ignored):
+    missing = np.isnan(values)
+    argmin = np.where(missing, np.inf, values).argmin(axis=1)
+    argmax = np.where(missing, -np.inf, values).argmax(axis=1)
+    offsets = np.arange(num_buckets) * bucket_size
+    positions = np.concatenate([argmin + offsets, argmax + offsets])
+    positions = np.unique(positions[positions < num_values])
+    
+    downsampled_series = series.iloc[positions]
+    
+    return downsampled_series
+
+def _plot_histogram_bars(ax, bins, normal_histogram, anomaly_histogram, colors):
+    """
+    Draw precomputed normal and anomalous histograms (sharing the same bin
+    edges) as overlapping bars, the way pyplot.hist() would draw them.
+    """
+    widths = np.diff(bins)
+    ax.bar(bins[:-1], normal_histogram, width=widths, align='edge', alpha=0.5, color=colors[1], edgecolor='#FFFFFF')
+    ax.bar(bins[:-1], anomaly_histogram, width=widths, align='edge', alpha=0.5, color=colors[5], edgecolor='#FFFFFF')
+    
+    # Removes all the decoration to leave only the histograms:
+    ax.grid(False)
+    ax.get_yaxis().set_visible(False)
+    ax.get_xaxis().set_visible(False)
+
+def _render_tag_figure(file_name, kind, title, data, figsize):
+    """
+    Render a single signal figure to an image file. This function does not
+    rely on pyplot (no global state, no GUI backend) and can therefore run
+    in worker processes when generating headless reports.
+    
+    PARAMS
+    ======
+        file_name: string
+            Path of the image file to write
+            
+        kind: string
+            Either 'histogram' (data is a tuple with the bin edges, the 
+            normal and the anomalous histograms) or 'signal' (data is a
+            tuple with the normal and the anomalous pandas.Series)
+            
+        title: string
+            Title of the figure
+            
+        figsize: tuple
+            Size of the figure in inches
+            
+    RETURNS
+    =======
+        file_name: string
+            Path of the image file written
+    """
+    from matplotlib.figure import Figure
+    from matplotlib import rcParams, style
+    
+    with style.context('Solarize_Light2'):
+        colors = rcParams['axes.prop_cycle'].by_key()['color']
+        fig = Figure(figsize=figsize)
+        ax = fig.add_subplot(1, 1, 1)
+        
+        if kind == 'histogram':
+            _plot_histogram_bars(ax, *data, colors)
+        else:
+            normal_series, anomaly_series = data
+            ax.plot(normal_series, linewidth=0.5, alpha=0.8, color=colors[1])
+            ax.plot(anomaly_series, linewidth=0.5, alpha=0.8, color=colors[5])
+            
+        ax.set_title(title, fontsize=10)
+        fig.savefig(file_name)
+        
+    return file_name
+
+class TagsViews(Mapping):
+    """
+    A read-only mapping giving access to each column of a 2D array of
+    signals as a single column dataframe. Dataframes are built when they
+    are requested and share their memory with the underlying array (which
+    may itself share its memory with the dataframe it was extracted from):
+    make the array read-only, or copy the dataframes before modifying them.
+    """
+    def __init__(self, index, tags_list, values):
+        """
+        PARAMS
+        ======
+            index: pandas.DatetimeIndex
+                The time index shared by all the signals
+                
+            tags_list: list of strings
+                The name of each column of the array
+                
+            values: numpy.array
+                A 2D array with one signal per column
+        """
+        self.index = index
+        self.values = values
+        self.positions = {tag: position for position, tag in enumerate(tags_list)}
+        
+    def __getitem__(self, tag):
+        position = self.positions[tag]
+        tag_df = pd.DataFrame(
+            self.values[:, position:position + 1],
+            index=self.index,
+            columns=[tag],
+            copy=False
+        )
+        
+        return tag_df
+        
+    def __iter__(self):
+        return iter(self.positions)
+        
+    def __len__(self):
+        return len(self.positions)
+
+class LookoutEquipmentAnalysis:
+    """
+    A class to manage Lookout for Equipment result analysis
+    
+    ATTRIBUTES
+    ==========
+        model_name: string
+            The name of the Lookout for Equipment trained model
+                
+        predicted_ranges: pandas.DataFrame
+            A Pandas dataframe with the predicted anomaly ranges listed in
+            chronological order with a Start and End columns
+
+        labelled_ranges: pandas.DataFrame
+            A Pandas dataframe with the labelled anomaly ranges listed in
+            chronological order with a Start and End columns
+
+        tags_index: pandas.DatetimeIndex
+            The time index shared by all the signals
+
+        tags_list: list of strings
+            The name of each signal
+
+        tags_values: numpy.array
+            A read-only 2D array with all the signal values: each signal is
+            stored in a contiguous column
+
+        df_list: mapping of pandas.DataFrame
+            A mapping giving access to each time series as a single column
+            dataframe. These dataframes are built on demand and are views on
+            the tags_values array: copy them before modifying them
+
+    METHODS
+    =======
+        set_time_periods():
+            Sets the time period used for the analysis of the model evaluations
+            
+        get_predictions():
+            Get the anomaly ranges predicted by the current model
+            
+        get_labels():
+            Get the labelled ranges as provided to the model before training
+            
+        evaluate():
+            Compute event level metrics (precision, recall, lead times, 
+            false alarms) of the predictions against the labels
+            
+        compute_histograms():
+            This method loops through each signal and computes two distributions
+            of the values in the time series: one for all the anomalies found in
+            the evaluation period and another one with all the normal values 
+            found in the same period. It then ranks every signals based on the
             distance between these two histograms
 
-        plot_histograms():
-            Plot the top 12 signal values distribution by decreasing ranking 
-            distance (as computed by the compute_histograms() method
+        plot_histograms():
+            Plot the top 12 signal values distribution by decreasing ranking 
+            distance (as computed by the compute_histograms() method
+            
+        plot_signals():
+            Plot the top 12 signals by decreasing ranking distance. For each 
+            signal, this method will plot the normal values in green and the 
+            anomalies in red
+
+        get_ranked_list():
+            Returns the list of signals with computed rank
+    """
+    def __init__(self, model_name, tags_df, region_name=DEFAULT_REGION, dtype=None, cache_dir=None):
+        """
+        Create a new analysis for a Lookout for Equipment model.
+        
+        PARAMS
+        ======
+            model_name: string
+                The name of the Lookout for Equipment trained model
+                
+            tags_df: pandas.DataFrame
+                A dataframe containing all the signals, indexed by time
+                
+            region_name: string
+                Name of the AWS region from where the service is called.
+                
+            dtype: numpy.dtype (default: None)
+                Type used to store the signal values. Use numpy.float32 to
+                halve the memory footprint of large assets. By default, the
+                values are stored with the type they have in tags_df and are
+                not copied when all the signals already share this type:
+                the analysis then shares its memory with tags_df, and 
+                changing tags_df afterwards changes the signals analyzed.
+                
+            cache_dir: string (default: None)
+                If provided, the description of the model is cached in this
+                directory (see describe_model_ranges())
+        """
+        self.lookout_client = get_client(region_name)
+        self.region_name = region_name
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.describe_model_response = None
+        self.predicted_ranges = None
+        self.labelled_ranges = None
+        
+        # All the signals are kept in a single column-major array: 
+        # the dataframe of each signal is only built when requested:
+        self.tags_index = tags_df.index
+        self.tags_list = list(tags_df.columns)
+        self.tags_values = np.asfortranarray(tags_df.to_numpy(dtype=dtype))
+        self.tags_values.flags.writeable = False
+        self.df_list = TagsViews(self.tags_index, self.tags_list, self.tags_values)
+        
+    def _load_model_response(self):
+        """
+        Use the trained model description to extract labelled and predicted 
+        ranges of anomalies. This method will extract them from the 
+        DescribeModel API from Lookout for Equipment (or from the cache 
+        directory if one was provided) and store them in the labelled_ranges
+        and predicted_ranges properties.
+        """
+        with _span('analysis.load_model') as span:
+            describe_model_response, labelled_ranges, predicted_ranges = describe_model_ranges(
+                self.model_name, 
+                region_name=self.region_name, 
+                cache_dir=self.cache_dir
+            )
+            span.add(labelled_ranges=len(labelled_ranges), predicted_ranges=len(predicted_ranges))
+        
+        self.describe_model_response = describe_model_response
+        self.labelled_ranges = labelled_ranges
+        self.predicted_ranges = predicted_ranges
+        
+    def set_time_periods(self, 
+                         evaluation_start, 
+                         evaluation_end, 
+                         training_start, 
+                         training_end):
+        """
+        Set the time period of analysis
+        
+        PARAMS
+        ======
+            evaluation_start: datetime
+                Start of the evaluation period
+
+            evaluation_end: datetime
+                End of the evaluation period
+
+            training_start: datetime
+                Start of the training period
+
+            training_end: datetime
+                End of the training period
+        """
+        self.evaluation_start = evaluation_start
+        self.evaluation_end = evaluation_end
+        self.training_start = training_start
+        self.training_end = training_end
+    
+    def get_predictions(self):
+        """
+        Get the anomaly ranges predicted by the current model
+        
+        RETURN
+        ======
+            predicted_ranges: pandas.DataFrame
+                A Pandas dataframe with the predicted anomaly ranges listed in
+                chronological order with a Start and End columns
+        """
+        if self.predicted_ranges is None:
+            self._load_model_response()
+            
+        return self.predicted_ranges
+        
+    def get_labels(self):
+        """
+        Get the labelled ranges as provided to the model before training
+        
+        RETURN
+        ======
+            labelled_ranges: pandas.DataFrame
+                A Pandas dataframe with the labelled anomaly ranges listed in
+                chronological order with a Start and End columns
+        """        
+        if self.labelled_ranges is None:
+            self._load_model_response()
+            
+        return self.labelled_ranges
+    
+    def evaluate(self, early_warning=None):
+        """
+        Compare the predicted ranges with the labelled ones event per event,
+        over the evaluation period when one was set (see evaluate_ranges()).
+        
+        PARAMS
+        ======
+            early_warning: string or pandas.Timedelta (default: None)
+                Predicted ranges ending at most this duration before a 
+                labelled event are considered as early detections of it
+                
+        RETURNS
+        =======
+            metrics: dict
+                The event level metrics of the model
+                
+            events_df: pandas.DataFrame
+                The detection status, lead time and overlap of each labelled
+                event
+                
+            false_alarms_df: pandas.DataFrame
+                The predicted ranges not matching any labelled event
+        """
+        metrics, events_df, false_alarms_df = evaluate_ranges(
+            self.get_labels(),
+            self.get_predictions(),
+            start=getattr(self, 'evaluation_start', None),
+            end=getattr(self, 'evaluation_end', None),
+            early_warning=early_warning
+        )
+        
+        return metrics, events_df, false_alarms_df
+    
+    def _get_time_masks(self):
+        """
+        Flag the normal values and the anomalies of the evaluation period
+        from the predictions generated by the model.
+        
+        RETURNS
+        =======
+            normal_mask: numpy.array of booleans
+                True for each timestamp of the signals index with a normal
+                value
+                
+            anomaly_mask: numpy.array of booleans
+                True for each timestamp of the signals index with an anomaly
+        """
+        tag_index = self.tags_index
+        
+        # Flag all the timestamps falling in a predicted anomaly range:
+        prediction_mask = ranges_to_mask(tag_index, self.get_predictions())
+
+        # Limits the analysis range to the evaluation period:
+        first, last = tag_index.slice_locs(self.evaluation_start, self.evaluation_end)
+        evaluation_mask = np.zeros(len(tag_index), dtype=bool)
+        evaluation_mask[first:last] = True
+        
+        normal_mask = evaluation_mask & ~prediction_mask
+        anomaly_mask = evaluation_mask & prediction_mask
+        
+        return normal_mask, anomaly_mask
+    
+    def _get_time_ranges(self):
+        """
+        Extract DateTimeIndex with normal values and anomalies from the
+        predictions generated by the model.
+        
+        RETURNS
+        =======
+            index_normal: pandas.DateTimeIndex
+                Timestamp index for all normal values
+                
+            index_anomaly: pandas.DateTimeIndex
+                Timestamp index for all normal values
+        """
+        tag_index = self.tags_index
+        with _span('analysis.get_time_ranges') as span:
+            normal_mask, anomaly_mask = self._get_time_masks()
+            
+            # Build a DateTimeIndex for normal values and anomalies:
+            index_normal = tag_index[normal_mask]
+            index_anomaly = tag_index[anomaly_mask]
+            span.add(normal_rows=len(index_normal), anomaly_rows=len(index_anomaly))
+        
+        return index_normal, index_anomaly
+    
+    @_instrumented('analysis.compute_histograms')
+    def compute_histograms(self, 
+                           index_normal=None, 
+                           index_anomaly=None, 
+                           num_bins=20, 
+                           vectorized=True, 
+                           n_jobs=None, 
+                           backend='process', 
+                           executor=None):
+        """
+        This method loops through each signal and computes two distributions of
+        the values in the time series: one for all the anomalies found in the
+        evaluation period and another one with all the normal values found in the
+        same period. It then computes the Wasserstein distance between these two
+        histograms and then rank every signals based on this distance. The higher
+        the distance, the more different a signal is when comparing anomalous
+        and normal periods. This can orient the investigation of a subject 
+        matter expert towards the sensors and associated components.
+        
+        PARAMS
+        ======
+            index_normal: pandas.DateTimeIndex
+                All the normal indices
+                
+            index_anomaly: pandas.DateTimeIndex
+                All the indices for anomalies
+                
+            num_bins: integer (default: 20)
+                Number of bins to use to build the distributions
+                
+            vectorized: boolean (default: True)
+                If True, all the signals are processed at once as a single
+                2D array (see compute_signal_distances()). Otherwise, each
+                signal is processed one after the other.
+                
+            n_jobs: integer (default: None)
+                Number of workers to split the signals between when 
+                vectorized is True (-1 to use all the CPUs). By default, all
+                the signals are processed in the current thread.
+                
+            backend: string (default: 'process')
+                Type of pool ('process' or 'thread') to use with n_jobs
+                
+            executor: concurrent.futures.Executor (default: None)
+                An existing pool of workers to use instead of creating one
+                (see compute_signal_distances_parallel())
+        """
+        tag_index = self.tags_index
+        if (index_normal is None) or (index_anomaly is None):
+            normal_mask, anomaly_mask = self._get_time_masks()
+            self.ts_normal_training = tag_index[normal_mask]
+            self.ts_label_evaluation = tag_index[anomaly_mask]
+        else:
+            normal_mask = tag_index.isin(index_normal)
+            anomaly_mask = tag_index.isin(index_anomaly)
+            self.ts_normal_training = index_normal
+            self.ts_label_evaluation = index_anomaly
+
+        self.num_bins = num_bins
+        self.normal_mask = normal_mask
+        self.anomaly_mask = anomaly_mask
+        self.histograms = None
+        
+        if vectorized:
+            rank = self._compute_distances(normal_mask, anomaly_mask, n_jobs, backend, executor)
+        else:
+            rank = self._compute_distances_per_signal()
+
+        # Sort histograms by decreasing Wasserstein distance:
+        with _span('analysis.rank_signals') as span:
+            rank = {k: v for k, v in sorted(rank.items(), key=lambda rank: rank[1], reverse=True)}
+            span.add(signals=len(rank))
+        self.rank = rank
+        
+    def _compute_distances(self, normal_mask, anomaly_mask, n_jobs=None, backend='process', executor=None):
+        """
+        Compute the distance between the normal and anomalous distributions
+        of all the signals at once, as a single 2D array.
+        
+        PARAMS
+        ======
+            normal_mask: numpy.array of booleans
+                True for each timestamp with a normal value
+                
+            anomaly_mask: numpy.array of booleans
+                True for each timestamp with an anomaly
+                
+            n_jobs, backend, executor:
+                Parallelization parameters, see compute_histograms()
+                
+        RETURNS
+        =======
+            rank: dict
+                The distance computed for each signal
+        """
+        distances, bins, normal_histograms, anomaly_histograms = compute_signal_distances_parallel(
+            self.tags_values, 
+            normal_mask, 
+            anomaly_mask, 
+            num_bins=self.num_bins, 
+            n_jobs=n_jobs, 
+            backend=backend, 
+            executor=executor
+        )
+        rank = dict(zip(self.tags_list, distances.tolist()))
+        
+        # Keep the bins and the histograms: the plotting methods can
+        # then draw them directly instead of computing them again:
+        self.histograms = {
+            'bins': bins,
+            'normal': normal_histograms,
+            'anomaly': anomaly_histograms
+        }
+        
+        return rank
+        
+    def _compute_distances_per_signal(self):
+        """
+        Compute the distance between the normal and anomalous distributions
+        of each signal, one signal after the other.
+        
+        RETURNS
+        =======
+            rank: dict
+                The distance computed for each signal
+        """
+        # Now we loop on each signal to compute a 
+        # histogram of each of them in this anomaly range,
+        # compte another one in the normal range and
+        # compute a distance between these:
+        rank = dict()
+        for tag, current_tag_df in tqdm.tqdm(self.df_list.items(), desc='Computing distributions'):
+            try:
+                # Get the values for the whole signal, parts
+                # marked as anomalies and normal part:
+                current_signal_values = current_tag_df[tag]
+                current_signal_evaluation = current_tag_df.loc[self.ts_label_evaluation, tag]
+                current_signal_training = current_tag_df.loc[self.ts_normal_training, tag]
+
+                # Let's compute a bin width based on the whole range of possible 
+                # values for this signal (across the normal and anomalous periods).
+                # For both normalization and aesthetic reasons, we want the same
+                # number of bins across all signals:
+                bin_width = (np.max(current_signal_values) - np.min(current_signal_values))/self.num_bins
+                bins = np.arange(np.min(current_signal_values), np.max(current_signal_values) + bin_width, bin_width)
+
+                # We now use the same bins arrangement for both parts of the signal:
+                u = np.histogram(current_signal_training, bins=bins, density=True)[0]
+                v = np.histogram(current_signal_evaluation, bins=bins, density=True)[0]
+
+                # Wasserstein distance is the earth mover distance: it can be 
+                # used to compute a similarity between two distributions: this
+                # metric is only valid when the histograms are normalized (hence
+                # the density=True in the computation above):
+                d = stats.wasserstein_distance(u, v)
+                rank.update({tag: d})
+
+            except Exception as e:
+                rank.update({tag: 0.0})
+                
+        return rank
+        
+    @_instrumented('analysis.plot_histograms')
+    def plot_histograms(self, nb_cols=3, max_plots=12):
+        """
+        Once the histograms are computed, we can plot the top N by decreasing 
+        ranking distance. By default, this will plot the histograms for the top
+        12 signals, with 3 plots per line.
+        
+        PARAMS
+        ======
+            nb_cols: integer (default: 3)
+                Number of plots to assemble on a given row
+                
+            max_plots: integer (default: 12)
+                Number of signal to consider
+        """
+        # Prepare the figure:
+        nb_rows = max_plots // nb_cols + 1
+        plt.style.use('Solarize_Light2')
+        prop_cycle = plt.rcParams['axes.prop_cycle']
+        colors = prop_cycle.by_key()['color']
+        fig = plt.figure(figsize=(16, int(nb_rows * 3)))
+        gs = gridspec.GridSpec(nb_rows, nb_cols, hspace=0.5, wspace=0.25)
+
+        # Loops through each signal by decreasing distance order:
+        for i, (tag, current_rank) in enumerate(self._get_top_ranks(max_plots)):
+            ax1 = plt.subplot(gs[i])
+            try:
+                bins, normal_histogram, anomaly_histogram = self._get_histograms(tag)
+                _plot_histogram_bars(ax1, bins, normal_histogram, anomaly_histogram, colors)
+
+            except Exception as e:
+                print(e)
+                ax1.grid(False)
+                ax1.get_yaxis().set_visible(False)
+                ax1.get_xaxis().set_visible(False)
+
+            # Title will be the tag name followed by the score:
+            title = tag
+            title += f' (score: {current_rank:.02f})'
+            plt.title(title, fontsize=10)
+            
+    @_instrumented('analysis.plot_signals')
+    def plot_signals(self, nb_cols=3, max_plots=12):
+        """
+        Once the histograms are computed, we can plot the top N signals by 
+        decreasing ranking distance. By default, this will plot the signals for 
+        the top 12 signals, with 3 plots per line. For each signal, this method
+        will plot the normal values in green and the anomalies in red.
+        
+        PARAMS
+        ======
+            nb_cols: integer (default: 3)
+                Number of plots to assemble on a given row
+                
+            max_plots: integer (default: 12)
+                Number of signal to consider
+        """
+        # Prepare the figure:
+        nb_rows = max_plots // nb_cols + 1
+        plt.style.use('Solarize_Light2')
+        prop_cycle = plt.rcParams['axes.prop_cycle']
+        colors = prop_cycle.by_key()['color']
+        fig = plt.figure(figsize=(28, int(nb_rows * 4)))
+        gs = gridspec.GridSpec(nb_rows, nb_cols, hspace=0.5, wspace=0.25)
+        
+        # Loops through each signal by decreasing distance order:
+        for i, (tag, current_rank) in enumerate(self._get_top_ranks(max_plots)):
+            # Get the anomaly and the normal values from the current signal:
+            current_signal_training, current_signal_evaluation = self._get_signal_parts(tag)
+
+            # Plot both time series with a line plot
+            ax1 = plt.subplot(gs[i])
+            ax1.plot(current_signal_training, linewidth=0.5, alpha=0.8, color=colors[1])
+            ax1.plot(current_signal_evaluation, linewidth=0.5, alpha=0.8, color=colors[5])
+
+            # Title will be the tag name followed by the score:
+            title = tag
+            title += f' (score: {current_rank:.01f})'
+                
+            plt.title(title, fontsize=10)
+            
+    def _get_top_ranks(self, max_plots):
+        """
+        Returns the (tag, rank) pairs of the max_plots signals with the 
+        highest ranking distance.
+        """
+        return list(self.rank.items())[:max_plots]
+        
+    def _get_masks(self):
+        """
+        Returns the normal and anomaly boolean masks over the tags index
+        used by the last call to compute_histograms().
+        """
+        normal_mask = getattr(self, 'normal_mask', None)
+        anomaly_mask = getattr(self, 'anomaly_mask', None)
+        if (normal_mask is None) or (anomaly_mask is None):
+            normal_mask = self.tags_index.isin(self.ts_normal_training)
+            anomaly_mask = self.tags_index.isin(self.ts_label_evaluation)
+            
+        return normal_mask, anomaly_mask
+            
+    def _get_signal_parts(self, tag):
+        """
+        Returns the normal and the anomalous parts of a signal as two 
+        pandas.Series, extracted with the masks from compute_histograms().
+        """
+        normal_mask, anomaly_mask = self._get_masks()
+        values = self.tags_values[:, self.df_list.positions[tag]]
+        normal_series = pd.Series(values[normal_mask], index=self.tags_index[normal_mask], name=tag)
+        anomaly_series = pd.Series(values[anomaly_mask], index=self.tags_index[anomaly_mask], name=tag)
+        
+        return normal_series, anomaly_series
+        
+    def _get_histograms(self, tag):
+        """
+        Returns the bin edges, the normal and the anomalous histograms of a
+        signal. These are the ones kept by compute_histograms() when they
+        are available or they are computed with the same bins otherwise.
+        """
+        position = self.df_list.positions[tag]
+        if self.histograms is not None:
+            return (
+                self.histograms['bins'][position], 
+                self.histograms['normal'][position], 
+                self.histograms['anomaly'][position]
+            )
+            
+        normal_mask, anomaly_mask = self._get_masks()
+        _, bins, normal_histograms, anomaly_histograms = compute_signal_distances(
+            self.tags_values[:, position:position + 1], 
+            normal_mask, 
+            anomaly_mask, 
+            num_bins=self.num_bins
+        )
+        
+        return bins[0], normal_histograms[0], anomaly_histograms[0]
+        
+    @_instrumented('analysis.export_figures')
+    def export_figures(self, output_dir, max_plots=12, kinds=('histogram', 'signal'), n_jobs=None, max_points=2000, figsize=(6, 3), file_format='png'):
+        """
+        Render the figures of the top N signals (by decreasing ranking 
+        distance) to individual image files, for headless report generation.
+        The figures are rendered without pyplot and can be spread across 
+        several processes.
+        
+        PARAMS
+        ======
+            output_dir: string
+                Directory where to write the image files
+                
+            max_plots: integer (default: 12)
+                Number of signal to consider
+                
+            kinds: tuple of strings (default: ('histogram', 'signal'))
+                Figures to render for each signal: 'histogram' for the 
+                normal and anomalous distributions, 'signal' for the time
+                series of the normal and anomalous values (a single kind 
+                can be given as a string)
+                
+            n_jobs: integer (default: None)
+                Number of processes to render the figures with (-1 to use 
+                all the CPUs). By default, figures are rendered one after
+                the other in the current process
+                
+            max_points: integer (default: 2000)
+                Signals are downsampled to at most this number of buckets 
+                (see downsample_timeseries()) before being rendered. Set to
+                None to render all the values
+                
+            figsize: tuple (default: (6, 3))
+                Size of each figure in inches
+                
+            file_format: string (default: 'png')
+                Image format (extension) of the files
+                
+        RETURNS
+        =======
+            figures_df: pandas.DataFrame
+                A dataframe with the Tag, Rank, Kind and File of each figure
+        """
+        if isinstance(kinds, str):
+            kinds = (kinds,)
+        for kind in kinds:
+            if kind not in ['histogram', 'signal']:
+                raise Exception(f'Unknown figure kind "{kind}": expecting "histogram" or "signal".')
+        
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # Prepare the data of each figure once, in the current process:
+        jobs = []
+        records = []
+        for i, (tag, current_rank) in enumerate(self._get_top_ranks(max_plots)):
+            for kind in kinds:
+                if kind == 'histogram':
+                    data = self._get_histograms(tag)
+                    title = f'{tag} (score: {current_rank:.02f})'
+                else:
+                    data = tuple(downsample_timeseries(series, max_points) for series in self._get_signal_parts(tag))
+                    title = f'{tag} (score: {current_rank:.01f})'
+                    
+                # Tag names can contain path separators:
+                safe_tag = re.sub('[^a-zA-Z0-9_.-]', '_', tag)
+                file_name = os.path.join(output_dir, f'{i:03d}_{safe_tag}_{kind}.{file_format}')
+                jobs.append((file_name, kind, title, data, figsize))
+                records.append({'Tag': tag, 'Rank': current_rank, 'Kind': kind, 'File': file_name})
+                
+        if n_jobs == -1:
+            n_jobs = os.cpu_count()
+            
+        if (n_jobs is None) or (n_jobs <= 1) or (len(jobs) <= 1):
+            for job in jobs:
+                _render_tag_figure(*job)
+                
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                futures = [executor.submit(_render_tag_figure, *job) for job in jobs]
+                for future in futures:
+                    future.result()
+                
+        figures_df = pd.DataFrame(records, columns=['Tag', 'Rank', 'Kind', 'File'])
+        
+        return figures_df
+            
+    @_instrumented('analysis.get_ranked_list')
+    def get_ranked_list(self, max_signals=12):
+        """
+        Returns the list of signals with computed rank.
+        
+        PARAMS
+        ======
+            max_signals: integer (default: 12)
+                Number of signals to consider
+        
+        RETURNS
+        =======
+            significant_signals_df: pandas.DataFrame
+                A dataframe with each signal and the associated rank value
+        """
+        significant_signals_df = pd.DataFrame(list(self.rank.items())[:max_signals])
+        significant_signals_df.columns = ['Tag', 'Rank']
+        
+        return significant_signals_df
+    
+class LookoutEquipmentModelComparison:
+    """
+    A class to compare many Lookout for Equipment models trained on the same
+    signals (a sweep over labels, time periods or components for instance).
+    All the models are described concurrently and analyzed against a single
+    copy of the signals: the values are binned once, and the histograms of
+    each evaluation period are computed once for all the models sharing
+    it. Each model then only bins the rows of its predicted anomalies.
+    
+    ATTRIBUTES
+    ==========
+        model_names: list of strings
+            The names of the models compared
+            
+        tags_index: pandas.DatetimeIndex
+            The time index shared by all the signals
+
+        tags_list: list of strings
+            The name of each signal
+            
+        tags_values: numpy.array
+            A read-only 2D array with all the signal values (one signal per
+            column)
+            
+        models: dict
+            The DescribeModel response, labelled ranges and predicted ranges
+            of each model (see describe_model_ranges())
+            
+        coverage: dict
+            The share of the evaluation period of each model flagged as 
+            anomalous
+            
+    METHODS
+    =======
+        describe_models():
+            Describe all the models concurrently
+            
+        compute_ranks():
+            Rank the signals of each model by decreasing distance between 
+            their normal and anomalous distributions
+            
+        compare():
+            Build a side by side table of the models
+            
+        get_ranks():
+            Get the distance of each signal for each model
+    """
+    def __init__(self, 
+                 tags_df, 
+                 model_names=None, 
+                 model_name_prefix=None, 
+                 dataset_name_prefix=None, 
+                 region_name=DEFAULT_REGION, 
+                 dtype=None, 
+                 cache_dir=None, 
+                 max_workers=16,
+                 num_bins=20):
+        """
+        Create a new comparison between several models.
+        
+        PARAMS
+        ======
+            tags_df: pandas.DataFrame
+                A dataframe containing all the signals, indexed by time
+                
+            model_names: list of strings (default: None)
+                The names of the models to compare. By default, the models
+                are listed with list_models_for_datasets() with the 
+                following prefixes
+                
+            model_name_prefix: string (default: None)
+                Only compare the models which names start with this prefix
+                
+            dataset_name_prefix: string (default: None)
+                Only compare the models trained on the datasets which names
+                start with this prefix
+                
+            region_name: string
+                Name of the AWS region from where the service is called.
+                
+            dtype: numpy.dtype (default: None)
+                Type used to store the signal values (see 
+                LookoutEquipmentAnalysis)
+                
+            cache_dir: string (default: None)
+                If provided, the model descriptions are cached in this 
+                directory (see describe_model_ranges())
+                
+            max_workers: integer (default: 16)
+                Maximum number of models described at the same time
+                
+            num_bins: integer (default: 20)
+                Number of bins to use to build the distributions
+        """
+        self.region_name = region_name
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.num_bins = num_bins
+        if model_names is None:
+            model_names = list_models_for_datasets(
+                model_name_prefix=model_name_prefix,
+                dataset_name_prefix=dataset_name_prefix,
+                region_name=region_name
+            )
+        self.model_names = list(model_names)
+        self.models = None
+        self.ranks = None
+        self.coverage = None
+        
+        # The signals are shared by all the models:
+        self.tags_index = tags_df.index
+        self.tags_list = list(tags_df.columns)
+        self.tags_values = np.asfortranarray(tags_df.to_numpy(dtype=dtype))
+        self.tags_values.flags.writeable = False
+        self._bin_codes = None
+        self._period_counts = dict()
+        
+    def describe_models(self, refresh=False):
+        """
+        Describe all the models concurrently and extract their labelled and
+        predicted ranges.
+        
+        PARAMS
+        ======
+            refresh: boolean (default: False)
+                If True, the models already described (or cached) are 
+                described again
+                
+        RETURNS
+        =======
+            models: dict
+                A (describe_model_response, labelled_ranges, predicted_ranges)
+                tuple for each model
+        """
+        if (self.models is not None) and (not refresh):
+            return self.models
+            
+        def describe(model_name):
+            return describe_model_ranges(
+                model_name, 
+                region_name=self.region_name, 
+                cache_dir=self.cache_dir, 
+                refresh=refresh
+            )
+            
+        with _span('comparison.describe_models') as span, \
+             concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self.models = dict(zip(self.model_names, executor.map(describe, self.model_names)))
+            span.add(models=len(self.models))
+            
+        return self.models
+        
+    def _get_bin_codes(self):
+        """
+        Bin index of every value of every signal, computed once for all the
+        models (num_bins for the missing values).
+        """
+        if self._bin_codes is None:
+            values = self.tags_values
+            min_values, bin_width, self._valid_signals, self.bins = _get_signal_bins(values, self.num_bins)
+            self._bin_width = bin_width
+            
+            codes = np.empty(values.shape, dtype=np.int16, order='F')
+            for column in range(values.shape[1]):
+                with np.errstate(all='ignore'):
+                    bin_index = np.floor((values[:, column] - min_values[column]) / bin_width[column])
+                valid = np.isfinite(bin_index)
+                bin_index = np.clip(np.where(valid, bin_index, 0), 0, self.num_bins - 1)
+                codes[:, column] = np.where(valid, bin_index, self.num_bins)
+            self._bin_codes = codes
+            
+        return self._bin_codes
+        
+    def _count_bins(self, rows, block_size=1048576):
+        """
+        Count the values of each signal in each bin over a set of rows (a 
+        slice or an array of positions), by blocks of columns to bound the
+        temporary memory used.
+        
+        RETURNS
+        =======
+            counts: numpy.array
+                A (num_signals, num_bins + 1) array, the last bin counting
+                the missing values
+        """
+        bin_codes = self._get_bin_codes()
+        num_signals = bin_codes.shape[1]
+        num_rows = len(range(*rows.indices(len(bin_codes)))) if isinstance(rows, slice) else len(rows)
+        block_columns = max(block_size // max(num_rows, 1), 1)
+        
+        counts = np.zeros((num_signals, self.num_bins + 1), dtype=np.int64)
+        for first in range(0, num_signals, block_columns):
+            columns = slice(first, first + block_columns)
+            codes = bin_codes[rows, columns]
+            offsets = np.arange(codes.shape[1], dtype=np.int64) * (self.num_bins + 1)
+            counts[columns] = np.bincount(
+                (codes + offsets).ravel(), 
+                minlength=codes.shape[1] * (self.num_bins + 1)
+            ).reshape(codes.shape[1], self.num_bins + 1)
+        
+        return counts
+        
+    def _get_evaluation_positions(self, describe_model_response, evaluation_start, evaluation_end):
+        """
+        Position of the evaluation period of a model in the signals index:
+        the given period or, by default, the one the model was evaluated on.
+        """
+        if evaluation_start is None:
+            evaluation_start = describe_model_response.get('EvaluationDataStartTime')
+        if evaluation_end is None:
+            evaluation_end = describe_model_response.get('EvaluationDataEndTime')
+            
+        evaluation_start = None if evaluation_start is None else _to_datetime64([evaluation_start])[0]
+        evaluation_end = None if evaluation_end is None else _to_datetime64([evaluation_end])[0]
+        first, last = self.tags_index.slice_locs(evaluation_start, evaluation_end)
+        
+        return first, last
+        
+    def compute_ranks(self, evaluation_start=None, evaluation_end=None):
+        """
+        Rank the signals of each model by decreasing Wasserstein distance
+        between their normal and anomalous distributions, with the same
+        method as LookoutEquipmentAnalysis.compute_histograms().
+        
+        PARAMS
+        ======
+            evaluation_start, evaluation_end: datetime (default: None)
+                Period to analyze. By default, the evaluation period of 
+                each model is used
+                
+        RETURNS
+        =======
+            ranks_df: pandas.DataFrame
+                The distance of each signal (rows) for each model (columns)
+        """
+        self.describe_models()
+        self._get_bin_codes()
+        self.coverage = dict()
+        
+        ranks = dict()
+        with _span('comparison.compute_ranks') as span:
+            for model_name, (describe_model_response, _, predicted_ranges) in self.models.items():
+                first, last = self._get_evaluation_positions(describe_model_response, evaluation_start, evaluation_end)
+                
+                # The counts of the evaluation period are shared by all 
+                # the models evaluated on it: the normal values counts are
+                # the evaluation counts minus the anomalies counts:
+                if (first, last) not in self._period_counts:
+                    self._period_counts[(first, last)] = self._count_bins(slice(first, last))
+                evaluation_counts = self._period_counts[(first, last)]
+                
+                anomaly_mask = ranges_to_mask(self.tags_index[first:last], predicted_ranges)
+                anomaly_counts = self._count_bins(first + np.flatnonzero(anomaly_mask))
+                normal_counts = evaluation_counts - anomaly_counts
+                
+                with np.errstate(all='ignore'):
+                    normal_histograms = normal_counts[:, :-1] / normal_counts[:, :-1].sum(axis=1, keepdims=True) / self._bin_width[:, np.newaxis]
+                    anomaly_histograms = anomaly_counts[:, :-1] / anomaly_counts[:, :-1].sum(axis=1, keepdims=True) / self._bin_width[:, np.newaxis]
+                ranks[model_name] = _histograms_distances(normal_histograms, anomaly_histograms, self._valid_signals)
+                self.coverage[model_name] = np.count_nonzero(anomaly_mask) / max(last - first, 1)
+                span.add(anomaly_rows=int(np.count_nonzero(anomaly_mask)))
+                
+        self.ranks = pd.DataFrame(ranks, index=pd.Index(self.tags_list, name='Tag'), columns=self.model_names)
+        
+        return self.ranks
+        
+    def get_ranks(self):
+        """
+        Returns the distance of each signal (rows) for each model (columns).
+        """
+        if self.ranks is None:
+            self.compute_ranks()
+            
+        return self.ranks
+        
+    def compare(self, top_signals=3, evaluation_start=None, evaluation_end=None, early_warning=None):
+        """
+        Build a side by side table of all the models.
+        
+        PARAMS
+        ======
+            top_signals: integer (default: 3)
+                Number of top ranked signals to list for each model
+                
+            evaluation_start, evaluation_end: datetime (default: None)
+                Period to analyze. By default, the evaluation period of 
+                each model is used
+                
+            early_warning: string or pandas.Timedelta (default: None)
+                See evaluate_ranges()
+                
+        RETURNS
+        =======
+            comparison_df: pandas.DataFrame
+                One row per model with its dataset and status, its numbers 
+                of labelled and predicted ranges, the share of its 
+                evaluation period flagged as anomalous (Coverage), its event
+                level precision, recall and false alarms, and its top ranked
+                signals
+        """
+        ranks_df = self.compute_ranks(evaluation_start, evaluation_end)
+        
+        records = []
+        for model_name, (describe_model_response, labelled_ranges, predicted_ranges) in self.models.items():
+            start = evaluation_start if evaluation_start is not None else describe_model_response.get('EvaluationDataStartTime')
+            end = evaluation_end if evaluation_end is not None else describe_model_response.get('EvaluationDataEndTime')
+            metrics, _, _ = evaluate_ranges(labelled_ranges, predicted_ranges, start, end, early_warning)
+            top_ranks = ranks_df[model_name].sort_values(ascending=False, kind='stable')
+            
+            records.append({
+                'Model': model_name,
+                'Dataset': describe_model_response.get('DatasetName'),
+                'Status': describe_model_response.get('Status'),
+                'LabelledRanges': len(labelled_ranges),
+                'PredictedRanges': len(predicted_ranges),
+                'Coverage': self.coverage[model_name],
+                'EventPrecision': metrics['event_precision'],
+                'EventRecall': metrics['event_recall'],
+                'FalseAlarms': metrics['false_alarms'],
+                'TopSignals': list(top_ranks.index[:top_signals])
+            })
+            
+        columns = [
+            'Model', 'Dataset', 'Status', 'LabelledRanges', 'PredictedRanges', 'Coverage', 
+            'EventPrecision', 'EventRecall', 'FalseAlarms', 'TopSignals'
+        ]
+        comparison_df = pd.DataFrame(records, columns=columns).set_index('Model')
+        
+        return comparison_df
+    
+class LookoutEquipmentScheduler:
+    """
+    A class to represent a Lookout for Equipment inference scheduler object.
+    
+    ATTRIBUTES
+    ==========
+        scheduler_name: string
+            Name of the scheduler associated to this object
+            
+        model_name: string
+            Name of the model used to run the inference when the scheduler
+            wakes up
+            
+        execution_summaries: list of dict
+            A list of all inference execution results. Each execution is stored
+            as a dictionary.
+
+    METHODS
+    =======
+        set_parameters():
+            Sets all the parameters necessary to manage this scheduler object
+        
+        create():
+            Creates a new scheduler
+            
+        start():
+            Start an existing scheduler
+            
+        stop():
+            Stop an existing scheduler
+            
+        delete():
+            Detele a stopped scheduler
+            
+        get_status():
+            Returns the status of the scheduler
+            
+        create_async(), start_async(), stop_async(), delete_async(), 
+        get_status_async():
+            Coroutine versions of the methods above: they poll the scheduler
+            status with an exponential backoff without blocking a thread
+            
+        list_inference_executions():
+            Returns all the results from the inference executed by the scheduler
+            
+        get_predictions():
+            Return the predictions generated by the executed inference
+            
+        sync_predictions():
+            Download the predictions of the new executions only and append
+            them to a local predictions store
+    """
+    def __init__(self, scheduler_name, model_name, region_name=DEFAULT_REGION):
+        """
+        Constructs all the necessary attributes for a scheduler object.
+        
+        PARAMS
+        ======
+            scheduler_name: string
+                The name of the scheduler to be created or managed
+                
+            model_name: string
+                The name of the model to schedule inference for
+                
+            region_name: string
+                Name of the AWS region from where the service is called.
+        """
+        self.scheduler_name = scheduler_name
+        self.model_name = model_name
+        self.region_name = region_name
+        self.lookout_client = get_client(region_name)
+        
+        self.input_bucket = None
+        self.input_prefix = None
+        self.output_bucket = None
+        self.output_prefix = None
+        self.role_arn = None
+        self.upload_frequency = None
+        self.delay_offset = None
+        self.timezone_offset = None
+        self.component_delimiter = None
+        self.timestamp_format = None
+        self.execution_summaries = None
+        
+    def set_parameters(self,
+                       input_bucket,
+                       input_prefix,
+                       output_bucket,
+                       output_prefix,
+                       role_arn,
+                       upload_frequency='PT5M',
+                       delay_offset=None,
+                       timezone_offset='+00:00',
+                       component_delimiter='_',
+                       timestamp_format='yyyyMMddHHmmss'
+                      ):
+        self.input_bucket = input_bucket
+        self.input_prefix = input_prefix
+        self.output_bucket = output_bucket
+        self.output_prefix = output_prefix
+        self.role_arn = role_arn
+        self.upload_frequency = upload_frequency
+        self.delay_offset = delay_offset
+        self.timezone_offset = timezone_offset
+        self.component_delimiter = component_delimiter
+        self.timestamp_format = timestamp_format
+
+    def _get_create_request(self):
+        """
+        Build the parameters of the CreateInferenceScheduler API call.
+        """
+        client_token = uuid.uuid4().hex
+
+        create_inference_scheduler_request = {
+            'ModelName': self.model_name,
+            'InferenceSchedulerName': self.scheduler_name,
+            'DataUploadFrequency': self.upload_frequency,
+            'RoleArn': self.role_arn,
+            'ClientToken': client_token,
+        }
+
+        if self.delay_offset is not None:
+            create_inference_scheduler_request['DataDelayOffsetInMinutes'] = self.delay_offset
+
+        # Setup data input configuration
+        inference_input_config = dict()
+        inference_input_config['S3InputConfiguration'] = dict([
+            ('Bucket', self.input_bucket),
+            ('Prefix', self.input_prefix)
+        ])
+        if self.timezone_offset is not None:
+            inference_input_config['InputTimeZoneOffset'] = self.timezone_offset
+        if self.component_delimiter is not None or self.timestamp_format is not None:
+            inference_input_name_configuration = dict()
+            if self.component_delimiter is not None:
+                inference_input_name_configuration['ComponentTimestampDelimiter'] = self.component_delimiter
+            if self.timestamp_format is not None:
+                inference_input_name_configuration['TimestampFormat'] = self.timestamp_format
+            inference_input_config['InferenceInputNameConfiguration'] = inference_input_name_configuration   
+        create_inference_scheduler_request['DataInputConfiguration'] = inference_input_config
+
+        #  Set up output configuration
+        inference_output_configuration = dict()
+        inference_output_configuration['S3OutputConfiguration'] = dict([
+            ('Bucket', self.output_bucket),
+            ('Prefix', self.output_prefix)
+        ])
+        create_inference_scheduler_request['DataOutputConfiguration'] = inference_output_configuration
+        
+        return create_inference_scheduler_request
+
+    def create(self):
+        create_inference_scheduler_request = self._get_create_request()
+        create_scheduler_response = self.lookout_client.create_inference_scheduler(**create_inference_scheduler_request)
+        
+        scheduler_status = create_scheduler_response['Status']
+        print("===== Polling Inference Scheduler Status =====\n")
+        print("Scheduler Status: " + scheduler_status)
+        while scheduler_status == 'PENDING':
+            time.sleep(5)
+            describe_scheduler_response = self.lookout_client.describe_inference_scheduler(
+                InferenceSchedulerName=self.scheduler_name
+            )
+            scheduler_status = describe_scheduler_response['Status']
+            print("Scheduler Status: " + scheduler_status)
+        print("\n===== End of Polling Inference Scheduler Status =====")
+
+        return describe_scheduler_response
+    
+    def start(self):
+        start_scheduler_response = self.lookout_client.start_inference_scheduler(
+            InferenceSchedulerName=self.scheduler_name
+        )
+
+        # Wait until started:
+        scheduler_status = start_scheduler_response['Status']
+        print("===== Polling Inference Scheduler Status =====\n")
+        print("Scheduler Status: " + scheduler_status)
+        while scheduler_status == 'PENDING':
+            time.sleep(5)
+            describe_scheduler_response = self.lookout_client.describe_inference_scheduler(
+                InferenceSchedulerName=self.scheduler_name
+            )
+            scheduler_status = describe_scheduler_response['Status']
+            print("Scheduler Status: " + scheduler_status)
+        print("\n===== End of Polling Inference Scheduler Status =====")
+        
+    def stop(self):
+        stop_scheduler_response = self.lookout_client.stop_inference_scheduler(
+            InferenceSchedulerName=self.scheduler_name
+        )
+
+        # Wait until stopped
+        scheduler_status = stop_scheduler_response['Status']
+        print("===== Polling Inference Scheduler Status =====\n")
+        print("Scheduler Status: " + scheduler_status)
+        while scheduler_status == 'STOPPING':
+            time.sleep(5)
+            describe_scheduler_response = self.lookout_client.describe_inference_scheduler(
+                InferenceSchedulerName=self.scheduler_name
+            )
+            scheduler_status = describe_scheduler_response['Status']
+            print("Scheduler Status: " + scheduler_status)
+        print("\n===== End of Polling Inference Scheduler Status =====")
+        
+    def _describe(self):
+        describe_scheduler_response = self.lookout_client.describe_inference_scheduler(
+            InferenceSchedulerName=self.scheduler_name
+        )
+        
+        return describe_scheduler_response
+        
+    async def create_async(self, timeout=None, callback=None, initial_delay=5, max_delay=60):
+        """
+        Create the scheduler and wait until it is not pending anymore, 
+        without blocking the event loop.
+        
+        PARAMS
+        ======
+            timeout, callback, initial_delay, max_delay:
+                Polling parameters, see wait_for_status()
+                
+        RETURNS
+        =======
+            describe_scheduler_response: dict
+                The description of the scheduler once created
+        """
+        create_inference_scheduler_request = self._get_create_request()
+        await _run_in_thread(
+            self.lookout_client.create_inference_scheduler, 
+            **create_inference_scheduler_request
+        )
+        
+        describe_scheduler_response = await wait_for_status(
+            self._describe, ['PENDING'], timeout, callback, initial_delay, max_delay
+        )
+        
+        return describe_scheduler_response
+        
+    async def start_async(self, timeout=None, callback=None, initial_delay=5, max_delay=60):
+        """
+        Start the scheduler and wait until it is running, without blocking 
+        the event loop.
+        
+        PARAMS
+        ======
+            timeout, callback, initial_delay, max_delay:
+                Polling parameters, see wait_for_status()
+                
+        RETURNS
+        =======
+            describe_scheduler_response: dict
+                The description of the scheduler once started
+        """
+        await _run_in_thread(
+            self.lookout_client.start_inference_scheduler,
+            InferenceSchedulerName=self.scheduler_name
+        )
+        
+        describe_scheduler_response = await wait_for_status(
+            self._describe, ['PENDING'], timeout, callback, initial_delay, max_delay
+        )
+        
+        return describe_scheduler_response
+        
+    async def stop_async(self, timeout=None, callback=None, initial_delay=5, max_delay=60):
+        """
+        Stop the scheduler and wait until it is stopped, without blocking 
+        the event loop.
+        
+        PARAMS
+        ======
+            timeout, callback, initial_delay, max_delay:
+                Polling parameters, see wait_for_status()
+                
+        RETURNS
+        =======
+            describe_scheduler_response: dict
+                The description of the scheduler once stopped
+        """
+        await _run_in_thread(
+            self.lookout_client.stop_inference_scheduler,
+            InferenceSchedulerName=self.scheduler_name
+        )
+        
+        describe_scheduler_response = await wait_for_status(
+            self._describe, ['STOPPING'], timeout, callback, initial_delay, max_delay
+        )
+        
+        return describe_scheduler_response
+        
+    async def delete_async(self):
+        """
+        Delete the scheduler (it must be stopped) without blocking the 
+        event loop.
+        """
+        if (await self.get_status_async()) != 'STOPPED':
+            raise Exception('Scheduler must be stopped to be deleted.')
+            
+        delete_scheduler_response = await _run_in_thread(
+            self.lookout_client.delete_inference_scheduler,
+            InferenceSchedulerName=self.scheduler_name
+        )
+        
+        return delete_scheduler_response
+        
+    async def get_status_async(self):
+        """
+        Returns the status of the scheduler without blocking the event loop.
+        """
+        describe_scheduler_response = await _run_in_thread(self._describe)
+        
+        return describe_scheduler_response['Status']
+        
+    def delete(self):
+        if self.get_status() == 'STOPPED':
+            delete_scheduler_response = self.lookout_client.delete_inference_scheduler(
+                InferenceSchedulerName=self.scheduler_name
+            )
+            
+        else:
+            raise Exception('Scheduler must be stopped to be deleted.')
+        
+        return delete_scheduler_response
+    
+    def get_status(self):
+        describe_scheduler_response = self.lookout_client.describe_inference_scheduler(
+            InferenceSchedulerName=self.scheduler_name
+        )
+        status = describe_scheduler_response['Status']
+        
+        return status
+    
+    def list_inference_executions(self, 
+                                  execution_status=None, 
+                                  start_time=None, 
+                                  end_time=None, 
+                                  max_results=50, 
+                                  num_windows=1, 
+                                  max_workers=8, 
+                                  window_overlap='1h'):
+        """
+        List the inference executions of this scheduler.
+        
+        PARAMS
+        ======
+            execution_status: string (default: None)
+                Only list the executions with this status
+                
+            start_time: datetime (default: None)
+                Only list the executions processing data after this time
+                
+            end_time: datetime (default: None)
+                Only list the executions processing data before this time
+                
+            max_results: integer (default: 50)
+                Max number of executions to return per page
+                
+            num_windows: integer (default: 1)
+                If greater than 1, the [start_time, end_time] period is split
+                in this number of time windows listed concurrently (by 
+                default, the period goes from the creation of the scheduler
+                to now)
+                
+            max_workers: integer (default: 8)
+                Maximum number of windows listed at the same time
+                
+            window_overlap: string or pandas.Timedelta (default: '1h')
+                Each window is extended by this duration to catch the
+                executions straddling two windows: it must be longer than
+                the data processed by a single execution
+                
+        RETURNS
+        =======
+            list_executions: list of dict
+                The summary of each execution
+        """
+        list_executions = self._list_executions(
+            execution_status, start_time, end_time, max_results, num_windows, max_workers, window_overlap
+        )
+
+        self.execution_summaries = list_executions
+        return list_executions
+        
+    def _list_executions(self, 
+                         execution_status=None, 
+                         start_time=None, 
+                         end_time=None, 
+                         max_results=50, 
+                         num_windows=1, 
+                         max_workers=8, 
+                         window_overlap='1h'):
+        """
+        List the inference executions of this scheduler without changing 
+        the execution_summaries attribute (see list_inference_executions()).
+        """
+        list_executions_request = {"MaxResults": max_results}
+
+        list_executions_request["InferenceSchedulerName"] = self.scheduler_name
+
+        if execution_status is not None:
+            list_executions_request["Status"] = execution_status
+        if (start_time is not None) and (num_windows <= 1):
+            list_executions_request['DataStartTimeAfter'] = start_time
+        if end_time is not None:
+            list_executions_request['DataEndTimeBefore'] = end_time
+
+        if num_windows <= 1:
+            list_executions = list(paginate(
+                self.lookout_client.list_inference_executions,
+                'InferenceExecutionSummaries',
+                **list_executions_request
+            ))
+            
+        else:
+            list_executions = self._list_executions_by_windows(
+                list_executions_request, start_time, end_time, num_windows, max_workers, window_overlap
+            )
+
+        return list_executions
+        
+    def _list_executions_by_windows(self, 
+                                    list_executions_request, 
+                                    start_time, 
+                                    end_time, 
+                                    num_windows, 
+                                    max_workers, 
+                                    window_overlap):
+        """
+        List the executions of a period split in time windows listed 
+        concurrently. Each execution is only kept in the window where its 
+        data starts, so that none is listed twice.
+        """
+        if start_time is None:
+            start_time = self._describe()['CreatedAt']
+        if end_time is None:
+            end_time = pd.Timestamp.now(tz='UTC')
+        start_time = pd.to_datetime(start_time)
+        end_time = pd.to_datetime(end_time)
+        if start_time.tzinfo is None:
+            start_time = start_time.tz_localize('UTC')
+        if end_time.tzinfo is None:
+            end_time = end_time.tz_localize('UTC')
+            
+        window_overlap = pd.Timedelta(window_overlap)
+        boundaries = pd.date_range(start_time, end_time, periods=num_windows + 1)
+        shards = []
+        for window_start, window_end in zip(boundaries[:-1], boundaries[1:]):
+            shards.append({
+                'DataStartTimeAfter': (window_start - pd.Timedelta(seconds=1)).to_pydatetime(),
+                'DataEndTimeBefore': min(window_end + window_overlap, end_time).to_pydatetime()
+            })
+        list_executions_request = {
+            key: value for key, value in list_executions_request.items() 
+            if key not in ['DataStartTimeAfter', 'DataEndTimeBefore']
+        }
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    lambda shard: list(paginate(
+                        self.lookout_client.list_inference_executions,
+                        'InferenceExecutionSummaries',
+                        **list_executions_request,
+                        **shard
+                    )),
+                    shard
+                )
+                for shard in shards
+            ]
+            
+            list_executions = []
+            for window_index, future in enumerate(futures):
+                window_start = boundaries[window_index]
+                window_end = boundaries[window_index + 1]
+                last_window = window_index == num_windows - 1
+                for execution_summary in future.result():
+                    data_start_time = pd.to_datetime(execution_summary['DataStartTime'])
+                    if data_start_time.tzinfo is None:
+                        data_start_time = data_start_time.tz_localize('UTC')
+                    if (data_start_time >= window_start) and ((data_start_time < window_end) or last_window):
+                        list_executions.append(execution_summary)
+                        
+        return list_executions
+    
+    @_instrumented('scheduler.get_predictions')
+    def get_predictions(self, max_workers=16, cache_dir=None, revalidate=True, s3_client=None):
+        """
+        Get the predictions generated by all the inference executions of
+        this scheduler. The result objects are downloaded concurrently.
+        
+        PARAMS
+        ======
+            max_workers: integer (default: 16)
+                Maximum number of result objects downloaded at the same time
+                
+            cache_dir: string (default: None)
+                If provided, result objects are cached in this directory and
+                are only downloaded again when they changed on S3
+                
+            revalidate: boolean (default: True)
+                Check that cached result objects did not change on S3 (see 
+                fetch_s3_objects())
+                
+            s3_client: boto3 S3 client (default: None)
+                Client to use to download the results objects
+                
+        RETURNS
+        =======
+            results_df: pandas.DataFrame
+                A dataframe with the predictions, indexed by timestamp
+        """
+        if self.execution_summaries is None:
+            _ = self.list_inference_executions()
+            
+        results_df = self._read_predictions(
+            self.execution_summaries, max_workers, cache_dir, revalidate, s3_client
+        )
+        
+        return results_df
+    
+    @_instrumented('scheduler.sync_predictions')
+    def sync_predictions(self, store, max_workers=16, s3_client=None):
+        """
+        Incrementally synchronize the predictions of this scheduler to a 
+        local predictions store. The end of the data processed by the last
+        execution already synchronized is kept in the store as a high-water 
+        mark: only the executions that started after it are listed and 
+        downloaded, and their predictions are appended to the store.
+        Executions are synchronized in chronological order, up to the first
+        one still in progress. The execution_summaries attribute used by
+        get_predictions() is left untouched.
+        
+        The delivery is at-least-once: the predictions are appended before
+        the high-water mark is moved, so an interrupted synchronization 
+        appends them again on the next call. The duplicated timestamps are
+        dropped by the read() and compact() methods of the store.
+        
+        PARAMS
+        ======
+            store: PredictionsStore or string
+                Local store (or its root directory) where the predictions 
+                and the high-water mark are persisted
+                
+            max_workers: integer (default: 16)
+                Maximum number of result objects downloaded at the same time
+                
+            s3_client: boto3 S3 client (default: None)
+                Client to use to download the results objects
+                
+        RETURNS
+        =======
+            new_results_df: pandas.DataFrame
+                A dataframe with the new predictions only
+        """
+        if not isinstance(store, PredictionsStore):
+            store = PredictionsStore(store)
+        
+        # Load the high-water mark of the previous synchronization:
+        last_start_time = None
+        last_end_time = None
+        state = store.get_sync_state(self.scheduler_name)
+        if state is not None:
+            last_start_time = pd.to_datetime(state['DataStartTime'])
+            last_end_time = pd.to_datetime(state['DataEndTime'])
+            
+        # The last synchronized execution may be listed again: 
+        # everything ending before the high-water mark is dropped:
+        execution_summaries = self._list_executions(
+            start_time=None if last_start_time is None else last_start_time.to_pydatetime()
+        )
+        execution_summaries = sorted(execution_summaries, key=lambda e: e['DataStartTime'])
+        new_executions = []
+        for execution_summary in execution_summaries:
+            if execution_summary['Status'] == 'IN_PROGRESS':
+                break
+            if (last_end_time is not None) and (pd.to_datetime(execution_summary['DataEndTime']) <= last_end_time):
+                continue
+            new_executions.append(execution_summary)
+            
+        new_results_df = self._read_predictions(new_executions, max_workers, None, True, s3_client)
+        if len(new_executions) == 0:
+            return new_results_df
+            
+        # Append the new predictions before moving the high-water mark:
+        store.append(self.scheduler_name, new_results_df)
+        store.set_sync_state(self.scheduler_name, {
+            'DataStartTime': pd.to_datetime(new_executions[-1]['DataStartTime']).isoformat(),
+            'DataEndTime': pd.to_datetime(new_executions[-1]['DataEndTime']).isoformat()
+        })
+        
+        return new_results_df
+    
+    def _read_predictions(self, execution_summaries, max_workers, cache_dir, revalidate, s3_client):
+        """
+        Download and parse the result objects of a list of executions.
+        
+        RETURNS
+        =======
+            results_df: pandas.DataFrame
+                A dataframe with the predictions, indexed by timestamp
+        """
+        s3_objects = [
+            execution_summary['CustomerResultObject']
+            for execution_summary in execution_summaries
+            if 'CustomerResultObject' in execution_summary
+        ]
+        contents = fetch_s3_objects(
+            s3_objects,
+            s3_client=s3_client,
+            cache_dir=cache_dir,
+            max_workers=max_workers,
+            revalidate=revalidate,
+            region_name=self.region_name
+        )
+        
+        if len(contents) == 0:
+            results_df = pd.DataFrame(columns=['Predictions'], index=pd.DatetimeIndex([], name='Timestamp'))
+            return results_df
+            
+        # All the results are parsed at once:
+        with _span('scheduler.parse_predictions') as span:
+            contents = [content if content.endswith(b'\n') else content + b'\n' for content in contents]
+            results_df = pd.read_csv(
+                io.BytesIO(b''.join(contents)), 
+                header=None, 
+                names=['Timestamp', 'Predictions']
+            )
+            results_df['Timestamp'] = pd.to_datetime(results_df['Timestamp'])
+            results_df = results_df.set_index('Timestamp')
+            span.add(rows=len(results_df))
+        
+        return results_df
+
+class LookoutEquipmentSchedulerFleet:
+    """
+    A class to manage many Lookout for Equipment inference schedulers at
+    once. Actions are run concurrently on all the schedulers of the fleet,
+    with a bounded number of schedulers processed at the same time. When 
+    an API call is throttled, the whole fleet pauses for a backoff delay
+    before the call is retried.
+    
+    ATTRIBUTES
+    ==========
+        schedulers: list of LookoutEquipmentScheduler
+            The schedulers managed by this fleet
+            
+        max_concurrency: integer
+            Maximum number of schedulers processed at the same time
+
+    METHODS
+    =======
+        from_existing():
+            Build a fleet with the existing schedulers of an account
+            
+        run_async():
+            Coroutine running an action on every scheduler of the fleet
+            
+        run():
+            Run an action on every scheduler of the fleet
+            
+        create(), start(), stop(), delete(), restart(), get_status():
+            Shortcuts to run the corresponding action
+    """
+    ACTIONS = ['create', 'start', 'stop', 'delete', 'restart', 'status']
+    
+    def __init__(self, 
+                 schedulers, 
+                 max_concurrency=DEFAULT_MAX_POOL_CONNECTIONS, 
+                 max_retries=5, 
+                 timeout=None,
+                 initial_delay=5,
+                 max_delay=60):
+        """
+        PARAMS
+        ======
+            schedulers: list of LookoutEquipmentScheduler
+                The schedulers to manage
+                
+            max_concurrency: integer (default: 10)
+                Maximum number of schedulers processed at the same time
+                
+            max_retries: integer (default: 5)
+                Maximum number of retries of a throttled action
+                
+            timeout: float (default: None)
+                Maximum time in seconds to wait for each scheduler to reach
+                its target status
+                
+            initial_delay, max_delay: float (default: 5, 60)
+                Polling parameters, see wait_for_status()
+        """
+        self.schedulers = list(schedulers)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self._resume_time = 0.0
+        
+    @classmethod
+    def from_existing(cls, scheduler_name_prefix=None, region_name=DEFAULT_REGION, **kwargs):
+        """
+        Build a fleet with all the existing schedulers of an account.
+        
+        PARAMS
+        ======
+            scheduler_name_prefix: string (default: None)
+                Only keep the schedulers which names start by this prefix
+                
+            region_name: string
+                AWS region name. (Default: eu-west-1)
+                
+            kwargs:
+                Other parameters passed to the fleet constructor
+                
+        RETURNS
+        =======
+            fleet: LookoutEquipmentSchedulerFleet
+                A fleet with all the schedulers found
+        """
+        lookoutequipment_client = get_client(region_name=region_name)
+        list_schedulers_request = {'MaxResults': 50}
+        if scheduler_name_prefix is not None:
+            list_schedulers_request['InferenceSchedulerNameBeginsWith'] = scheduler_name_prefix
+            
+        scheduler_summaries = paginate(
+            lookoutequipment_client.list_inference_schedulers,
+            'InferenceSchedulerSummaries',
+            **list_schedulers_request
+        )
+        schedulers = [
+            LookoutEquipmentScheduler(
+                scheduler_name=scheduler_summary['InferenceSchedulerName'],
+                model_name=scheduler_summary['ModelName'],
+                region_name=region_name
+            )
+            for scheduler_summary in scheduler_summaries
+        ]
+                
+        fleet = cls(schedulers, **kwargs)
+        
+        return fleet
+        
+    async def _run_scheduler_action(self, scheduler, action, semaphore):
+        """
+        Run an action on a single scheduler, retrying throttled calls.
+        
+        RETURNS
+        =======
+            result: dict
+                Outcome of the action for this scheduler
+        """
+        loop = asyncio.get_running_loop()
+        wait_kwargs = {
+            'timeout': self.timeout,
+            'initial_delay': self.initial_delay,
+            'max_delay': self.max_delay
+        }
+        result = {
+            'SchedulerName': scheduler.scheduler_name,
+            'Action': action,
+            'Status': None,
+            'Success': False,
+            'Retries': 0,
+            'Error': None,
+            'Duration': None
+        }
+        
+        async with semaphore:
+            start_time = loop.time()
+            while True:
+                # Wait until the fleet is not throttled anymore:
+                pause = self._resume_time - loop.time()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                    
+                try:
+                    if action == 'create':
+                        response = await scheduler.create_async(**wait_kwargs)
+                        status = response['Status']
+                    elif action == 'start':
+                        response = await scheduler.start_async(**wait_kwargs)
+                        status = response['Status']
+                    elif action == 'stop':
+                        response = await scheduler.stop_async(**wait_kwargs)
+                        status = response['Status']
+                    elif action == 'restart':
+                        if (await scheduler.get_status_async()) != 'STOPPED':
+                            await scheduler.stop_async(**wait_kwargs)
+                        response = await scheduler.start_async(**wait_kwargs)
+                        status = response['Status']
+                    elif action == 'delete':
+                        await scheduler.delete_async()
+                        status = 'DELETED'
+                    else:
+                        status = await scheduler.get_status_async()
+                        
+                    result.update({'Status': status, 'Success': True})
+                    break
+                    
+                except botocore_exceptions.ClientError as e:
+                    error_code = e.response['Error']['Code']
+                    if (error_code in THROTTLING_ERROR_CODES) and (result['Retries'] < self.max_retries):
+                        backoff = min(self.max_delay, 2 ** result['Retries'])
+                        backoff = backoff / 2 + random.uniform(0, backoff / 2)
+                        self._resume_time = max(self._resume_time, loop.time() + backoff)
+                        result['Retries'] += 1
+                        continue
+                        
+                    result['Error'] = f'{error_code}: {e}'
+                    break
+                    
+                except Exception as e:
+                    result['Error'] = f'{type(e).__name__}: {e}'
+                    break
+                    
+            result['Duration'] = loop.time() - start_time
+            
+        return result
+        
+    async def run_async(self, action):
+        """
+        Run an action concurrently on every scheduler of the fleet.
+        
+        PARAMS
+        ======
+            action: string
+                One of 'create', 'start', 'stop', 'delete', 'restart' or
+                'status'
+                
+        RETURNS
+        =======
+            results_df: pandas.DataFrame
+                A dataframe with one row per scheduler (in the order of the 
+                fleet) with the final status, whether the action succeeded,
+                the number of throttled retries, the error message if any
+                and the duration of the action in seconds
+        """
+        if action not in self.ACTIONS:
+            raise Exception(f'Unknown action "{action}": expecting one of {self.ACTIONS}.')
+            
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*[
+            self._run_scheduler_action(scheduler, action, semaphore)
+            for scheduler in self.schedulers
+        ])
+        results_df = pd.DataFrame(results, columns=[
+            'SchedulerName', 'Action', 'Status', 'Success', 'Retries', 'Error', 'Duration'
+        ])
+        
+        return results_df
+        
+    def run(self, action):
+        """
+        Blocking version of run_async(). From a running event loop (like
+        in a Jupyter notebook), use "await fleet.run_async(action)" instead.
+        """
+        return asyncio.run(self.run_async(action))
+        
+    def create(self):
+        return self.run('create')
+        
+    def start(self):
+        return self.run('start')
+        
+    def stop(self):
+        return self.run('stop')
+        
+    def delete(self):
+        return self.run('delete')
+        
+    def restart(self):
+        return self.run('restart')
+        
+    def get_status(self):
+        return self.run('status')
+    
+class PredictionsStore:
+    """
+    A local, append-only store for the predictions generated by inference
+    schedulers. Predictions are written as Parquet files partitioned by
+    scheduler and by day:
+    
+        <root_dir>/scheduler=<scheduler_name>/date=<YYYY-MM-DD>/part-*.parquet
+        
+    Each append creates new files and never rewrites existing ones. Reads
+    only open the partitions overlapping the requested time range. When a
+    timestamp was appended more than once, only its last appended 
+    prediction is kept by reads and compactions.
+    
+    ATTRIBUTES
+    ==========
+        root_dir: string
+            Root directory of the store
+
+    METHODS
+    =======
+        append():
+            Append new predictions for a scheduler
+            
+        read():
+            Read the predictions of a scheduler over a time range
+            
+        read_ranges():
+            Read the anomaly ranges of a scheduler over a time range
+            
+        compact():
+            Merge the files of each day in a single file
+            
+        list_schedulers():
+            List all the schedulers with predictions in the store
+    """
+    def __init__(self, root_dir):
+        """
+        PARAMS
+        ======
+            root_dir: string
+                Root directory of the store (created if it does not exist)
+        """
+        self.root_dir = root_dir
+        os.makedirs(self.root_dir, exist_ok=True)
+        
+    def _scheduler_dir(self, scheduler_name):
+        return os.path.join(self.root_dir, f'scheduler={scheduler_name}')
+        
+    def _list_partitions(self, scheduler_name, start=None, end=None):
+        """
+        List the daily partitions of a scheduler overlapping a time range.
+        
+        RETURNS
+        =======
+            partitions: list of strings
+                Path of each partition directory, in chronological order
+        """
+        scheduler_dir = self._scheduler_dir(scheduler_name)
+        if not os.path.isdir(scheduler_dir):
+            return []
+            
+        first_day = None if start is None else str(pd.to_datetime(start).date())
+        last_day = None if end is None else str(pd.to_datetime(end).date())
+        partitions = []
+        for partition in sorted(os.listdir(scheduler_dir)):
+            if not partition.startswith('date='):
+                continue
+            day = partition[len('date='):]
+            if (first_day is not None) and (day < first_day):
+                continue
+            if (last_day is not None) and (day > last_day):
+                continue
+            partitions.append(os.path.join(scheduler_dir, partition))
+            
+        return partitions
+        
+    def _list_files(self, partition):
+        files = sorted(
+            os.path.join(partition, f) for f in os.listdir(partition) 
+            if f.endswith('.parquet')
+        )
+        
+        return files
+        
+    def append(self, scheduler_name, results_df):
+        """
+        Append predictions to the store.
+        
+        PARAMS
+        ======
+            scheduler_name: string
+                Name of the scheduler which generated these predictions
+                
+            results_df: pandas.DataFrame
+                Predictions indexed by timestamp, as returned by the
+                LookoutEquipmentScheduler.get_predictions() method
+        """
+        if results_df.shape[0] == 0:
+            return
+            
+        results_df = results_df.sort_index()
+        days = results_df.index.normalize()
+        part_name = f'part-{pd.Timestamp.now().strftime("%Y%m%d%H%M%S%f")}-{uuid.uuid4().hex[:8]}.parquet'
+        for day in days.unique():
+            day_df = results_df[days == day]
+            partition = os.path.join(self._scheduler_dir(scheduler_name), f'date={day.date()}')
+            os.makedirs(partition, exist_ok=True)
+            
+            # Files are written under a temporary name so that 
+            # readers never see a partially written file:
+            fname = os.path.join(partition, part_name)
+            table = pa.Table.from_pandas(day_df, preserve_index=True)
+            pq.write_table(table, fname + '.tmp')
+            os.replace(fname + '.tmp', fname)
+            
+    def read(self, scheduler_name, start=None, end=None):
+        """
+        Read the predictions of a scheduler.
+        
+        PARAMS
+        ======
+            scheduler_name: string
+                Name of the scheduler
+                
+            start: string or pandas.Datetime (default: None)
+                Read the predictions from this timestamp (included). Reads
+                from the first prediction if not provided
+                
+            end: string or pandas.Datetime (default: None)
+                Read the predictions up to this timestamp (included). Reads
+                up to the last prediction if not provided
+                
+        RETURNS
+        =======
+            results_df: pandas.DataFrame
+                The predictions indexed by timestamp, in chronological order
+        """
+        files = []
+        for partition in self._list_partitions(scheduler_name, start, end):
+            files += self._list_files(partition)
+            
+        if len(files) == 0:
+            results_df = pd.DataFrame(columns=['Predictions'], index=pd.DatetimeIndex([], name='Timestamp'))
+            return results_df
+            
+        results_df = pa.concat_tables([pq.read_table(f) for f in files]).to_pandas()
+        results_df = _drop_duplicated_timestamps(results_df)
+        if (start is not None) or (end is not None):
+            results_df = results_df.loc[start:end]
+            
+        return results_df
+        
+    def read_ranges(self, scheduler_name, start=None, end=None):
+        """
+        Read the predictions of a scheduler as anomaly ranges, that can be
+        used with plot_timeseries() or compared with the ranges from a
+        LookoutEquipmentAnalysis object.
+        
+        PARAMS
+        ======
+            scheduler_name, start, end:
+                See the read() method
+                
+        RETURNS
+        =======
+            ranges_df: pandas.DataFrame
+                A dataframe with the predicted anomaly ranges listed in
+                chronological order with a start and an end column
+        """
+        results_df = self.read(scheduler_name, start, end)
+        ranges_df = mask_to_ranges(results_df.index, results_df['Predictions'].values == 1)
+        
+        return ranges_df
+        
+    def compact(self, scheduler_name, before=None):
+        """
+        Merge all the files of each daily partition of a scheduler into a 
+        single file to speed up the reads.
+        
+        PARAMS
+        ======
+            scheduler_name: string
+                Name of the scheduler
+                
+            before: string or pandas.Datetime (default: None)
+                Only compact the days before this one (to leave the current
+                day, still being appended to, untouched)
+        """
+        end = None
+        if before is not None:
+            end = pd.to_datetime(before) - pd.Timedelta(days=1)
+            
+        for partition in self._list_partitions(scheduler_name, end=end):
+            files = self._list_files(partition)
+            if len(files) <= 1:
+                continue
+                
+            results_df = pa.concat_tables([pq.read_table(f) for f in files]).to_pandas()
+            results_df = _drop_duplicated_timestamps(results_df)
+            table = pa.Table.from_pandas(results_df, preserve_index=True)
+            
+            # The merged file replaces the newest one, so that it
+            # still sorts before the files appended after it:
+            fname = files[-1]
+            pq.write_table(table, fname + '.tmp')
+            os.replace(fname + '.tmp', fname)
+            for f in files[:-1]:
+                os.remove(f)
+                
+    def list_schedulers(self):
+        """
+        RETURNS
+        =======
+            schedulers_list: list of strings
+                Name of all the schedulers with predictions in the store
+        """
+        schedulers_list = sorted(
+            d[len('scheduler='):] for d in os.listdir(self.root_dir)
+            if d.startswith('scheduler=')
+        )
+        
+        return schedulers_list
+        
+    def get_sync_state(self, scheduler_name):
+        """
+        Get the synchronization state persisted for a scheduler (see the
+        LookoutEquipmentScheduler.sync_predictions() method), or None.
+        """
+        state_fname = os.path.join(self._scheduler_dir(scheduler_name), '_sync_state.json')
+        if not os.path.exists(state_fname):
+            return None
+            
+        with open(state_fname, 'r') as f:
+            state = json.load(f)
+            
+        return state
+        
+    def set_sync_state(self, scheduler_name, state):
+        """
+        Persist the synchronization state of a scheduler.
+        """
+        scheduler_dir = self._scheduler_dir(scheduler_name)
+        os.makedirs(scheduler_dir, exist_ok=True)
+        state_fname = os.path.join(scheduler_dir, '_sync_state.json')
+        with open(state_fname + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(state_fname + '.tmp', state_fname)
+
+def _parse_timezone_offset(timezone_offset):
+    """
+    Convert a time zone offset like +01:30 or -05:00 into a pandas.Timedelta.
+    """
+    sign = -1 if timezone_offset.startswith('-') else 1
+    hours, minutes = timezone_offset.lstrip('+-').split(':')
+
+    return sign * pd.Timedelta(hours=int(hours), minutes=int(minutes))
+
+def _drop_duplicated_timestamps(results_df):
+    """
+    Sort predictions read from several files of a predictions store, and
+    only keep the last appended prediction of each timestamp. Files are 
+    named after their append time, so the last one read is the newest.
+    """
+    results_df = results_df[~results_df.index.duplicated(keep='last')]
+    results_df = results_df.sort_index()
+    
+    return results_df
+
+class InferenceInputProducer:
+    """
+    Produces the input files of an inference scheduler from a dataframe 
+    with all the tags: for each upload window, one CSV file per component
+    is written, named after the component delimiter and the timestamp 
+    format configured on the scheduler (e.g. <component>_<yyyyMMddHHmmss>.csv).
+    Timezone aware timestamps are written in the time zone offset of the 
+    scheduler, both in the file names and in the files. Naive timestamps 
+    are taken as already expressed in this time zone.
+    The columns of each component are located once and the files of all 
+    the windows are written concurrently.
+    
+    ATTRIBUTES
+    ==========
+        scheduler: LookoutEquipmentScheduler
+            The scheduler to produce input files for (its parameters must
+            be set with set_parameters())
+            
+        component_tags: dict
+            The list of tags of each component
+            
+        output_dir: string
+            Local directory where to write the files. When None, the files
+            are sent to the input location of the scheduler on S3
             
-        plot_signals():
-            Plot the top 12 signals by decreasing ranking distance. For each 
-            signal, this method will plot the normal values in green and the 
-            anomalies in red
-
-        get_ranked_list():
-            Returns the list of signals with computed rank
+    METHODS
+    =======
+        get_file_name():
+            Name of the input file of a component for a given time
+            
+        produce():
+            Write the input files of a single upload window
+            
+        produce_range():
+            Write the input files of all the upload windows of a time range
     """
-    def __init__(self, model_name, tags_df, region_name=DEFAULT_REGION):
+    def __init__(self, scheduler, tags_description, output_dir=None, max_workers=16, s3_client=None):
         """
-        Create a new analysis for a Lookout for Equipment model.
-        
         PARAMS
         ======
-            model_name: string
-                The name of the Lookout for Equipment trained model
+            scheduler: LookoutEquipmentScheduler
+                The scheduler to produce input files for
                 
-            tags_df: pandas.DataFrame
-                A dataframe containing all the signals, indexed by time
+            tags_description: pandas.DataFrame or dict
+                Either a dataframe with a 'Subsystem' and a 'Tag' column or
+                a dictionary with the list of tags of each component
                 
-            region_name: string
-                Name of the AWS region from where the service is called.
+            output_dir: string (default: None)
+                Local directory where to write the files. By default, files
+                are sent to the input location of the scheduler
+                
+            max_workers: integer (default: 16)
+                Number of files to write concurrently
+                
+            s3_client: boto3.client (default: None)
+                The S3 client to use when sending files to S3
         """
-        self.lookout_client = get_client(region_name)
-        self.model_name = model_name
-        self.predicted_ranges = None
-        self.labelled_ranges = None
+        self.scheduler = scheduler
+        self.component_tags = _get_component_tags(tags_description)
+        self.output_dir = output_dir
+        self.max_workers = max_workers
         
-        self.df_list = dict()
-        for signal in tags_df.columns:
-            self.df_list.update({signal: tags_df[[signal]]})
+        self.s3_client = s3_client
+        if (output_dir is None) and (s3_client is None):
+            self.s3_client = get_s3_client(region_name=scheduler.region_name, max_pool_connections=max_workers)
+            
+        self._columns = None
+        self._column_groups = None
         
-    def _load_model_response(self):
+    def _get_column_groups(self, columns):
         """
-        Use the trained model description to extract labelled and predicted 
-        ranges of anomalies. This method will extract them from the 
-        DescribeModel API from Lookout for Equipment and store them in the
-        labelled_ranges and predicted_ranges properties.
+        Returns the positions of the columns of each component. These are
+        only computed again when the columns of the tags dataframe change.
         """
-        describe_model_response = self.lookout_client.describe_model(ModelName=self.model_name)
-        
-        self.labelled_ranges = eval(describe_model_response['ModelMetrics'])['labeled_ranges']
-        self.predicted_ranges = eval(describe_model_response['ModelMetrics'])['predicted_ranges']
-
-        self.labelled_ranges = pd.DataFrame(self.labelled_ranges)
-        self.labelled_ranges['start'] = pd.to_datetime(self.labelled_ranges['start'])
-        self.labelled_ranges['end'] = pd.to_datetime(self.labelled_ranges['end'])
-
-        self.predicted_ranges = pd.DataFrame(self.predicted_ranges)
-        self.predicted_ranges['start'] = pd.to_datetime(self.predicted_ranges['start'])
-        self.predicted_ranges['end'] = pd.to_datetime(self.predicted_ranges['end'])
+        if (self._columns is None) or (not self._columns.equals(columns)):
+            column_groups = dict()
+            for component, tags in self.component_tags.items():
+                positions = columns.get_indexer(tags)
+                if (positions == -1).any():
+                    missing_tags = [tag for tag, position in zip(tags, positions) if position == -1]
+                    raise Exception(f'Tags missing for component "{component}": {missing_tags}')
+                column_groups.update({component: positions})
+                
+            self._columns = columns
+            self._column_groups = column_groups
+            
+        return self._column_groups
         
-    def set_time_periods(self, 
-                         evaluation_start, 
-                         evaluation_end, 
-                         training_start, 
-                         training_end):
+    def get_file_name(self, component, timestamp):
         """
-        Set the time period of analysis
+        Name of the input file of a component for a given time, following 
+        the naming configuration of the scheduler. A timezone aware time is
+        first converted to the time zone offset of the scheduler (EPOCH 
+        names are always the number of seconds since 1970-01-01 UTC).
         
         PARAMS
         ======
-            evaluation_start: datetime
-                Start of the evaluation period
-
-            evaluation_end: datetime
-                End of the evaluation period
-
-            training_start: datetime
-                Start of the training period
-
-            training_end: datetime
-                End of the training period
-        """
-        self.evaluation_start = evaluation_start
-        self.evaluation_end = evaluation_end
-        self.training_start = training_start
-        self.training_end = training_end
-    
-    def get_predictions(self):
+            component: string
+                The component name
+                
+            timestamp: pandas.Timestamp
+                The time to put in the file name
+                
+        RETURNS
+        =======
+            file_name: string
+                The input file name
         """
-        Get the anomaly ranges predicted by the current model
+        timestamp_format = self.scheduler.timestamp_format or 'yyyyMMddHHmmss'
+        delimiter = self.scheduler.component_delimiter or '_'
+        timestamp = self._to_input_time(pd.Timestamp(timestamp))
         
-        RETURN
-        ======
-            predicted_ranges: pandas.DataFrame
-                A Pandas dataframe with the predicted anomaly ranges listed in
-                chronological order with a Start and End columns
-        """
-        if self.predicted_ranges is None:
-            self._load_model_response()
+        # Epoch times do not depend on the time zone:
+        if timestamp_format == 'EPOCH':
+            offset = _parse_timezone_offset(self.scheduler.timezone_offset or '+00:00')
+            formatted_timestamp = str(int((timestamp - offset).timestamp()))
+        elif timestamp_format in INPUT_TIMESTAMP_FORMATS:
+            formatted_timestamp = timestamp.strftime(INPUT_TIMESTAMP_FORMATS[timestamp_format])
+        else:
+            raise Exception(f'Unknown timestamp format "{timestamp_format}".')
             
-        return self.predicted_ranges
+        file_name = f'{component}{delimiter}{formatted_timestamp}.csv'
         
-    def get_labels(self):
-        """
-        Get the labelled ranges as provided to the model before training
+        return file_name
         
-        RETURN
-        ======
-            labelled_ranges: pandas.DataFrame
-                A Pandas dataframe with the labelled anomaly ranges listed in
-                chronological order with a Start and End columns
-        """        
-        if self.labelled_ranges is None:
-            self._load_model_response()
-            
-        return self.labelled_ranges
-    
-    def _get_time_ranges(self):
+    def _to_input_time(self, timestamps):
         """
-        Extract DateTimeIndex with normal values and anomalies from the
-        predictions generated by the model.
-        
-        RETURNS
-        =======
-            index_normal: pandas.DateTimeIndex
-                Timestamp index for all normal values
-                
-            index_anomaly: pandas.DateTimeIndex
-                Timestamp index for all normal values
+        Convert a timezone aware timestamp (or index) to the naive time in
+        the time zone offset of the scheduler. Naive ones are left as is.
         """
-        # Extract the first time series 
-        tag = list(self.df_list.keys())[0]
-        tag_df = self.df_list[tag]
-        
-        # Initialize the predictions dataframe:
-        predictions_df = pd.DataFrame(columns=['Prediction'], index=tag_df.index)
-        predictions_df['Prediction'] = 0
-
-        # Loops through the predicted anomaly 
-        # ranges and set these predictions to 1:
-        for index, row in self.predicted_ranges.iterrows():
-            predictions_df.loc[row['start']:row['end'], 'Prediction'] = 1
-
-        # Limits the analysis range to the evaluation period:
-        predictions_df = predictions_df[self.evaluation_start:self.evaluation_end]
+        if timestamps.tz is None:
+            return timestamps
+            
+        offset = _parse_timezone_offset(self.scheduler.timezone_offset or '+00:00')
         
-        # Build a DateTimeIndex for normal values and anomalies:
-        index_normal = predictions_df[predictions_df['Prediction'] == 0].index
-        index_anomaly = predictions_df[predictions_df['Prediction'] == 1].index
+        return timestamps.tz_convert('UTC').tz_localize(None) + offset
         
-        return index_normal, index_anomaly
-    
-    def compute_histograms(self, index_normal=None, index_anomaly=None, num_bins=20):
+    def produce(self, tags_df, start, end=None, file_timestamp=None):
         """
-        This method loops through each signal and computes two distributions of
-        the values in the time series: one for all the anomalies found in the
-        evaluation period and another one with all the normal values found in the
-        same period. It then computes the Wasserstein distance between these two
-        histograms and then rank every signals based on this distance. The higher
-        the distance, the more different a signal is when comparing anomalous
-        and normal periods. This can orient the investigation of a subject 
-        matter expert towards the sensors and associated components.
+        Write the input files of all the components for a single window.
         
         PARAMS
         ======
-            index_normal: pandas.DateTimeIndex
-                All the normal indices
+            tags_df: pandas.DataFrame
+                A dataframe indexed by time with one column per tag
                 
-            index_anomaly: pandas.DateTimeIndex
-                All the indices for anomalies
+            start: pandas.Timestamp
+                Start of the window (included)
                 
-            num_bins: integer (default: 20)
-                Number of bins to use to build the distributions
+            end: pandas.Timestamp (default: None)
+                End of the window (excluded). By default, the window lasts
+                for the upload frequency of the scheduler
+                
+            file_timestamp: pandas.Timestamp (default: None)
+                The time to put in the file names (start by default)
+                
+        RETURNS
+        =======
+            files: list of strings
+                The path (or S3 key) of each file written
         """
-        if (index_normal is None) or (index_anomaly is None):
-            self.ts_normal_training, self.ts_label_evaluation = self._get_time_ranges()
-
-        self.num_bins = num_bins
-
-        # Now we loop on each signal to compute a 
-        # histogram of each of them in this anomaly range,
-        # compte another one in the normal range and
-        # compute a distance between these:
-        rank = dict()
-        for tag, current_tag_df in tqdm(self.df_list.items(), desc='Computing distributions'):
-            try:
-                # Get the values for the whole signal, parts
-                # marked as anomalies and normal part:
-                current_signal_values = current_tag_df[tag]
-                current_signal_evaluation = current_tag_df.loc[self.ts_label_evaluation, tag]
-                current_signal_training = current_tag_df.loc[self.ts_normal_training, tag]
-
-                # Let's compute a bin width based on the whole range of possible 
-                # values for this signal (across the normal and anomalous periods).
-                # For both normalization and aesthetic reasons, we want the same
-                # number of bins across all signals:
-                bin_width = (np.max(current_signal_values) - np.min(current_signal_values))/self.num_bins
-                bins = np.arange(np.min(current_signal_values), np.max(current_signal_values) + bin_width, bin_width)
-
-                # We now use the same bins arrangement for both parts of the signal:
-                u = np.histogram(current_signal_training, bins=bins, density=True)[0]
-                v = np.histogram(current_signal_evaluation, bins=bins, density=True)[0]
-
-                # Wasserstein distance is the earth mover distance: it can be 
-                # used to compute a similarity between two distributions: this
-                # metric is only valid when the histograms are normalized (hence
-                # the density=True in the computation above):
-                d = wasserstein_distance(u, v)
-                rank.update({tag: d})
-
-            except Exception as e:
-                rank.update({tag: 0.0})
-
-        # Sort histograms by decreasing Wasserstein distance:
-        rank = {k: v for k, v in sorted(rank.items(), key=lambda rank: rank[1], reverse=True)}
-        self.rank = rank
+        start = pd.Timestamp(start)
+        if end is None:
+            end = start + pd.Timedelta(self.scheduler.upload_frequency)
+        if file_timestamp is None:
+            file_timestamp = start
+            
+        return self._produce_windows(tags_df, [(start, pd.Timestamp(end), pd.Timestamp(file_timestamp) - start)])
         
-    def plot_histograms(self, nb_cols=3, max_plots=12):
+    def produce_range(self, tags_df, start, end, time_shift=None):
         """
-        Once the histograms are computed, we can plot the top N by decreasing 
-        ranking distance. By default, this will plot the histograms for the top
-        12 signals, with 3 plots per line.
+        Split a time range in consecutive upload windows and write the input
+        files of all of them at once.
         
         PARAMS
         ======
-            nb_cols: integer (default: 3)
-                Number of plots to assemble on a given row
+            tags_df: pandas.DataFrame
+                A dataframe indexed by time with one column per tag
                 
-            max_plots: integer (default: 12)
-                Number of signal to consider
-        """
-        # Prepare the figure:
-        nb_rows = len(self.df_list.keys()) // nb_cols + 1
-        plt.style.use('Solarize_Light2')
-        prop_cycle = plt.rcParams['axes.prop_cycle']
-        colors = prop_cycle.by_key()['color']
-        fig = plt.figure(figsize=(16, int(nb_rows * 3)))
-        gs = gridspec.GridSpec(nb_rows, nb_cols, hspace=0.5, wspace=0.25)
-
-        # Loops through each signal by decreasing distance order:
-        i = 0
-        for tag, current_rank in tqdm(self.rank.items(), total=max_plots, desc='Preparing histograms'):
-            # We stop after reaching the number of plots we are interested in:
-            if i > max_plots - 1:
-                break
-
-            try:
-                # Get the anomaly and the normal values from the current signal:
-                current_signal_values = self.df_list[tag][tag]
-                current_signal_evaluation = self.df_list[tag].loc[self.ts_label_evaluation, tag]
-                current_signal_training = self.df_list[tag].loc[self.ts_normal_training, tag]
-
-                # Compute the bin width and bin edges to match the 
-                # number of bins we want to have on each histogram:
-                bin_width =(np.max(current_signal_values) - np.min(current_signal_values))/self.num_bins
-                bins = np.arange(np.min(current_signal_values), np.max(current_signal_values) + bin_width, bin_width)
-
-                # Add both histograms in the same plot:
-                ax1 = plt.subplot(gs[i])
-                ax1.hist(current_signal_training, 
-                         density=True, 
-                         alpha=0.5, 
-                         color=colors[1], 
-                         bins=bins, 
-                         edgecolor='#FFFFFF')
-                ax1.hist(current_signal_evaluation, 
-                         alpha=0.5, 
-                         density=True, 
-                         color=colors[5], 
-                         bins=bins, 
-                         edgecolor='#FFFFFF')
-
-            except Exception as e:
-                print(e)
-                ax1 = plt.subplot(gs[i])
-
-            # Removes all the decoration to leave only the histograms:
-            ax1.grid(False)
-            ax1.get_yaxis().set_visible(False)
-            ax1.get_xaxis().set_visible(False)
-
-            # Title will be the tag name followed by the score:
-            title = tag
-            title += f' (score: {current_rank:.02f})'
-            plt.title(title, fontsize=10)
-
-            i+= 1
-            
-    def plot_signals(self, nb_cols=3, max_plots=12):
+            start: pandas.Timestamp
+                Start of the time range (included)
+                
+            end: pandas.Timestamp
+                End of the time range (excluded)
+                
+            time_shift: pandas.Timedelta (default: None)
+                Shift applied to the timestamps of the data and of the file
+                names, to replay historical data at the current time
+                
+        RETURNS
+        =======
+            files: list of strings
+                The path (or S3 key) of each file written
         """
-        Once the histograms are computed, we can plot the top N signals by 
-        decreasing ranking distance. By default, this will plot the signals for 
-        the top 12 signals, with 3 plots per line. For each signal, this method
-        will plot the normal values in green and the anomalies in red.
+        frequency = pd.Timedelta(self.scheduler.upload_frequency)
+        time_shift = pd.Timedelta(0) if time_shift is None else pd.Timedelta(time_shift)
+        window_starts = pd.date_range(start=start, end=pd.Timestamp(end) - frequency, freq=frequency)
+        windows = [(window_start, window_start + frequency, time_shift) for window_start in window_starts]
         
-        PARAMS
-        ======
-            nb_cols: integer (default: 3)
-                Number of plots to assemble on a given row
-                
-            max_plots: integer (default: 12)
-                Number of signal to consider
+        return self._produce_windows(tags_df, windows)
+        
+    def _produce_windows(self, tags_df, windows):
         """
-        # Prepare the figure:
-        nb_rows = max_plots // nb_cols + 1
-        plt.style.use('Solarize_Light2')
-        prop_cycle = plt.rcParams['axes.prop_cycle']
-        colors = prop_cycle.by_key()['color']
-        fig = plt.figure(figsize=(28, int(nb_rows * 4)))
-        gs = gridspec.GridSpec(nb_rows, nb_cols, hspace=0.5, wspace=0.25)
+        Slice the data of each (start, end, time_shift) window and write 
+        the files of all the windows and all the components concurrently.
+        Windows without any data are skipped.
+        """
+        column_groups = self._get_column_groups(tags_df.columns)
+        index = tags_df.index
         
-        # Loops through each signal by decreasing distance order:
-        i = 0
-        for tag, current_rank in self.rank.items():
-            # We stop after reaching the number of plots we are interested in:
-            if i > max_plots - 1:
-                break
-
-            # Get the anomaly and the normal values from the current signal:
-            current_signal_evaluation = self.df_list[tag].loc[self.ts_label_evaluation, tag]
-            current_signal_training = self.df_list[tag].loc[self.ts_normal_training, tag]
-
-            # Plot both time series with a line plot
-            ax1 = plt.subplot(gs[i])
-            ax1.plot(current_signal_training, linewidth=0.5, alpha=0.8, color=colors[1])
-            ax1.plot(current_signal_evaluation, linewidth=0.5, alpha=0.8, color=colors[5])
-
-            # Title will be the tag name followed by the score:
-            title = tag
-            title += f' (score: {current_rank:.01f})'
+        jobs = []
+        for start, end, time_shift in windows:
+            first, last = index.searchsorted(start, side='left'), index.searchsorted(end, side='left')
+            if last <= first:
+                continue
                 
-            plt.title(title, fontsize=10)
-
-            i += 1
+            values = tags_df.iloc[first:last].to_numpy(dtype=np.float64)
+            timestamps = self._to_input_time(index[first:last] + time_shift).values
+            for component, positions in column_groups.items():
+                file_name = self.get_file_name(component, start + time_shift)
+                jobs.append((file_name, timestamps, values[:, positions], self.component_tags[component]))
+                
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            files = list(executor.map(lambda job: self._write_file(*job), jobs))
             
-    def get_ranked_list(self, max_signals=12):
+        return files
+        
+    def _write_file(self, file_name, timestamps, values, tags):
         """
-        Returns the list of signals with computed rank.
+        Write a single input file, either locally or to the input location
+        of the scheduler.
+        """
+        buffer = pa.BufferOutputStream()
+        _write_csv(buffer, timestamps, values, tags)
+        content = buffer.getvalue().to_pybytes()
         
-        PARAMS
-        ======
-            max_signals: integer (default: 12)
-                Number of signals to consider
+        if self.output_dir is not None:
+            fname = os.path.join(self.output_dir, file_name)
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(fname + '.tmp', 'wb') as f:
+                f.write(content)
+            os.replace(fname + '.tmp', fname)
+            
+            return fname
+            
+        prefix = (self.scheduler.input_prefix or '').strip('/')
+        key = f'{prefix}/{file_name}' if len(prefix) > 0 else file_name
+        self.s3_client.put_object(Bucket=self.scheduler.input_bucket, Key=key, Body=content)
         
-        RETURNS
-        =======
-            significant_signals_df: pandas.DataFrame
-                A dataframe with each signal and the associated rank value
-        """
-        significant_signals_df = pd.DataFrame(list(self.rank.items())[:max_signals])
-        significant_signals_df.columns = ['Tag', 'Rank']
+        return key
         
-        return significant_signals_df
-    
-class LookoutEquipmentScheduler:
+class RangesIndex:
     """
-    A class to represent a Lookout for Equipment inference scheduler object.
+    An index over a set of time ranges (predicted or labelled anomalies)
+    to find the ones overlapping many time windows without scanning them
+    all. Ranges are kept sorted by start, along with the running maximum
+    of their ends: the ranges overlapping a window are located with two
+    binary searches. Queries take O(log n) per window, plus the number of
+    ranges returned, as long as no range contains another one (the case of
+    the ranges produced by the service and by mask_to_ranges()). Nested
+    ranges are supported, with an additional filter of the candidates.
     
     ATTRIBUTES
     ==========
-        scheduler_name: string
-            Name of the scheduler associated to this object
+        ranges_df: pandas.DataFrame
+            The indexed ranges sorted by start, with a start and an end 
+            column (and any other column of the dataframe indexed)
             
-        model_name: string
-            Name of the model used to run the inference when the scheduler
-            wakes up
+        starts: numpy.array of datetime64
+            Start of each range, in ascending order
+            
+        ends: numpy.array of datetime64
+            End of each range
             
-        execution_summaries: list of dict
-            A list of all inference execution results. Each execution is stored
-            as a dictionary.
-
     METHODS
     =======
-        set_parameters():
-            Sets all the parameters necessary to manage this scheduler object
-        
-        create():
-            Creates a new scheduler
-            
-        start():
-            Start an existing scheduler
+        from_predictions():
+            Build an index over the anomalies of scheduler results
             
-        stop():
-            Stop an existing scheduler
+        from_store():
+            Build an index over the anomalies kept in a PredictionsStore
             
-        delete():
-            Detele a stopped scheduler
+        search():
+            Locate the candidate ranges of each window
             
-        get_status():
-            Returns the status of the scheduler
+        query():
+            List the ranges overlapping each window of a batch
             
-        list_inference_executions():
-            Returns all the results from the inference executed by the scheduler
+        count():
+            Count the ranges overlapping each window of a batch
             
-        get_predictions():
-            Return the predictions generated by the executed inference
+        overlapping():
+            List the ranges overlapping a single window
     """
-    def __init__(self, scheduler_name, model_name, region_name=DEFAULT_REGION):
+    def __init__(self, ranges_df):
         """
-        Constructs all the necessary attributes for a scheduler object.
+        Build the index in O(n log n) (a single sort of the ranges).
         
         PARAMS
         ======
-            scheduler_name: string
-                The name of the scheduler to be created or managed
+            ranges_df: pandas.DataFrame
+                A dataframe with a start and an end column, like the ones
+                returned by LookoutEquipmentAnalysis.get_predictions() and
+                get_labels()
+        """
+        starts = _to_datetime64(ranges_df['start'])
+        ends = _to_datetime64(ranges_df['end'])
+        order = np.argsort(starts, kind='stable')
+        
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.ranges_df = ranges_df.iloc[order].reset_index(drop=True)
+        self.ranges_df['start'] = self.starts
+        self.ranges_df['end'] = self.ends
+        
+        # Every range before the first one with a running maximum end 
+        # after a window start ends before this window:
+        self._max_ends = np.maximum.accumulate(self.ends) if len(self.ends) > 0 else self.ends
+        self._nested = bool(np.any(self.ends[1:] < self._max_ends[:-1]))
+        
+    @classmethod
+    def from_predictions(cls, results_df):
+        """
+        Build an index over the anomaly ranges of scheduler results (as 
+        returned by LookoutEquipmentScheduler.get_predictions()).
+        
+        PARAMS
+        ======
+            results_df: pandas.DataFrame
+                The predictions (a Predictions column set to 1 for the
+                anomalies), indexed by timestamp
+        """
+        results_df = results_df.sort_index()
+        ranges_df = mask_to_ranges(results_df.index, results_df['Predictions'].values == 1)
+        
+        return cls(ranges_df)
+        
+    @classmethod
+    def from_store(cls, store, scheduler_name, start=None, end=None):
+        """
+        Build an index over the anomaly ranges of a scheduler kept in a 
+        predictions store (see PredictionsStore.read_ranges()).
+        
+        PARAMS
+        ======
+            store: PredictionsStore or string
+                The store (or its root directory)
                 
-            model_name: string
-                The name of the model to schedule inference for
+            scheduler_name: string
+                The name of the scheduler
                 
-            region_name: string
-                Name of the AWS region from where the service is called.
+            start, end: datetime (default: None)
+                Time period to load from the store
         """
-        self.scheduler_name = scheduler_name
-        self.model_name = model_name
-        self.lookout_client = get_client(region_name)
+        if not isinstance(store, PredictionsStore):
+            store = PredictionsStore(store)
+            
+        return cls(store.read_ranges(scheduler_name, start, end))
         
-        self.input_bucket = None
-        self.input_prefix = None
-        self.output_bucket = None
-        self.output_prefix = None
-        self.role_arn = None
-        self.upload_frequency = None
-        self.delay_offset = None
-        self.timezone_offset = None
-        self.component_delimiter = None
-        self.timestamp_format = None
-        self.execution_summaries = None
+    def __len__(self):
+        return len(self.starts)
         
-    def set_parameters(self,
-                       input_bucket,
-                       input_prefix,
-                       output_bucket,
-                       output_prefix,
-                       role_arn,
-                       upload_frequency='PT5M',
-                       delay_offset=None,
-                       timezone_offset='+00:00',
-                       component_delimiter='_',
-                       timestamp_format='yyyyMMddHHmmss'
-                      ):
-        self.input_bucket = input_bucket
-        self.input_prefix = input_prefix
-        self.output_bucket = output_bucket
-        self.output_prefix = output_prefix
-        self.role_arn = role_arn
-        self.upload_frequency = upload_frequency
-        self.delay_offset = delay_offset
-        self.timezone_offset = timezone_offset
-        self.component_delimiter = component_delimiter
-        self.timestamp_format = timestamp_format
-
-    def create(self):
-        client_token = uuid.uuid4().hex
-
-        create_inference_scheduler_request = {
-            'ModelName': self.model_name,
-            'InferenceSchedulerName': self.scheduler_name,
-            'DataUploadFrequency': self.upload_frequency,
-            'RoleArn': self.role_arn,
-            'ClientToken': client_token,
-        }
-
-        if self.delay_offset is not None:
-            create_inference_scheduler_request['DataDelayOffsetInMinutes'] = self.delay_offset
-
-        # Setup data input configuration
-        inference_input_config = dict()
-        inference_input_config['S3InputConfiguration'] = dict([
-            ('Bucket', self.input_bucket),
-            ('Prefix', self.input_prefix)
-        ])
-        if self.timezone_offset is not None:
-            inference_input_config['InputTimeZoneOffset'] = self.timezone_offset
-        if self.component_delimiter is not None or self.timestamp_format is not None:
-            inference_input_name_configuration = dict()
-            if self.component_delimiter is not None:
-                inference_input_name_configuration['ComponentTimestampDelimiter'] = self.component_delimiter
-            if self.timestamp_format is not None:
-                inference_input_name_configuration['TimestampFormat'] = self.timestamp_format
-            inference_input_config['InferenceInputNameConfiguration'] = inference_input_name_configuration   
-        create_inference_scheduler_request['DataInputConfiguration'] = inference_input_config
-
-        #  Set up output configuration
-        inference_output_configuration = dict()
-        inference_output_configuration['S3OutputConfiguration'] = dict([
-            ('Bucket', self.output_bucket),
-            ('Prefix', self.output_prefix)
-        ])
-        create_inference_scheduler_request['DataOutputConfiguration'] = inference_output_configuration
-        create_scheduler_response = self.lookout_client.create_inference_scheduler(**create_inference_scheduler_request)
+    def search(self, window_starts, window_ends):
+        """
+        Locate the ranges which may overlap each window of a batch, with
+        two binary searches per window.
         
-        scheduler_status = create_scheduler_response['Status']
-        print("===== Polling Inference Scheduler Status =====\n")
-        print("Scheduler Status: " + scheduler_status)
-        while scheduler_status == 'PENDING':
-            time.sleep(5)
-            describe_scheduler_response = self.lookout_client.describe_inference_scheduler(
-                InferenceSchedulerName=self.scheduler_name
-            )
-            scheduler_status = describe_scheduler_response['Status']
-            print("Scheduler Status: " + scheduler_status)
-        print("\n===== End of Polling Inference Scheduler Status =====")
-
-        return describe_scheduler_response
-    
-    def start(self):
-        start_scheduler_response = self.lookout_client.start_inference_scheduler(
-            InferenceSchedulerName=self.scheduler_name
-        )
-
-        # Wait until started:
-        scheduler_status = start_scheduler_response['Status']
-        print("===== Polling Inference Scheduler Status =====\n")
-        print("Scheduler Status: " + scheduler_status)
-        while scheduler_status == 'PENDING':
-            time.sleep(5)
-            describe_scheduler_response = self.lookout_client.describe_inference_scheduler(
-                InferenceSchedulerName=self.scheduler_name
-            )
-            scheduler_status = describe_scheduler_response['Status']
-            print("Scheduler Status: " + scheduler_status)
-        print("\n===== End of Polling Inference Scheduler Status =====")
+        PARAMS
+        ======
+            window_starts: list of datetimes
+                Start of each window
+                
+            window_ends: list of datetimes
+                End of each window (inclusive)
+                
+        RETURNS
+        =======
+            first, last: numpy.array of integers
+                The candidates of window i are the ranges at positions 
+                first[i] (included) to last[i] (excluded). They all overlap
+                the window unless some ranges are nested
+        """
+        window_starts = _to_datetime64(window_starts)
+        window_ends = _to_datetime64(window_ends)
+        first = np.searchsorted(self._max_ends, window_starts, side='left')
+        last = np.searchsorted(self.starts, window_ends, side='right')
         
-    def stop(self):
-        stop_scheduler_response = self.lookout_client.stop_inference_scheduler(
-            InferenceSchedulerName=self.scheduler_name
-        )
-
-        # Wait until stopped
-        scheduler_status = stop_scheduler_response['Status']
-        print("===== Polling Inference Scheduler Status =====\n")
-        print("Scheduler Status: " + scheduler_status)
-        while scheduler_status == 'STOPPING':
-            time.sleep(5)
-            describe_scheduler_response = self.lookout_client.describe_inference_scheduler(
-                InferenceSchedulerName=self.scheduler_name
-            )
-            scheduler_status = describe_scheduler_response['Status']
-            print("Scheduler Status: " + scheduler_status)
-        print("\n===== End of Polling Inference Scheduler Status =====")
+        return first, np.maximum(first, last)
         
-    def delete(self):
-        if self.get_status() == 'STOPPED':
-            delete_scheduler_response = self.lookout_client.delete_inference_scheduler(
-                InferenceSchedulerName=self.scheduler_name
-            )
+    def _get_pairs(self, windows_df):
+        """
+        Returns the position of each (window, range) overlapping pair.
+        """
+        window_starts = _to_datetime64(windows_df['start'])
+        first, last = self.search(window_starts, windows_df['end'])
+        counts = last - first
+        
+        # Positions first[i], first[i] + 1, ... last[i] - 1 of each window:
+        windows = np.repeat(np.arange(len(counts)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.repeat(first, counts) + offsets
+        
+        if self._nested:
+            overlapping = self.ends[positions] >= window_starts[windows]
+            windows, positions = windows[overlapping], positions[overlapping]
             
-        else:
-            raise Exception('Scheduler must be stopped to be deleted.')
+        return windows, positions
         
-        return delete_scheduler_response
-    
-    def get_status(self):
-        describe_scheduler_response = self.lookout_client.describe_inference_scheduler(
-            InferenceSchedulerName=self.scheduler_name
-        )
-        status = describe_scheduler_response['Status']
+    def query(self, windows_df):
+        """
+        List the ranges overlapping each window of a batch.
         
-        return status
-    
-    def list_inference_executions(self, execution_status=None, start_time=None, end_time=None, max_results=50):
-        list_executions_request = {"MaxResults": max_results}
-
-        list_executions_request["InferenceSchedulerName"] = self.scheduler_name
-
-        if execution_status is not None:
-            list_executions_request["Status"] = execution_status
-        if start_time is not None:
-            list_executions_request['DataStartTimeAfter'] = start_time
-        if end_time is not None:
-            list_executions_request['DataEndTimeBefore'] = end_time
-
-        has_more_records = True
-        list_executions = []
-        while has_more_records:
-            list_executions_response = self.lookout_client.list_inference_executions(**list_executions_request)
-            if "NextToken" in list_executions_response:
-                list_executions_request["NextToken"] = list_executions_response["NextToken"]
-            else:
-                has_more_records = False
-
-            list_executions = list_executions + list_executions_response["InferenceExecutionSummaries"]
-
-        self.execution_summaries = list_executions
-        return list_executions
-    
-    def get_predictions(self):
-        if self.execution_summaries is None:
-            _ = self.list_inference_executions()
+        PARAMS
+        ======
+            windows_df: pandas.DataFrame
+                The windows, with a start and an end column
+                
+        RETURNS
+        =======
+            overlaps_df: pandas.DataFrame
+                One row per overlapping (window, range) pair: the Window
+                column is the position of the window in windows_df, the 
+                other columns are the ones of the range. Rows are sorted
+                by window, then by range start
+        """
+        windows, positions = self._get_pairs(windows_df)
+        overlaps_df = self.ranges_df.iloc[positions].reset_index(drop=True)
+        overlaps_df.insert(0, 'Window', windows)
+        
+        return overlaps_df
+        
+    def count(self, windows_df):
+        """
+        Count the ranges overlapping each window of a batch.
+        
+        PARAMS
+        ======
+            windows_df: pandas.DataFrame
+                The windows, with a start and an end column
+                
+        RETURNS
+        =======
+            counts: numpy.array of integers
+                The number of ranges overlapping each window
+        """
+        if not self._nested:
+            first, last = self.search(windows_df['start'], windows_df['end'])
+            return last - first
             
-        results_df = []
-        for execution_summary in self.execution_summaries:
-            bucket = execution_summary['CustomerResultObject']['Bucket']
-            key = execution_summary['CustomerResultObject']['Key']
-            fname = f's3://{bucket}/{key}'
-            results_df.append(pd.read_csv(fname, header=None))
-
-        results_df = pd.concat(results_df, axis='index')
-        results_df.columns = ['Timestamp', 'Predictions']
-        results_df['Timestamp'] = pd.to_datetime(results_df['Timestamp'])
-        results_df = results_df.set_index('Timestamp')
+        windows, _ = self._get_pairs(windows_df)
+        counts = np.bincount(windows, minlength=len(windows_df))
+        
+        return counts
+        
+    def overlapping(self, start, end):
+        """
+        List the ranges overlapping a single window.
+        
+        PARAMS
+        ======
+            start: datetime
+                Start of the window
+                
+            end: datetime
+                End of the window (inclusive)
+                
+        RETURNS
+        =======
+            ranges_df: pandas.DataFrame
+                The ranges overlapping the window, sorted by start
+        """
+        overlaps_df = self.query(pd.DataFrame({'start': [start], 'end': [end]}))
+        ranges_df = overlaps_df.drop(columns=['Window'])
         
-        return results_df
\ No newline at end of file
+        return ranges_df